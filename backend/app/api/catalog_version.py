@@ -0,0 +1,64 @@
+# app/api/catalog_version.py
+"""
+Monotonically increasing catalog version.
+
+Every endpoint that changes PDFs, folders or tags calls
+``bump_catalog_version`` inside its transaction, before committing. The bump
+is an atomic ``version = version + 1`` on one row, so it is coherent across
+worker processes and never moves backwards. Readers derive ETags and cache
+stamps from ``current_version``, a primary-key lookup.
+
+Commits that bumped the version also advance ``local_version``, an
+in-process counter: caches serving every request compare against it without
+a query, and only re-read ``current_version`` now and then to see changes
+made by other processes.
+"""
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.catalog import CatalogVersion
+
+CATALOG_ROW_ID = 1
+
+_local_lock = threading.Lock()
+_local_version = 0
+
+
+def local_version() -> int:
+    """How many version bumps this process has committed"""
+    return _local_version
+
+
+def current_version(db: Session) -> int:
+    """The catalog version as of this transaction"""
+    version = db.query(CatalogVersion.version).filter(CatalogVersion.id == CATALOG_ROW_ID).scalar()
+    return version or 0
+
+
+def bump_catalog_version(db: Session):
+    """Advance the version as part of the caller's pending transaction"""
+    updated = (
+        db.query(CatalogVersion)
+        .filter(CatalogVersion.id == CATALOG_ROW_ID)
+        .update({CatalogVersion.version: CatalogVersion.version + 1}, synchronize_session=False)
+    )
+    if not updated:
+        db.add(CatalogVersion(id=CATALOG_ROW_ID, version=1))
+    db.info["catalog_bumped"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _count_committed_bump(db: Session):
+    global _local_version
+    if db.info.pop("catalog_bumped", False):
+        with _local_lock:
+            _local_version += 1
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_bump(db: Session, previous_transaction):
+    # A savepoint rolling back leaves the outer transaction's bump pending
+    if previous_transaction.parent is None:
+        db.info.pop("catalog_bumped", None)
@@ -0,0 +1,68 @@
+# app/api/conditional.py
+"""
+Conditional GET support.
+
+Collection ETags combine the catalog version with the request path and query
+string, so a client holding a still-current ETag gets a 304 before the
+listing query runs. Files are tagged with their content checksum; URLs that
+name the content (blob paths, ``?v=<checksum>``) may be cached for good.
+"""
+import hashlib
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+# Let browsers keep the body but revalidate with If-None-Match every time
+COLLECTION_CACHE_CONTROL = "no-cache"
+
+# For URLs that name the content they serve, so the response never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def collection_etag(request: Request, version: int) -> str:
+    """Strong ETag for this path + query parameters at the given catalog version"""
+    params = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{params}".encode()).hexdigest()[:16]
+    return f'"v{version}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    return if_none_match_holds(request.headers.get("if-none-match"), etag)
+
+
+def if_none_match_holds(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value names this ETag"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    # Weak comparison: W/"x" matches "x"
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified(request: Request, etag: str, immutable: bool = False) -> Optional[Response]:
+    """A 304 response if the client's copy is current, else None"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag, immutable))
+    return None
+
+
+def cache_headers(etag: str, immutable: bool = False) -> dict:
+    return {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else COLLECTION_CACHE_CONTROL}
+
+
+def content_etag(checksum: str) -> str:
+    """Strong ETag for a file with this content checksum"""
+    return f'"{checksum}"'
+
+
+def file_cache_headers(checksum: Optional[str], immutable: bool = False) -> Dict[str, str]:
+    """
+    Validators for serving a file: an ETag naming its content when the
+    checksum is known (else the file response's size-and-mtime one applies)
+    """
+    if not checksum:
+        return {"Cache-Control": COLLECTION_CACHE_CONTROL}
+    return cache_headers(content_etag(checksum), immutable)
@@ -1,8 +1,12 @@
 # app/api/endpoints/folders.py
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
 from sqlalchemy.orm import Session
 from typing import Dict, Any, List
 from app.core.database import get_db
+from app.api.catalog_version import bump_catalog_version, current_version
+from app.api.conditional import cache_headers, collection_etag, not_modified
+from app.api.exports import export_response
+from app.api.folder_counts import folder_counts
 from app.models.folder import Folder
 from app.models.pdf import PDF
 from app.schemas.folder import FolderCreate, FolderUpdate, Folder as FolderSchema, FolderList
@@ -10,26 +14,32 @@ from app.schemas.folder import FolderCreate, FolderUpdate, Folder as FolderSchem
 router = APIRouter()
 
 @router.get("/", response_model=FolderList)
-async def get_folders(db: Session = Depends(get_db)):
+async def get_folders(request: Request, response: Response, db: Session = Depends(get_db)):
     """Get all folders with PDF counts and unfiled count"""
     print("Getting all folders")
+    version = current_version(db)
+    etag = collection_etag(request, version)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers.update(cache_headers(etag))
+    
     folders = db.query(Folder).all()
     
-    # Count PDFs in each folder
+    # Counts for every folder (and unfiled) from one GROUP BY, cached between mutations
+    counts = folder_counts.get(db, version)
+    
     result = []
     for folder in folders:
-        pdf_count = db.query(PDF).filter(PDF.folder_id == folder.id).count()
-        print(f"Folder {folder.id}: {folder.name} has {pdf_count} PDFs")
         result.append(FolderSchema(
             id=folder.id,
             name=folder.name,
             created_at=folder.created_at,
-            pdf_count=pdf_count
+            pdf_count=counts.get(folder.id, 0)
         ))
     
-    # Count unfiled PDFs
-    unfiled_count = db.query(PDF).filter(PDF.folder_id.is_(None)).count()
-    print(f"Unfiled PDFs count: {unfiled_count}")
+    unfiled_count = counts.get(None, 0)
+    print(f"Returning {len(result)} folders, unfiled PDFs count: {unfiled_count}")
     
     return FolderList(folders=result, unfiled_count=unfiled_count)
 
@@ -49,6 +59,7 @@ async def create_folder(data: FolderCreate, db: Session = Depends(get_db)):
     # Create new folder
     folder = Folder(name=data.name)
     db.add(folder)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(folder)
     
@@ -71,7 +82,7 @@ async def get_folder(folder_id: int, db: Session = Depends(get_db)):
             detail=f"Folder with ID {folder_id} not found"
         )
     
-    pdf_count = db.query(PDF).filter(PDF.folder_id == folder.id).count()
+    pdf_count = folder_counts.get(db).get(folder.id, 0)
     
     return FolderSchema(
         id=folder.id,
@@ -80,6 +91,23 @@ async def get_folder(folder_id: int, db: Session = Depends(get_db)):
         pdf_count=pdf_count
     )
 
+@router.get("/{folder_id}/export")
+async def export_folder(folder_id: int, db: Session = Depends(get_db)):
+    """Download every PDF in a folder as one ZIP archive, streamed as it is built"""
+    folder = db.query(Folder).filter(Folder.id == folder_id).first()
+    if not folder:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Folder with ID {folder_id} not found"
+        )
+    
+    pdf_ids = [
+        pdf_id for (pdf_id,) in
+        db.query(PDF.id).filter(PDF.folder_id == folder_id).order_by(PDF.filename, PDF.id)
+    ]
+    print(f"Exporting {len(pdf_ids)} PDFs from folder {folder.name}")
+    return export_response(db, pdf_ids, folder.name)
+
 @router.put("/{folder_id}", response_model=FolderSchema)
 async def update_folder(
     folder_id: int, 
@@ -105,10 +133,11 @@ async def update_folder(
     
     # Update folder
     folder.name = data.name
+    bump_catalog_version(db)
     db.commit()
     db.refresh(folder)
     
-    pdf_count = db.query(PDF).filter(PDF.folder_id == folder.id).count()
+    pdf_count = folder_counts.get(db).get(folder.id, 0)
     
     return FolderSchema(
         id=folder.id,
@@ -132,6 +161,7 @@ async def delete_folder(folder_id: int, db: Session = Depends(get_db)):
     
     # Delete the folder
     db.delete(folder)
+    bump_catalog_version(db)
     db.commit()
     
     return None
\ No newline at end of file
@@ -1,37 +1,75 @@
 # app/api/endpoints/pdfs.py
-from fastapi import APIRouter, Depends, HTTPException, File, Form, Body, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, File, Form, Body, UploadFile, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_, and_
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+import asyncio
+import json
 import os
 import traceback
 from pathlib import Path
 
 from app.core.database import get_db, engine
-from app.core.config import settings
-from app.models.pdf import PDF
+from app.api.catalog_version import bump_catalog_version, current_version
+from app.api.conditional import cache_headers, collection_etag, file_cache_headers, not_modified
+from app.api.exports import export_response
+from app.api.file_locations import content_checksum, file_locations, is_versioned, stat_file
+from app.api.file_responses import RangeFileResponse
+from app.api.folder_counts import folder_counts
+from app.api.ingest import create_pdf_from_staged, create_pdfs_from_staged, parse_folder_id
+from app.api.pagination import MAX_PAGE_SIZE, STREAM_BATCH_SIZE, decode_cursor, encode_cursor, page_size
+from app.api.projections import parse_tags, pdf_to_dict, serialize_pdf, serialize_pdfs, with_folder_names
+from app.api.tag_sync import clean_tag_names, set_pdf_tags, tag_filter
+from app.models.pdf import PDF, pdf_tags
 from app.models.folder import Folder
 from app.models.tag import Tag
 from app.schemas.pdf import PDFCreate, PDFUpdate, PDF as PDFSchema, PDFBulkOperation
+from services import duplicates, page_ranges, search_index, text_store, thumbnails, vector_index
+from services.blob_store import release_blobs, remove_orphaned_files
+from services.storage import discard_staged, stage_upload, upload_path
 
 router = APIRouter()
 
 @router.get("/")
 async def get_pdfs(
+    request: Request,
+    response: Response,
     search: Optional[str] = None, 
     folder_id: Optional[str] = None,
-    tag: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_match: str = Query("all", regex="^(all|any)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
     """
     Get PDFs with optional filtering:
     - folder_id: Get PDFs in a specific folder (use -1 for unfiled)
-    - search: Search PDFs by filename
-    - tag: Filter PDFs by tag
+    - search: Full-text search over filename, tags and PDF text, best match first
+    - tag: Filter PDFs by tag. Repeat it (or comma-separate) for several tags;
+      tag_match=all requires every tag, tag_match=any at least one
+    
+    Pagination (newest first, keyed on created_at + id):
+    - limit: Page size. When limit or cursor is given the response is
+      {"items": [...], "next_cursor": "..."} instead of a bare list
+    - cursor: The next_cursor value from the previous page
+    - stream: Stream rows as NDJSON while the database produces them
+    
+    Responses carry an ETag; a matching If-None-Match gets a 304.
     """
-    print(f"Request for PDFs with folder_id: {folder_id}, search: {search}, tag: {tag}")
+    print(f"Request for PDFs with folder_id: {folder_id}, search: {search}, tag: {tag}, limit: {limit}, cursor: {cursor}, stream: {stream}")
+    
+    # Answer revalidations from the catalog version before running the listing query
+    etag = collection_etag(request, current_version(db))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers.update(cache_headers(etag))
     
     # Convert folder_id to the right type
     parsed_folder_id = None
@@ -48,8 +86,8 @@ async def get_pdfs(
         else:
             print(f"Invalid folder_id format: {folder_id}")
     
-    # Start with a base query
-    query = db.query(PDF)
+    # Start with a base query; folder names come back with each row
+    query = with_folder_names(db)
     
     # 1. Apply folder filtering first
     if use_unfiled_filter:
@@ -61,76 +99,81 @@ async def get_pdfs(
         print(f"Filtering for folder_id: {parsed_folder_id}")
         query = query.filter(PDF.folder_id == parsed_folder_id)
     
-    # Debug the query at this point
-    folder_filtered_count = query.count()
-    print(f"After folder filtering: {folder_filtered_count} PDFs")
-    
     # 2. Apply search filter if provided
+    rank = None
     if search and search.strip():
-        search_term = f"%{search.strip()}%"
-        print(f"Filtering by search term: {search_term}")
-        query = query.filter(
-            or_(
-                PDF.filename.ilike(search_term),
-                PDF.tags.ilike(search_term)
+        hits = search_index.match(db, search.strip())
+        if hits is not None:
+            print(f"Full-text search for: {search.strip()}")
+            rank = hits.c.rank
+            query = query.join(hits, hits.c.pdf_id == PDF.id).add_columns(rank)
+        else:
+            # No search index on this database: fall back to substring matching
+            search_term = f"%{search.strip()}%"
+            print(f"Filtering by search term: {search_term}")
+            query = query.filter(
+                or_(
+                    PDF.filename.ilike(search_term),
+                    PDF.tags.ilike(search_term)
+                )
             )
-        )
     
     # 3. Apply tag filter if provided
-    if tag and tag.strip():
-        print(f"Filtering by tag: {tag}")
-        tag_pattern = f"%{tag.strip()}%"
-        query = query.filter(PDF.tags.ilike(tag_pattern))
-    
-    # Execute the query and order by creation date
-    pdfs = query.order_by(PDF.created_at.desc()).all()
+    tag_names = clean_tag_names(name for value in tag or [] for name in value.split(","))
+    if tag_names:
+        print(f"Filtering by tags ({tag_match}): {tag_names}")
+        query = query.filter(tag_filter(tag_names, match_all=tag_match == "all"))
+    
+    # 4. Resume after the cursor row (best rank, then newest first, id breaks ties)
+    if cursor:
+        cursor_created_at, cursor_id, cursor_rank = decode_cursor(cursor)
+        after_cursor = or_(
+            PDF.created_at < cursor_created_at,
+            and_(PDF.created_at == cursor_created_at, PDF.id < cursor_id)
+        )
+        if rank is not None and cursor_rank is not None:
+            after_cursor = or_(rank > cursor_rank, and_(rank == cursor_rank, after_cursor))
+        query = query.filter(after_cursor)
     
-    # Debug the final results
-    print(f"Final filtered PDFs count: {len(pdfs)}")
+    if rank is not None:
+        query = query.order_by(rank)
+    query = query.order_by(PDF.created_at.desc(), PDF.id.desc())
     
-    # Format the response
-    result = []
-    for pdf in pdfs:
-        folder_name = None
-        if pdf.folder_id:
-            folder = db.query(Folder).filter(Folder.id == pdf.folder_id).first()
-            folder_name = folder.name if folder else None
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
         
-        # Handle tags properly
-        tags_list = []
-        if pdf.tags and pdf.tags.strip():
-            tags_list = [tag.strip() for tag in pdf.tags.split(",") if tag.strip()]
-            
-        # This whole file size calculation block should be INSIDE the for loop
-        file_size = 0  # Default to 0 instead of None
-        try:
-            # Get the actual file path
-            file_path = pdf.path
-            if file_path.startswith("uploads/"):
-                # Get just the filename
-                filename = os.path.basename(pdf.path)
-                # Look in the uploads directory
-                file_path = os.path.join(settings.UPLOAD_DIR, filename)
-            
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-            else:
-                print(f"Warning: File not found at {file_path} for PDF {pdf.id}")
-        except Exception as e:
-            print(f"Error calculating file size for {pdf.filename}: {str(e)}")
-
-        result.append({
-            "id": pdf.id,
-            "filename": pdf.filename,
-            "path": pdf.path,
-            "tags": tags_list,
-            "folder_id": pdf.folder_id,
-            "folder_name": folder_name,
-            "created_at": pdf.created_at,
-            "size": file_size  # Use calculated file size
-        })
-    
-    return result  # THIS LINE WAS MISSING
+        def ndjson_rows():
+            # yield_per keeps only one batch of ORM objects alive at a time
+            for row in query.yield_per(STREAM_BATCH_SIZE):
+                yield json.dumps(jsonable_encoder(pdf_to_dict(row[0], row[1]))) + "\n"
+        
+        return StreamingResponse(ndjson_rows(), media_type="application/x-ndjson", headers=cache_headers(etag))
+    
+    if limit is None and cursor is None:
+        # Legacy shape: the whole listing as a bare list
+        rows = query.all()
+        print(f"Final filtered PDFs count: {len(rows)}")
+        return [pdf_to_dict(row[0], row[1]) for row in rows]
+    
+    # Fetch one extra row to learn whether another page exists
+    size = page_size(limit)
+    rows = query.limit(size + 1).all()
+    has_more = len(rows) > size
+    rows = rows[:size]
+    print(f"Returning page of {len(rows)} PDFs, has_more: {has_more}")
+    
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            last[0].created_at, last[0].id, last[2] if rank is not None else None
+        )
+    
+    return {
+        "items": [pdf_to_dict(row[0], row[1]) for row in rows],
+        "next_cursor": next_cursor
+    }
 
 @router.post("/upload")
 async def upload_pdf(
@@ -148,98 +191,26 @@ async def upload_pdf(
             print(f"Invalid file type: {file.filename}")
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Create a unique filename
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        
-        # Ensure upload directory exists
-        upload_dir = settings.UPLOAD_DIR
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, filename)
-        
-        print(f"Saving file to: {file_path}")
-        
-        # Save the file and calculate size
-        file_size = 0
+        # Receive the file off the event loop, calculating size and checksum in the same pass
         try:
-            with open(file_path, "wb") as buffer:
-                # Read the file in chunks to handle large files
-                chunk_size = 1024 * 1024  # 1MB chunks
-                while True:
-                    chunk = await file.read(chunk_size)
-                    if not chunk:
-                        break
-                    buffer.write(chunk)
-                    file_size += len(chunk)
-            
-            print(f"File saved successfully to {file_path} with size {file_size} bytes")
+            staged = await stage_upload(file)
+            print(f"Received {file.filename}: {staged.size} bytes, sha256 {staged.checksum}")
         except Exception as e:
             print(f"Error saving file: {str(e)}")
             print(traceback.format_exc())
             raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
         
-        # Create PDF record
+        # Store the content once (identical files share a blob) and create the PDF record
         try:
-            # Handle folder_id conversion
-            parsed_folder_id = None
-            if folder_id:
-                if folder_id.isdigit():
-                    parsed_folder_id = int(folder_id)
-                    print(f"Converted folder_id from {folder_id} to {parsed_folder_id}")
-            
-            # Create the PDF record
-            pdf = PDF(
-                filename=file.filename,
-                path=f"uploads/{filename}",
-                tags=tags if tags else None,
-                folder_id=parsed_folder_id,
-                #size=file_size  # Store the file size
+            pdf = await create_pdf_from_staged(
+                db, staged, file.filename, parse_tags(tags), parse_folder_id(folder_id)
             )
-            db.add(pdf)
-            db.commit()
-            db.refresh(pdf)
-            
-            print(f"PDF record created with ID: {pdf.id}")
-            
-            # Update tags table
-            if tags:
-                tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
-                for tag_name in tag_list:
-                    existing_tag = db.query(Tag).filter(Tag.name == tag_name).first()
-                    if not existing_tag:
-                        db.add(Tag(name=tag_name))
-                db.commit()
-                print(f"Tags updated: {tag_list}")
-            
-            # Get folder name if folder_id is provided
-            folder_name = None
-            if parsed_folder_id:
-                folder = db.query(Folder).filter(Folder.id == parsed_folder_id).first()
-                if folder:
-                    folder_name = folder.name
-            
-            # Handle tags properly for response
-            tags_list = []
-            if tags and tags.strip():
-                tags_list = [tag.strip() for tag in tags.split(",") if tag.strip()]
-            
-            return {
-                "id": pdf.id,
-                "filename": pdf.filename,
-                "path": pdf.path,
-                "tags": tags_list,
-                "folder_id": parsed_folder_id,
-                "folder_name": folder_name,
-                "created_at": pdf.created_at,
-                "size": file_size  # Include size in the response
-            }
+            print(f"PDF record created with ID: {pdf.id}, tags: {pdf.tags}")
+            return serialize_pdf(db, pdf)
         except Exception as e:
             print(f"Error creating database record: {str(e)}")
             print(traceback.format_exc())
-            # If we saved the file but failed to create the DB record, clean up the file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"Removed file {file_path} due to database error")
+            await run_in_threadpool(discard_staged, staged.tmp_path)
             raise HTTPException(status_code=500, detail=f"Error creating database record: {str(e)}")
     
     except HTTPException:
@@ -252,50 +223,114 @@ async def upload_pdf(
         raise HTTPException(status_code=500, detail=f"Unexpected error during upload: {str(e)}")
 
 
-@router.get("/{pdf_id}")
-async def get_pdf(pdf_id: int, db: Session = Depends(get_db)):
-    """Get a specific PDF by ID"""
-    pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
-    if not pdf:
-        raise HTTPException(status_code=404, detail="PDF not found")
+@router.post("/upload/batch")
+async def upload_pdfs(
+    files: List[UploadFile] = File(...),
+    tags: str = Form(""),
+    folder_id: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload several PDF files in one request.
     
-    folder_name = None
-    if pdf.folder_id:
-        folder = db.query(Folder).filter(Folder.id == pdf.folder_id).first()
-        folder_name = folder.name if folder else None
+    Files are received concurrently and every PDF row (with its tags) is
+    written in a single transaction. The tags and folder apply to every file.
+    Returns one result per file, in request order.
+    """
+    print(f"Received batch upload of {len(files)} files with tags: {tags}, folder_id: {folder_id}")
     
-    # Handle tags properly
-    tags_list = []
-    if pdf.tags and pdf.tags.strip():
-        tags_list = [tag.strip() for tag in pdf.tags.split(",") if tag.strip()]
+    results: List[Dict[str, Any]] = [{"filename": file.filename} for file in files]
+    accepted = []
+    for index, file in enumerate(files):
+        if file.filename.endswith('.pdf'):
+            accepted.append(index)
+        else:
+            print(f"Invalid file type: {file.filename}")
+            results[index].update(status="error", detail="Only PDF files are allowed")
+    
+    # Receive every file off the event loop at the same time
+    received = await asyncio.gather(*(stage_upload(files[index]) for index in accepted), return_exceptions=True)
+    staged = []
+    for index, item in zip(accepted, received):
+        if isinstance(item, Exception):
+            print(f"Error saving file {files[index].filename}: {str(item)}")
+            results[index].update(status="error", detail=f"Error saving file: {str(item)}")
+        else:
+            staged.append((index, item))
     
-    # Calculate file size
-    file_size = None
-    try:
-        # Get the actual file path
-        file_path = pdf.path
-        if file_path.startswith("uploads/"):
-            # Get just the filename
-            filename = os.path.basename(pdf.path)
-            # Look in the uploads directory
-            file_path = os.path.join(settings.UPLOAD_DIR, filename)
-        
-        if os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-    except Exception as e:
-        print(f"Error calculating file size for {pdf.filename}: {str(e)}")
+    if staged:
+        try:
+            pdfs = await create_pdfs_from_staged(
+                db,
+                [(item, files[index].filename) for index, item in staged],
+                parse_tags(tags),
+                parse_folder_id(folder_id)
+            )
+            for (index, _), pdf_dict in zip(staged, serialize_pdfs(db, pdfs)):
+                results[index].update(status="created", pdf=pdf_dict)
+            print(f"Created {len(pdfs)} PDF records")
+        except Exception as e:
+            print(f"Error creating database records: {str(e)}")
+            print(traceback.format_exc())
+            for index, item in staged:
+                await run_in_threadpool(discard_staged, item.tmp_path)
+                results[index].update(status="error", detail=f"Error creating database record: {str(e)}")
     
     return {
-        "id": pdf.id,
-        "filename": pdf.filename,
-        "path": pdf.path,
-        "tags": tags_list,
-        "folder_id": pdf.folder_id,
-        "folder_name": folder_name,
-        "created_at": pdf.created_at,
-        "size": file_size  # Use calculated file size instead of pdf.size
+        "created_count": sum(1 for result in results if result["status"] == "created"),
+        "failed_count": sum(1 for result in results if result["status"] == "error"),
+        "results": results
     }
 
+
+@router.get("/duplicates")
+async def get_duplicate_report(
+    threshold: float = Query(duplicates.DEFAULT_THRESHOLD, ge=0.0, le=1.0),
+    db: Session = Depends(get_db)
+):
+    """
+    Groups of PDFs whose text is identical or nearly so, library-wide.
+    
+    Copies of the same file (same checksum) are always grouped; edited
+    copies are found through the LSH index, so only files that collide in
+    some band are ever compared. "similarity" is the lowest estimated
+    similarity linking the group.
+    """
+    pairs = duplicates.similar_pairs(db, threshold)
+    # Several PDFs of one file are exact duplicates of each other
+    copied = db.query(PDF.checksum).filter(PDF.checksum.isnot(None)).group_by(PDF.checksum).having(
+        func.count(PDF.id) > 1
+    )
+    pairs += [(checksum, checksum, 1.0) for (checksum,) in copied]
+    groups = duplicates.group_pairs(pairs)
+    
+    checksums = {checksum for group, _ in groups for checksum in group}
+    by_checksum: Dict[str, List[PDF]] = {}
+    if checksums:
+        for pdf in db.query(PDF).filter(PDF.checksum.in_(checksums)).order_by(PDF.id):
+            by_checksum.setdefault(pdf.checksum, []).append(pdf)
+    
+    result = []
+    for group, similarity in groups:
+        pdfs = [pdf for checksum in group for pdf in by_checksum.get(checksum, [])]
+        if len(pdfs) > 1:
+            result.append({
+                "similarity": round(similarity, 3),
+                "pdfs": [{"id": pdf.id, "filename": pdf.filename, "folder_id": pdf.folder_id} for pdf in pdfs]
+            })
+    return {"threshold": threshold, "group_count": len(result), "groups": result}
+
+
+@router.get("/{pdf_id}")
+async def get_pdf(pdf_id: int, db: Session = Depends(get_db)):
+    """Get a specific PDF by ID"""
+    row = with_folder_names(db).filter(PDF.id == pdf_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    
+    pdf, folder_name = row
+    return pdf_to_dict(pdf, folder_name)
+
 @router.put("/{pdf_id}/tags")
 async def update_pdf_tags(pdf_id: int, data: Dict[str, Any] = Body(...), db: Session = Depends(get_db)):
     """Update tags for a PDF"""
@@ -305,51 +340,18 @@ async def update_pdf_tags(pdf_id: int, data: Dict[str, Any] = Body(...), db: Ses
     
     tags = data.get("tags", [])
     
-    # Convert list of tags to comma-separated string
-    if isinstance(tags, list):
-        tags_str = ",".join(tags)
-    else:
-        tags_str = tags
-    
-    pdf.tags = tags_str
-    
-    # Update tags table
-    if tags:
-        tag_list = tags if isinstance(tags, list) else [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-        for tag_name in tag_list:
-            existing_tag = db.query(Tag).filter(Tag.name == tag_name).first()
-            if not existing_tag:
-                db.add(Tag(name=tag_name))
+    # Accept a list or a comma-separated string
+    if not isinstance(tags, list):
+        tags = parse_tags(tags)
     
+    tags_list = set_pdf_tags(db, pdf, tags)
+    bump_catalog_version(db)
     db.commit()
     
-    # Handle tags properly for response
-    tags_list = []
-    if isinstance(tags, list):
-        tags_list = tags
-    elif tags_str and tags_str.strip():
-        tags_list = [tag.strip() for tag in tags_str.split(",") if tag.strip()]
-    
-    # Calculate file size
-    file_size = None
-    try:
-        # Get the actual file path
-        file_path = pdf.path
-        if file_path.startswith("uploads/"):
-            # Get just the filename
-            filename = os.path.basename(pdf.path)
-            # Look in the uploads directory
-            file_path = os.path.join(settings.UPLOAD_DIR, filename)
-        
-        if os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-    except Exception as e:
-        print(f"Error calculating file size for {pdf.filename}: {str(e)}")
-    
     return {
         "id": pdf.id,
         "tags": tags_list,
-        "size": file_size  # Use calculated file size instead of pdf.size
+        "size": pdf.size
     }
 
 
@@ -364,44 +366,45 @@ async def delete_pdf(pdf_id: int, db: Session = Depends(get_db)):
         print(f"PDF with ID {pdf_id} not found in database")
         raise HTTPException(status_code=404, detail="PDF not found")
     
-    # Get the uploads directory
-    uploads_dir = settings.UPLOAD_DIR
-    
-    # Get the physical file path
-    file_name = os.path.basename(pdf.path)
-    file_path = os.path.join(uploads_dir, file_name)
-    
-    print(f"Looking for file to delete at: {file_path}")
-    
-    # Try to delete the physical file
-    file_deleted = False
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-            print(f"Successfully deleted file: {file_path}")
-            file_deleted = True
-        except Exception as e:
-            print(f"Error deleting file {file_path}: {str(e)}")
-            # Continue even if file deletion fails
-    else:
-        print(f"File not found at {file_path}, will still delete database record")
-    
-    # Delete the database record
+    # Delete the database record; a shared file only goes with its last PDF
     try:
+        blob_id = pdf.blob_id
+        legacy_path = upload_path(pdf.path) if blob_id is None else None
+        checksum = pdf.checksum
         db.delete(pdf)
+        db.flush()
+        orphaned = release_blobs(db, [blob_id])
+        text_store.drop_unreferenced(db, [checksum])
+        bump_catalog_version(db)
         db.commit()
         print(f"Successfully deleted database record for PDF ID: {pdf_id}")
-        
-        return {
-            "status": "success", 
-            "id": pdf_id, 
-            "file_deleted": file_deleted,
-            "db_record_deleted": True
-        }
     except Exception as e:
         db.rollback()
         print(f"Error deleting database record: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error deleting PDF: {str(e)}")
+    
+    # Remove the physical file once nothing references it
+    file_deleted = False
+    try:
+        if legacy_path is not None:
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+                file_deleted = True
+            else:
+                print(f"File not found at {legacy_path}")
+        else:
+            file_deleted = bool(remove_orphaned_files(db, orphaned))
+        print(f"File deleted for PDF {pdf_id}: {file_deleted}")
+    except Exception as e:
+        print(f"Error deleting file for PDF {pdf_id}: {str(e)}")
+        # The record is gone either way
+    
+    return {
+        "status": "success", 
+        "id": pdf_id, 
+        "file_deleted": file_deleted,
+        "db_record_deleted": True
+    }
 
 @router.post("/delete")
 async def delete_pdfs(data: PDFBulkOperation, db: Session = Depends(get_db)):
@@ -412,28 +415,36 @@ async def delete_pdfs(data: PDFBulkOperation, db: Session = Depends(get_db)):
     
     print(f"Attempting to delete PDFs with IDs: {pdf_ids}")
     
-    # Get the uploads directory
-    uploads_dir = settings.UPLOAD_DIR
-    
-    # Track results
-    deleted_files = []
-    failed_files = []
-    
     # Get PDFs to delete
     pdfs = db.query(PDF).filter(PDF.id.in_(pdf_ids)).all()
     if not pdfs:
         print("No PDFs found with the specified IDs")
         return {"status": "success", "deleted_count": 0, "message": "No PDFs found with the specified IDs"}
     
-    # Process each PDF
-    for pdf in pdfs:
-        # Get the physical file path
-        file_name = os.path.basename(pdf.path)
-        file_path = os.path.join(uploads_dir, file_name)
-        
-        print(f"Looking for file to delete at: {file_path}")
-        
-        # Try to delete the physical file
+    # Delete all database records in a single transaction
+    try:
+        blob_ids = [pdf.blob_id for pdf in pdfs]
+        checksums = [pdf.checksum for pdf in pdfs]
+        legacy_paths = [upload_path(pdf.path) for pdf in pdfs if pdf.blob_id is None]
+        # Bulk deletes skip the ORM, so drop the tag links explicitly
+        db.execute(pdf_tags.delete().where(pdf_tags.c.pdf_id.in_(pdf_ids)))
+        db.query(PDF).filter(PDF.id.in_(pdf_ids)).delete(synchronize_session=False)
+        # Shared files are only removed along with their last PDF
+        orphaned = release_blobs(db, blob_ids)
+        text_store.drop_unreferenced(db, checksums)
+        bump_catalog_version(db)
+        db.commit()
+        print(f"Successfully deleted {len(pdf_ids)} database records")
+    except Exception as e:
+        db.rollback()
+        print(f"Error deleting database records: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error deleting PDFs: {str(e)}")
+    
+    # Track results
+    deleted_files = []
+    failed_files = []
+    
+    for file_path in legacy_paths:
         if os.path.exists(file_path):
             try:
                 os.remove(file_path)
@@ -442,26 +453,20 @@ async def delete_pdfs(data: PDFBulkOperation, db: Session = Depends(get_db)):
             except Exception as e:
                 failed_files.append({"path": file_path, "error": str(e)})
                 print(f"Error deleting file {file_path}: {str(e)}")
-                # Continue even if file deletion fails
         else:
-            print(f"File not found at {file_path}, will still delete database record")
-    
-    # Delete all database records in a single transaction
+            print(f"File not found at {file_path}")
     try:
-        db.query(PDF).filter(PDF.id.in_(pdf_ids)).delete(synchronize_session=False)
-        db.commit()
-        print(f"Successfully deleted {len(pdf_ids)} database records")
-        
-        return {
-            "status": "success", 
-            "deleted_count": len(pdf_ids),
-            "files_deleted": len(deleted_files),
-            "files_failed": len(failed_files)
-        }
+        deleted_files.extend(remove_orphaned_files(db, orphaned))
     except Exception as e:
-        db.rollback()
-        print(f"Error deleting database records: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error deleting PDFs: {str(e)}")
+        failed_files.append({"path": None, "error": str(e)})
+        print(f"Error deleting stored files: {str(e)}")
+    
+    return {
+        "status": "success", 
+        "deleted_count": len(pdf_ids),
+        "files_deleted": len(deleted_files),
+        "files_failed": len(failed_files)
+    }
 
 @router.post("/move")
 async def move_pdfs_to_folder(data: PDFBulkOperation, db: Session = Depends(get_db)):
@@ -482,6 +487,7 @@ async def move_pdfs_to_folder(data: PDFBulkOperation, db: Session = Depends(get_
     
     # Update PDFs
     db.query(PDF).filter(PDF.id.in_(pdf_ids)).update({"folder_id": folder_id})
+    bump_catalog_version(db)
     db.commit()
     
     # Verify the update
@@ -491,87 +497,307 @@ async def move_pdfs_to_folder(data: PDFBulkOperation, db: Session = Depends(get_
     
     return {"status": "success", "moved_count": len(pdf_ids)}
 
+@router.post("/export")
+async def export_pdfs(data: PDFBulkOperation, db: Session = Depends(get_db)):
+    """Download several PDFs as one ZIP archive, streamed as it is built"""
+    pdf_ids = data.pdf_ids
+    if not pdf_ids:
+        raise HTTPException(status_code=400, detail="No PDFs specified")
+    
+    print(f"Exporting {len(set(pdf_ids))} PDFs")
+    # In the order they were selected
+    return export_response(db, pdf_ids, "pdfs")
+
 @router.get("/unfiled-count")
 async def get_unfiled_count(db: Session = Depends(get_db)):
     """Get count of PDFs not in any folder"""
-    count = db.query(PDF).filter(PDF.folder_id.is_(None)).count()
+    count = folder_counts.get(db).get(None, 0)
     return {"count": count}
 
 @router.get("/{pdf_id}/view")
-async def view_pdf(pdf_id: int, db: Session = Depends(get_db)):
-    """View a PDF file directly"""
-    pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
-    if not pdf:
+async def view_pdf(pdf_id: int, v: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    """
+    View a PDF file directly. The ETag is the file's checksum; with that
+    checksum in ``v`` the URL names the content and is cached for good.
+    """
+    location = file_locations.locate(db, pdf_id)
+    if not location:
         raise HTTPException(status_code=404, detail="PDF not found")
     
-    # Get the uploads directory
-    uploads_dir = settings.UPLOAD_DIR
-    
-    # Get the actual file path
-    file_path = pdf.path
-    if file_path.startswith("uploads/"):
-        # Get just the filename
-        filename = os.path.basename(pdf.path)
-        # Look in the uploads directory
-        file_path = os.path.join(uploads_dir, filename)
-    
+    file_path = location.path
     print(f"Attempting to serve PDF from: {file_path}")
     
-    # Check if file exists
-    if not os.path.exists(file_path):
-        # Try alternative path
-        alt_path = os.path.join(uploads_dir, os.path.basename(pdf.path))
-        print(f"File not found at {file_path}. Trying alternative path: {alt_path}")
-        
-        if os.path.exists(alt_path):
-            file_path = alt_path
-        else:
-            raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path} or {alt_path}")
+    # The one stat of this request: it also gives the response its headers
+    file_stat = stat_file(file_path)
+    if file_stat is None:
+        raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path}")
     
-    return FileResponse(
+    # Range requests let in-browser viewers fetch the pages they show first;
+    # a current If-None-Match / If-Modified-Since gets a 304
+    return RangeFileResponse(
         path=file_path, 
         media_type="application/pdf",
-        filename=pdf.filename
+        filename=location.filename,
+        headers=file_cache_headers(location.checksum, immutable=is_versioned(location, v)),
+        stat_result=file_stat
     )
 
 @router.get("/{pdf_id}/download")
-async def download_pdf(pdf_id: int, db: Session = Depends(get_db)):
-    """Download a PDF file"""
-    pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
-    if not pdf:
+async def download_pdf(pdf_id: int, v: Optional[str] = Query(None), db: Session = Depends(get_db)):
+    """Download a PDF file (cached like /view)"""
+    location = file_locations.locate(db, pdf_id)
+    if not location:
         raise HTTPException(status_code=404, detail="PDF not found")
     
-    # Get the uploads directory
-    uploads_dir = settings.UPLOAD_DIR
+    file_path = location.path
+    print(f"Attempting to download PDF from: {file_path}")
     
-    # Get the actual file path
-    file_path = pdf.path
-    if file_path.startswith("uploads/"):
-        # Get just the filename
-        filename = os.path.basename(pdf.path)
-        # Look in the uploads directory
-        file_path = os.path.join(uploads_dir, filename)
+    file_stat = stat_file(file_path)
+    if file_stat is None:
+        raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path}")
     
-    print(f"Attempting to download PDF from: {file_path}")
+    return RangeFileResponse(
+        path=file_path, 
+        media_type="application/pdf",
+        filename=location.filename,
+        headers={
+            "Content-Disposition": f"attachment; filename={location.filename}",
+            **file_cache_headers(location.checksum, immutable=is_versioned(location, v))
+        },
+        stat_result=file_stat
+    )
+
+@router.get("/{pdf_id}/thumbnail")
+async def get_pdf_thumbnail(
+    pdf_id: int,
+    request: Request,
+    size: int = Query(thumbnails.DEFAULT_SIZE, ge=1, le=2048),
+    v: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Preview of the first page. Listings link to it with the file's checksum
+    in ``v``, so browsers keep that URL for good; others revalidate by ETag.
+    """
+    location = file_locations.locate(db, pdf_id)
+    if not location:
+        raise HTTPException(status_code=404, detail="PDF not found")
     
-    # Check if file exists
-    if not os.path.exists(file_path):
-        # Try alternative path
-        alt_path = os.path.join(uploads_dir, os.path.basename(pdf.path))
-        print(f"File not found at {file_path}. Trying alternative path: {alt_path}")
-        
-        if os.path.exists(alt_path):
-            file_path = alt_path
-        else:
-            raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path} or {alt_path}")
+    file_path = location.path
+    checksum = location.checksum or await run_in_threadpool(content_checksum, location)
+    if checksum is None:
+        raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path}")
+    
+    size = thumbnails.snap_size(size)
+    etag = f'"{checksum[:32]}-{size}"'
+    immutable = v == checksum[:16]
+    cached = not_modified(request, etag, immutable)
+    if cached:
+        return cached
+    
+    try:
+        thumbnail_path, thumbnail_stat = await thumbnails.get_thumbnail(file_path, checksum, size)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path}")
+    except Exception as e:
+        print(f"Error rendering thumbnail of PDF {pdf_id}: {str(e)}")
+        raise HTTPException(status_code=422, detail="Could not render a preview of this PDF")
     
     return FileResponse(
-        path=file_path, 
+        thumbnail_path,
+        media_type=thumbnails.MEDIA_TYPE,
+        headers=cache_headers(etag, immutable),
+        stat_result=thumbnail_stat
+    )
+
+@router.get("/{pdf_id}/pages")
+async def get_pdf_pages(
+    pdf_id: int,
+    request: Request,
+    pages: str = Query(..., alias="range"),
+    v: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    A PDF of only the given pages, e.g. ``range=3-5`` or ``range=1,4-6,9-``.
+    With the file's checksum in ``v`` the URL is cached for good.
+    """
+    try:
+        ranges = page_ranges.parse_page_range(pages)
+    except page_ranges.PageRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    location = file_locations.locate(db, pdf_id)
+    if not location:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    
+    file_path = location.path
+    checksum = location.checksum or await run_in_threadpool(content_checksum, location)
+    if checksum is None:
+        raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path}")
+    
+    spec = page_ranges.format_page_range(ranges)
+    etag = f'"{checksum[:32]}-p{spec}"'
+    immutable = v == checksum[:16]
+    cached = not_modified(request, etag, immutable)
+    if cached:
+        return cached
+    
+    try:
+        pages_path, pages_stat = await page_ranges.get_pages(file_path, checksum, ranges)
+    except page_ranges.PageRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"PDF file not found on server at {file_path}")
+    except Exception as e:
+        print(f"Error extracting pages {spec} of PDF {pdf_id}: {str(e)}")
+        raise HTTPException(status_code=422, detail="Could not extract pages from this PDF")
+    
+    return RangeFileResponse(
+        pages_path,
         media_type="application/pdf",
-        filename=pdf.filename,
-        headers={"Content-Disposition": f"attachment; filename={pdf.filename}"}
+        filename=f"{Path(location.filename).stem}_pages_{spec}.pdf",
+        content_disposition_type="inline",
+        headers=cache_headers(etag, immutable),
+        stat_result=pages_stat
     )
 
+@router.get("/{pdf_id}/text")
+async def get_pdf_text(
+    pdf_id: int,
+    page: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Extracted text of a PDF, per page (page numbers start at 1).
+    
+    Served from the stored text; the file is only parsed the first time or
+    after it changed.
+    """
+    pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
+    if not pdf:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    
+    try:
+        pages = await text_store.load_pages(db, pdf)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="PDF file not found on server")
+    
+    if page is not None:
+        if page > len(pages):
+            raise HTTPException(status_code=404, detail=f"PDF has {len(pages)} pages")
+        selected = [(page, pages[page - 1])]
+    else:
+        selected = list(enumerate(pages, start=1))
+    
+    return {
+        "id": pdf_id,
+        "page_count": len(pages),
+        "pages": [{"page": number, "text": text} for number, text in selected]
+    }
+
+@router.get("/{pdf_id}/duplicates")
+async def get_pdf_duplicates(
+    pdf_id: int,
+    threshold: float = Query(duplicates.DEFAULT_THRESHOLD, ge=0.0, le=1.0),
+    db: Session = Depends(get_db)
+):
+    """
+    Other PDFs with the same or nearly the same text, most similar first.
+    
+    Copies of the same file have similarity 1.0; others are estimated from
+    MinHash signatures of candidates found in the LSH index.
+    """
+    pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
+    if not pdf:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    if not pdf.checksum:
+        return {"id": pdf_id, "duplicates": []}
+    
+    scores = duplicates.find_similar(db, pdf.checksum, threshold)
+    scores[pdf.checksum] = 1.0
+    matches = (
+        db.query(PDF)
+        .filter(PDF.checksum.in_(scores), PDF.id != pdf_id)
+        .order_by(PDF.id)
+        .all()
+    )
+    # Exact copies first, then by estimated similarity
+    matches.sort(key=lambda match: (match.checksum != pdf.checksum, -scores[match.checksum]))
+    
+    return {
+        "id": pdf_id,
+        "duplicates": [
+            {
+                "id": match.id,
+                "filename": match.filename,
+                "folder_id": match.folder_id,
+                "similarity": round(scores[match.checksum], 3),
+                "exact": match.checksum == pdf.checksum,
+            }
+            for match in matches
+        ]
+    }
+
+@router.get("/{pdf_id}/similar")
+async def get_similar_pdfs(
+    pdf_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    folder_id: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_match: str = Query("all", regex="^(all|any)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    PDFs whose text is most like this one's, best match first.
+    
+    Scored by cosine similarity of hashed TF-IDF vectors in the in-process
+    vector index. Copies of the same file are left out (see /duplicates).
+    Optional filters as in the listing: folder_id (-1 for unfiled) and tag.
+    """
+    pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
+    if not pdf:
+        raise HTTPException(status_code=404, detail="PDF not found")
+    
+    vector = vector_index.index.get(pdf.checksum) if pdf.checksum else None
+    if vector is None:
+        pages = text_store.get_pages(db, pdf.checksum) if pdf.checksum else None
+        vector = vector_index.document_vector(db, pages) if pages else None
+        if vector is None:
+            return {"id": pdf_id, "similar": []}
+        vector_index.index.add(pdf.checksum, vector)
+    
+    query = db.query(PDF).filter(PDF.checksum.isnot(None), PDF.checksum != pdf.checksum)
+    if folder_id == "-1":
+        query = query.filter(PDF.folder_id.is_(None))
+    elif folder_id is not None and folder_id.isdigit():
+        query = query.filter(PDF.folder_id == int(folder_id))
+    tag_names = clean_tag_names(name for value in tag or [] for name in value.split(","))
+    if tag_names:
+        query = query.filter(tag_filter(tag_names, match_all=tag_match == "all"))
+    
+    allowed = None
+    if folder_id is not None or tag_names:
+        allowed = {row[0] for row in query.with_entities(PDF.checksum).distinct()}
+    matches = vector_index.index.search(vector, limit, allowed, exclude=[pdf.checksum])
+    
+    scores = dict(matches)
+    pdfs = query.filter(PDF.checksum.in_(scores)).all() if scores else []
+    pdfs.sort(key=lambda match: (-scores[match.checksum], match.id))
+    
+    return {
+        "id": pdf_id,
+        "similar": [
+            {
+                "id": match.id,
+                "filename": match.filename,
+                "folder_id": match.folder_id,
+                "score": round(scores[match.checksum], 4),
+            }
+            for match in pdfs[:limit]
+        ]
+    }
+
 @router.put("/{pdf_id}/rename")
 async def rename_pdf(
     pdf_id: int, 
@@ -593,42 +819,7 @@ async def rename_pdf(
     
     # Update the filename in the database
     pdf.filename = new_filename
+    bump_catalog_version(db)
     db.commit()
     
-    # Calculate file size
-    file_size = 0
-    try:
-        # Get the actual file path
-        file_path = pdf.path
-        if file_path.startswith("uploads/"):
-            # Get just the filename
-            filename = os.path.basename(pdf.path)
-            # Look in the uploads directory
-            file_path = os.path.join(settings.UPLOAD_DIR, filename)
-        
-        if os.path.exists(file_path):
-            file_size = os.path.getsize(file_path)
-    except Exception as e:
-        print(f"Error calculating file size for {pdf.filename}: {str(e)}")
-    
-    # Get folder name
-    folder_name = None
-    if pdf.folder_id:
-        folder = db.query(Folder).filter(Folder.id == pdf.folder_id).first()
-        folder_name = folder.name if folder else None
-    
-    # Handle tags properly
-    tags_list = []
-    if pdf.tags and pdf.tags.strip():
-        tags_list = [tag.strip() for tag in pdf.tags.split(",") if tag.strip()]
-    
-    return {
-        "id": pdf.id,
-        "filename": pdf.filename,
-        "path": pdf.path,
-        "tags": tags_list,
-        "folder_id": pdf.folder_id,
-        "folder_name": folder_name,
-        "created_at": pdf.created_at,
-        "size": file_size
-    }
\ No newline at end of file
+    return serialize_pdf(db, pdf)
@@ -1,22 +1,42 @@
 # app/api/endpoints/tags.py
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import asyncio
+import json
 import logging
 import os
-import PyPDF2
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.api.catalog_version import bump_catalog_version, current_version
+from app.api.conditional import cache_headers, collection_etag, not_modified
+from app.api.projections import parse_tags
+from app.api.tag_sync import clean_tag_names, remove_tag_from_pdfs, set_pdf_tags, upsert_tags
 from app.models.tag import Tag
 from app.models.pdf import PDF
 from app.schemas.tag import Tag as TagSchema, TagCreate
+from services import search_index, tagger, text_store
+from services.pdf_processor import ExtractionTimeout, extraction
+from services.storage import read_metadata, upload_path
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Batches this large read the whole term-frequency table once instead of per PDF
+PRELOAD_FREQUENCIES_AT = 50
+
 @router.get("/", response_model=List[TagSchema])
-async def get_tags(db: Session = Depends(get_db)):
+async def get_tags(request: Request, response: Response, db: Session = Depends(get_db)):
     """Get all tags"""
+    etag = collection_etag(request, current_version(db))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    response.headers.update(cache_headers(etag))
+    
     tags = db.query(Tag).all()
     
     # Count PDFs for each tag (using the many-to-many relationship)
@@ -43,6 +63,7 @@ async def create_tag(tag: TagCreate, db: Session = Depends(get_db)):
     # Create new tag
     db_tag = Tag(name=tag.name)
     db.add(db_tag)
+    bump_catalog_version(db)
     db.commit()
     db.refresh(db_tag)
     
@@ -61,15 +82,24 @@ async def delete_tag(tag_id: int, db: Session = Depends(get_db)):
             detail=f"Tag with ID {tag_id} not found"
         )
     
-    # Delete the tag
+    # Remove it from the PDFs' tag strings too; deleting the tag drops its pdf_tags links
+    remove_tag_from_pdfs(db, tag)
     db.delete(tag)
+    bump_catalog_version(db)
     db.commit()
     
     return None
 
-@router.post("/generate", response_model=Dict[str, List[str]])
+@router.post("/generate", response_model=Dict[str, Any])
 async def generate_tags(data: Dict[str, Any] = Body(...), db: Session = Depends(get_db)):
-    """Generate tags for a PDF using simple text analysis."""
+    """
+    Generate tags for a PDF using simple text analysis.
+    
+    Returns {"tags": [...], "coverage": {...}}; coverage reports how many
+    pages and characters the tags are based on and why reading stopped
+    (tags stable, a tagging budget, or a budget that cut extraction short).
+    Tags guessed from the filename come without coverage.
+    """
     pdf_id = data.get("pdf_id")
     if not pdf_id:
         logger.error("No PDF ID provided")
@@ -86,82 +116,25 @@ async def generate_tags(data: Dict[str, Any] = Body(...), db: Session = Depends(
         logger.error(f"PDF with ID {pdf_id} not found in database")
         raise HTTPException(status_code=404, detail="PDF not found in database")
     
-    # Current working directory for debugging
-    current_dir = os.getcwd()
-    logger.info(f"Current working directory: {current_dir}")
-    
     try:
-        # Get the PDF file path
-        pdf_path = os.path.join("uploads", str(pdf.id), pdf.filename)
-        logger.info(f"PDF path: {pdf_path}")
-        full_path = os.path.join(current_dir, pdf_path)
-        logger.info(f"Full PDF path: {full_path}")
-        
-        if not os.path.exists(pdf_path):
-            logger.warning(f"PDF file not found at path: {pdf_path}")
-            # Try alternative paths
-            alt_paths = [
-                os.path.join("uploads", pdf.filename),
-                os.path.join("uploads", f"{pdf.id}_{pdf.filename}"),
-                os.path.join(".", "uploads", str(pdf.id), pdf.filename),
-                os.path.join(".", "uploads", pdf.filename),
-                # Add more potential paths based on your file structure
-            ]
-            
-            found = False
-            for alt_path in alt_paths:
-                logger.info(f"Trying alternative path: {alt_path}")
-                if os.path.exists(alt_path):
-                    pdf_path = alt_path
-                    found = True
-                    logger.info(f"Found PDF at alternative path: {alt_path}")
-                    break
-            
-            if not found:
-                logger.error("PDF file not found in any of the expected locations")
-                
-                # If we have a filename, generate tags from it as fallback
-                if filename:
-                    logger.info(f"Generating tags from filename: {filename}")
-                    filename_tags = generate_tags_from_filename(filename)
-                    if filename_tags:
-                        return {"tags": filename_tags}
-                
-                raise HTTPException(status_code=404, detail="PDF file not found on server")
-        
-        # Extract text from the PDF
-        text = ""
+        # Text is parsed once per file and stored; tagging streams it back page by page
         try:
-            logger.info(f"Extracting text from PDF: {pdf.filename}")
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                logger.info(f"PDF has {num_pages} pages")
-                
-                for page_num in range(num_pages):
-                    try:
-                        page_text = pdf_reader.pages[page_num].extract_text() or ""
-                        text += page_text + "\n"
-                    except Exception as e:
-                        logger.error(f"Error extracting text from page {page_num}: {str(e)}")
-                    
-            # Log a preview of the extracted text
-            text_length = len(text)
-            preview = text[:200] + "..." if text_length > 200 else text
-            logger.info(f"Extracted {text_length} characters of text. Preview: {preview}")
+            logger.info(f"Loading text for PDF: {pdf.filename}")
+            await text_store.ensure_stored(db, pdf)
+        except ExtractionTimeout:
+            logger.error(f"Text extraction for PDF {pdf_id} exceeded the time limit")
+            raise HTTPException(status_code=504, detail="Text extraction took too long")
+        except FileNotFoundError as e:
+            logger.error(f"PDF file not found: {str(e)}")
+            
+            # If we have a filename, generate tags from it as fallback
+            if filename:
+                logger.info(f"Generating tags from filename: {filename}")
+                filename_tags = generate_tags_from_filename(filename)
+                if filename_tags:
+                    return {"tags": filename_tags}
             
-            if not text.strip():
-                logger.warning(f"No text could be extracted from PDF {pdf_id}")
-                
-                # If we have a filename, generate tags from it as fallback
-                if filename:
-                    logger.info(f"Generating tags from filename: {filename}")
-                    filename_tags = generate_tags_from_filename(filename)
-                    if filename_tags:
-                        return {"tags": filename_tags}
-                
-                raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-                
+            raise HTTPException(status_code=404, detail="PDF file not found on server")
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             
@@ -174,10 +147,25 @@ async def generate_tags(data: Dict[str, Any] = Body(...), db: Session = Depends(
             
             raise HTTPException(status_code=500, detail=f"Error extracting text from PDF: {str(e)}")
         
-        # Simple tag extraction
         logger.info(f"Generating tags from extracted text")
-        tags = extract_tags_from_text(text)
+        # Scoring and the page reads block: keep them off the event loop
+        run, coverage = await run_in_threadpool(tag_stored_text, db, pdf)
+        logger.info(f"Read {run.pages} of {coverage['page_count']} pages ({run.characters} characters), "
+                    f"stopped: {run.stopped}")
+        
+        if not run.characters:
+            logger.warning(f"No text could be extracted from PDF {pdf_id}")
+            
+            # If we have a filename, generate tags from it as fallback
+            if filename:
+                logger.info(f"Generating tags from filename: {filename}")
+                filename_tags = generate_tags_from_filename(filename)
+                if filename_tags:
+                    return {"tags": filename_tags}
+            
+            raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
         
+        tags = run.tags
         if not tags:
             logger.warning(f"No tags were generated from text for PDF {pdf_id}")
             
@@ -189,11 +177,13 @@ async def generate_tags(data: Dict[str, Any] = Body(...), db: Session = Depends(
                     return {"tags": filename_tags}
             
             # Return empty tags list instead of error
-            return {"tags": []}
+            return {"tags": [], "coverage": coverage}
         
         logger.info(f"Generated tags for PDF {pdf_id}: {tags}")
-        return {"tags": tags}
+        return {"tags": tags, "coverage": coverage}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating tags: {str(e)}")
         
@@ -206,67 +196,196 @@ async def generate_tags(data: Dict[str, Any] = Body(...), db: Session = Depends(
         
         raise HTTPException(status_code=500, detail=f"Failed to generate tags: {str(e)}")
 
-def extract_tags_from_text(text: str, max_tags: int = 5) -> List[str]:
+@router.post("/generate/batch")
+async def generate_tags_batch(data: Dict[str, Any] = Body(...), db: Session = Depends(get_db)):
     """
-    Extract relevant tags from the text using a simple keyword extraction approach.
+    Generate tags for many PDFs, streaming one NDJSON line per PDF as it finishes.
     
-    Args:
-        text: The text to extract tags from
-        max_tags: Maximum number of tags to extract
-        
-    Returns:
-        A list of extracted tags
+    Body: {"pdf_ids": [...]} or {"folder_id": id} (-1 for unfiled), plus
+    optional "max_tags" and "apply". Stored text is used where it exists;
+    other files are parsed concurrently in the extraction pool. With
+    "apply": true the generated tags are added to each PDF's tags in one
+    transaction after the last result, and a final summary line reports it.
     """
+    pdf_ids = data.get("pdf_ids")
     try:
-        # Check if there's enough text to process
-        if not text or len(text.strip()) < 50:
-            logger.warning("Text is too short for meaningful tag extraction")
-            return []
-            
-        # Clean and normalize the text
-        text = text.lower()
+        if pdf_ids is not None and not isinstance(pdf_ids, list):
+            raise TypeError("pdf_ids must be a list")
+        pdf_ids = [int(pdf_id) for pdf_id in pdf_ids or []]
+        folder_id = None if data.get("folder_id") is None else int(data["folder_id"])
+        max_tags = int(data.get("max_tags", 5))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="pdf_ids must be a list of integers; folder_id and max_tags integers")
+    if max_tags < 1:
+        raise HTTPException(status_code=400, detail="max_tags must be at least 1")
+    apply = bool(data.get("apply", False))
+    
+    query = db.query(PDF)
+    if pdf_ids:
+        query = query.filter(PDF.id.in_(pdf_ids))
+    elif folder_id is not None:
+        query = query.filter(PDF.folder_id.is_(None) if folder_id == -1 else PDF.folder_id == folder_id)
+    else:
+        raise HTTPException(status_code=400, detail="pdf_ids or folder_id is required")
+    pdfs = query.order_by(PDF.id).all()
+    
+    logger.info(f"Generating tags for {len(pdfs)} PDFs (apply: {apply})")
+    
+    # Corpus statistics are read once for the whole batch
+    documents = tagger.corpus_size(db)
+    frequencies = tagger.load_frequencies(db) if len(pdfs) >= PRELOAD_FREQUENCIES_AT else None
+    
+    def result_line(pdf: PDF, pages: Optional[List[str]], error: Optional[str] = None) -> Dict[str, Any]:
+        run = tag_pages(db, pages, max_tags, frequencies, documents) if pages else tagger.TagRun()
+        tags = run.tags
+        source = "text"
+        if not tags:
+            tags = generate_tags_from_filename(pdf.filename, max_tags)
+            source = "filename"
+        result = {"pdf_id": pdf.id, "filename": pdf.filename, "tags": tags, "source": source,
+                  "pages_used": run.pages}
+        if error:
+            result["error"] = error
+        return result
+    
+    async def results():
+        generated: Dict[int, List[str]] = {}
         
-        # List of common stop words to exclude
-        stop_words = set([
-            "the", "and", "a", "to", "of", "in", "is", "it", "that", "for", 
-            "on", "with", "as", "this", "by", "an", "be", "are", "or", "at",
-            "from", "was", "were", "have", "has", "had", "not", "but", "what",
-            "all", "when", "who", "which", "can", "their", "will", "would", "could",
-            "should", "did", "do", "does", "they", "them", "these", "those", "there",
-            "here", "page", "pdf", "document", "also", "may", "one", "two", "three",
-            "first", "second", "third", "see", "use", "used", "using", "like", "make",
-            "made", "making"
-        ])
+        def emit(result: Dict[str, Any]) -> str:
+            generated[result["pdf_id"]] = result["tags"]
+            return json.dumps(result) + "\n"
         
-        # Split into words and count frequencies
-        words = text.split()
-        word_counts = {}
+        # Legacy rows that were never hashed: hash them concurrently, then
+        # they are looked up and parsed like the others
+        legacy = [pdf for pdf in pdfs if not pdf.checksum]
+        rehashed = set()
+        unreadable: Dict[int, str] = {}
+        if legacy:
+            found = await asyncio.gather(
+                *(run_in_threadpool(read_metadata, upload_path(pdf.path)) for pdf in legacy),
+                return_exceptions=True
+            )
+            for pdf, metadata in zip(legacy, found):
+                if isinstance(metadata, Exception):
+                    unreadable[pdf.id] = str(metadata) or type(metadata).__name__
+                    continue
+                pdf.size = metadata.size
+                pdf.file_mtime = metadata.mtime
+                pdf.checksum = metadata.checksum
+                rehashed.add(pdf.id)
+            if rehashed:
+                # Listings show the size
+                bump_catalog_version(db)
+                db.commit()
         
-        for word in words:
-            # Clean the word
-            word = word.strip(".,!?;:()[]{}\"'")
-            
-            # Skip short words, numbers, and stop words
-            if len(word) < 3 or word.isdigit() or word in stop_words:
-                continue
-                
-            if word in word_counts:
-                word_counts[word] += 1
+        # Files parsed before: one query for all of them, no parsing
+        stored = text_store.get_pages_many(db, (pdf.checksum for pdf in pdfs))
+        by_checksum: Dict[str, List[PDF]] = {}
+        for pdf in pdfs:
+            if pdf.id in unreadable:
+                yield emit(await run_in_threadpool(result_line, pdf, None, unreadable[pdf.id]))
+            elif pdf.checksum in stored:
+                yield emit(await run_in_threadpool(result_line, pdf, stored[pdf.checksum]))
             else:
-                word_counts[word] = 1
+                by_checksum.setdefault(pdf.checksum, []).append(pdf)
         
-        # Sort by frequency and take the top words
-        sorted_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
+        def store(checksum: str, extracted):
+            text_store.save_extraction_once(db, checksum, extracted)
+            for pdf in by_checksum[checksum]:
+                if pdf.id in rehashed:
+                    # Keep search in step with the new contents
+                    search_index.set_content(db, pdf.id, "\n".join(extracted.pages))
+            db.commit()
         
-        # Take the top words as tags
-        tags = [word for word, count in sorted_words[:max_tags]]
+        # Everything else is parsed concurrently, one job per distinct file
+        async def parse(checksum: str):
+            try:
+                path = upload_path(by_checksum[checksum][0].path)
+                return checksum, await extraction.extract(path), None
+            except Exception as e:
+                return checksum, None, str(e) or type(e).__name__
         
-        logger.info(f"Extracted {len(tags)} tags from text")
-        return tags
+        jobs = [asyncio.ensure_future(parse(checksum)) for checksum in by_checksum]
+        try:
+            for job in asyncio.as_completed(jobs):
+                checksum, extracted, error = await job
+                if extracted is not None:
+                    await run_in_threadpool(store, checksum, extracted)
+                pages = extracted.pages if extracted is not None else None
+                for pdf in by_checksum[checksum]:
+                    yield emit(await run_in_threadpool(result_line, pdf, pages, error))
+        finally:
+            # Client went away: withdraw the files no worker has started on
+            for job in jobs:
+                job.cancel()
         
+        if apply:
+            applied = 0
+            try:
+                merged = {
+                    pdf.id: parse_tags(pdf.tags) + generated[pdf.id]
+                    for pdf in pdfs if generated.get(pdf.id)
+                }
+                # One lookup for every tag involved, then no per-PDF queries
+                tag_rows = upsert_tags(db, clean_tag_names(tag for tags in merged.values() for tag in tags))
+                for pdf in pdfs:
+                    if pdf.id in merged:
+                        set_pdf_tags(db, pdf, merged[pdf.id], tag_rows)
+                        applied += 1
+                bump_catalog_version(db)
+                db.commit()
+                yield json.dumps({"done": True, "applied": applied}) + "\n"
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error applying generated tags: {str(e)}")
+                yield json.dumps({"done": True, "applied": 0, "error": str(e)}) + "\n"
+        else:
+            yield json.dumps({"done": True, "applied": 0}) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def tag_pages(db: Session, pages: Iterable[str], max_tags: int = 5,
+              frequencies: Optional[Dict[str, int]] = None,
+              documents: Optional[int] = None) -> tagger.TagRun:
+    """
+    Tag a document from its pages as they stream in, within the configured
+    tagging budgets. Fewer than 50 characters of text give no tags.
+    """
+    try:
+        run = tagger.suggest_tags_streaming(
+            db, pages, max_tags, frequencies, documents,
+            max_pages=settings.TAG_MAX_PAGES,
+            max_chars=settings.TAG_MAX_CHARS,
+            time_budget=settings.TAG_TIME_BUDGET_SECONDS,
+        )
     except Exception as e:
         logger.error(f"Error extracting tags: {str(e)}")
-        return []
+        return tagger.TagRun()
+    
+    if run.characters < 50:
+        logger.warning("Text is too short for meaningful tag extraction")
+        run.tags = []
+    logger.info(f"Extracted {len(run.tags)} tags from {run.pages} pages")
+    return run
+
+def tag_stored_text(db: Session, pdf: PDF) -> Tuple[tagger.TagRun, Dict[str, Any]]:
+    """Tag a PDF from its stored pages and report the coverage (blocking)"""
+    run = tag_pages(db, text_store.iter_stored_pages(db, pdf.checksum))
+    return run, tag_coverage(db, pdf, run)
+
+def tag_coverage(db: Session, pdf: PDF, run: tagger.TagRun) -> Dict[str, Any]:
+    """How much of a PDF's text a tagging run was based on"""
+    document = text_store.get_document(db, pdf.checksum)
+    page_count = document.page_count if document else text_store.stored_page_count(db, pdf.checksum)
+    extraction_stopped = document.stopped if document else None
+    return {
+        "pages_used": run.pages,
+        "page_count": page_count,
+        "characters_used": run.characters,
+        "stopped": run.stopped,
+        "extraction_stopped": extraction_stopped,
+        "complete": run.stopped is None and extraction_stopped is None,
+    }
 
 def generate_tags_from_filename(filename: str, max_tags: int = 5) -> List[str]:
     """
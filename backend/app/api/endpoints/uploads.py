@@ -0,0 +1,129 @@
+# app/api/endpoints/uploads.py
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+import traceback
+
+from app.core.database import get_db
+from app.api.ingest import create_pdf_from_staged, parse_folder_id
+from app.api.projections import parse_tags, serialize_pdf
+from services import upload_sessions
+from services.storage import discard_staged
+from services.upload_sessions import UploadSession, UploadSessionError
+
+router = APIRouter()
+
+
+def session_status(session: UploadSession) -> Dict[str, Any]:
+    received = upload_sessions.received_chunks(session)
+    return {
+        "upload_id": session.id,
+        "filename": session.filename,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "chunk_count": session.chunk_count,
+        "received": received,
+        "missing": upload_sessions.missing_chunks(session),
+        "complete": len(received) == session.chunk_count,
+    }
+
+
+def get_session(upload_id: str) -> UploadSession:
+    session = upload_sessions.load_session(upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/")
+async def create_upload(data: Dict[str, Any] = Body(...)):
+    """
+    Start a resumable upload.
+
+    Body: {"filename", "size", "chunk_size" (optional), "tags", "folder_id"}.
+    The response says how to split the file; PUT each chunk to
+    /uploads/{upload_id}/chunks/{index}, then POST /uploads/{upload_id}/complete.
+    """
+    filename = data.get("filename")
+    size = data.get("size")
+    print(f"Starting resumable upload for {filename} ({size} bytes)")
+
+    if not filename or not isinstance(size, int):
+        raise HTTPException(status_code=400, detail="filename and size are required")
+    if not filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    tags = data.get("tags", "")
+    if isinstance(tags, list):
+        tags = ",".join(tags)
+    folder_id = data.get("folder_id")
+
+    try:
+        session = await run_in_threadpool(
+            upload_sessions.create_session,
+            filename, size, data.get("chunk_size"), tags,
+            str(folder_id) if folder_id is not None else None
+        )
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return session_status(session)
+
+
+@router.get("/{upload_id}")
+async def get_upload(upload_id: str):
+    """Which chunks the server already has; resume by sending the missing ones"""
+    session = get_session(upload_id)
+    return await run_in_threadpool(session_status, session)
+
+
+@router.put("/{upload_id}/chunks/{index}")
+async def put_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    offset: Optional[int] = Query(None, ge=0)
+):
+    """
+    Upload one chunk as the raw request body. Chunks can be sent in any order,
+    in parallel, and resent after a failure.
+    """
+    session = get_session(upload_id)
+    try:
+        written = await upload_sessions.write_chunk(session, index, request.stream(), offset)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"upload_id": upload_id, "index": index, "size": written}
+
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Assemble a fully received upload and create its PDF record"""
+    session = get_session(upload_id)
+    try:
+        staged = await run_in_threadpool(upload_sessions.finish_session, session)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    print(f"Resumable upload {upload_id} complete: {staged.size} bytes, sha256 {staged.checksum}")
+
+    try:
+        pdf = await create_pdf_from_staged(
+            db, staged, session.filename, parse_tags(session.tags), parse_folder_id(session.folder_id)
+        )
+        print(f"PDF record created with ID: {pdf.id}, tags: {pdf.tags}")
+        return serialize_pdf(db, pdf)
+    except Exception as e:
+        print(f"Error creating database record: {str(e)}")
+        print(traceback.format_exc())
+        await run_in_threadpool(discard_staged, staged.tmp_path)
+        raise HTTPException(status_code=500, detail=f"Error creating database record: {str(e)}")
+
+
+@router.delete("/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Abandon a resumable upload and free its space"""
+    if not await run_in_threadpool(upload_sessions.delete_session, upload_id):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return {"status": "success", "upload_id": upload_id}
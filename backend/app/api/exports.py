@@ -0,0 +1,51 @@
+# app/api/exports.py
+"""
+ZIP downloads of several PDFs at once (a selection or a folder).
+
+Files are resolved through ``file_locations`` like /view and /download,
+and checked before the response starts, so the database session is finished
+before the first byte goes out and a missing file is reported instead of
+silently left out: the ids of PDFs whose file is gone are listed in the
+``X-Skipped-PDFs`` header, and an export left with no file at all is a 404. The
+archive is then written by ``services.zip_stream`` while it is sent, from
+the files themselves.
+"""
+from typing import List
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.file_locations import file_locations, stat_file
+from services.zip_stream import stream_zip, unique_names
+
+SKIPPED_HEADER = "X-Skipped-PDFs"
+
+
+def export_response(db: Session, pdf_ids: List[int], archive_name: str) -> StreamingResponse:
+    """Stream a ZIP of the files of these PDFs, in this order, as ``archive_name``.zip"""
+    locations = file_locations.locate_many(db, pdf_ids)
+    found, skipped = [], []
+    for pdf_id in dict.fromkeys(pdf_ids):
+        location = locations.get(pdf_id)
+        if location is None:
+            continue
+        if stat_file(location.path) is None:
+            skipped.append(pdf_id)
+        else:
+            found.append(location)
+    if pdf_ids and not found:
+        detail = "PDF files not found on server" if skipped else "No PDFs found with the specified IDs"
+        raise HTTPException(status_code=404, detail=detail)
+
+    names = unique_names(location.filename for location in found)
+    headers = {"Content-Disposition": f"attachment; filename*=utf-8''{quote(archive_name + '.zip')}"}
+    if skipped:
+        print(f"Exporting without the missing files of PDFs {skipped}")
+        headers[SKIPPED_HEADER] = ",".join(str(pdf_id) for pdf_id in skipped)
+    return StreamingResponse(
+        stream_zip([(name, location.path) for name, location in zip(names, found)]),
+        media_type="application/zip",
+        headers=headers,
+    )
@@ -0,0 +1,175 @@
+# app/api/file_locations.py
+"""
+Where each PDF's file lives.
+
+``pdfs.path`` holds one canonical location per PDF: "uploads/..." for files
+under the upload directory (the blob store included), otherwise an
+absolute path. Migration 0009 rewrote older forms once - absolute paths
+into the upload directory, Windows separators, bare filenames, files found
+in one of the directories the old code probed - so resolving a PDF is
+string work only: no probing and no ``exists()`` calls. Serving stats the
+file once and hands that stat to the response.
+
+The file delivery endpoints look PDFs up by id through an in-process
+cache (LRU, bounded) of path, filename and checksum. Deleting, renaming or
+relocating a PDF bumps the catalog version; the cache is cleared when this
+process commits a bump (``local_version``, no query) and when the shared
+version, re-read at most every ``SHARED_VERSION_INTERVAL`` seconds, shows
+that another process did.
+"""
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.api.catalog_version import current_version, local_version
+from app.core.config import settings
+from app.models.pdf import PDF
+from services.storage import canonical_path, read_metadata, upload_path
+
+# PDF ids whose location is kept
+CACHE_SIZE = 4096
+
+# Seconds a cached location may miss a change committed by another process
+SHARED_VERSION_INTERVAL = 1.0
+
+
+class FileLocation(NamedTuple):
+    path: str  # Absolute
+    filename: str
+    checksum: Optional[str]
+
+
+def stat_file(path: str) -> Optional[os.stat_result]:
+    """One stat of a file about to be served; None if it is missing"""
+    try:
+        result = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return result if stat.S_ISREG(result.st_mode) else None
+
+
+def is_versioned(location: FileLocation, version: Optional[str]) -> bool:
+    """Whether a ``v`` query parameter names the PDF's current contents (a checksum prefix)"""
+    return bool(location.checksum) and version == location.checksum[:16]
+
+
+def content_checksum(location: FileLocation) -> Optional[str]:
+    """
+    Checksum naming the PDF's contents: the recorded one, or for rows from
+    before checksums were recorded, a hash of the file (blocking; None if
+    it is missing)
+    """
+    if location.checksum:
+        return location.checksum
+    path = location.path
+    try:
+        return read_metadata(path).checksum
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+class FileLocationCache:
+    def __init__(self, size: int = CACHE_SIZE, shared_interval: float = SHARED_VERSION_INTERVAL):
+        self.size = size
+        self.shared_interval = shared_interval
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[int, FileLocation]" = OrderedDict()
+        self._stamp: Tuple[int, int] = (-1, -1)
+        self._shared_version = -1
+        self._shared_checked = 0.0
+
+    def _current_stamp(self, db: Session) -> Tuple[int, int]:
+        local = local_version()
+        if time.monotonic() - self._shared_checked >= self.shared_interval:
+            self._shared_version = current_version(db)
+            self._shared_checked = time.monotonic()
+        return local, self._shared_version
+
+    def locate(self, db: Session, pdf_id: int) -> Optional[FileLocation]:
+        """Location of a PDF's file by id, or None if there is no such PDF"""
+        return self.locate_many(db, [pdf_id]).get(pdf_id)
+
+    def locate_many(self, db: Session, pdf_ids: Iterable[int]) -> Dict[int, FileLocation]:
+        """Locations of several PDFs' files by id (one query for the misses); unknown ids are left out"""
+        stamp = self._current_stamp(db)
+        found: Dict[int, FileLocation] = {}
+        missing = []
+        with self._lock:
+            if stamp != self._stamp:
+                self._files.clear()
+                self._stamp = stamp
+            for pdf_id in dict.fromkeys(pdf_ids):
+                location = self._files.get(pdf_id)
+                if location is None:
+                    missing.append(pdf_id)
+                else:
+                    self._files.move_to_end(pdf_id)
+                    found[pdf_id] = location
+        if not missing:
+            return found
+
+        rows = db.query(PDF.id, PDF.path, PDF.filename, PDF.checksum).filter(PDF.id.in_(missing))
+        loaded = {row.id: FileLocation(upload_path(row.path), row.filename, row.checksum) for row in rows}
+        with self._lock:
+            # Not if a bump was committed since the rows were read
+            if stamp == self._stamp and local_version() == stamp[0]:
+                for pdf_id, location in loaded.items():
+                    self._files[pdf_id] = location
+                while len(self._files) > self.size:
+                    self._files.popitem(last=False)
+        found.update(loaded)
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._stamp = (-1, -1)
+            self._shared_checked = 0.0
+
+
+file_locations = FileLocationCache()
+
+
+def legacy_candidates(stored_path: str) -> List[str]:
+    """Where older versions of the app may have put a file (checked once, by the migration)"""
+    name = os.path.basename(stored_path.replace("\\", "/"))
+    upload_dir = str(settings.UPLOAD_DIR)
+    return [
+        os.path.join(upload_dir, name),
+        os.path.join(upload_dir, "pdfs", name),
+        os.path.join(upload_dir, "pdf", name),
+        os.path.join("/app/uploads", name),
+        os.path.join("/app/media/pdfs", name),
+        os.path.join("/app/static/pdfs", name),
+    ]
+
+
+def canonicalize_paths(db: Session) -> int:
+    """
+    Rewrite every ``pdfs.path`` in canonical form, relocating files that
+    are missing where recorded but present where older code put them.
+    Returns how many rows changed (caller commits).
+    """
+    from app.api.catalog_version import bump_catalog_version
+
+    changed = 0
+    for pdf in db.query(PDF).filter(PDF.path.isnot(None)):
+        path = canonical_path(pdf.path)
+        if not os.path.isfile(upload_path(path)):
+            found = next((candidate for candidate in legacy_candidates(pdf.path) if os.path.isfile(candidate)), None)
+            if found:
+                path = canonical_path(found)
+            else:
+                print(f"PDF {pdf.id}: file not found at {pdf.path}")
+        if path != pdf.path:
+            print(f"PDF {pdf.id}: {pdf.path} -> {path}")
+            pdf.path = path
+            changed += 1
+    if changed:
+        bump_catalog_version(db)
+    return changed
@@ -0,0 +1,253 @@
+# app/api/file_responses.py
+"""
+File delivery with HTTP range requests (RFC 9110 section 14).
+
+``RangeFileResponse`` is Starlette's FileResponse plus ``Range`` handling:
+a single range is answered with 206 and Content-Range, several with a
+multipart/byteranges body, an unsatisfiable one with 416. ``If-Range``
+falls back to the whole file when the client's copy is stale. A client
+whose copy is current (``If-None-Match``, or ``If-Modified-Since`` without
+it) gets a 304 and no body.
+
+``UploadFiles`` serves the /uploads mount with the same responses.
+Content-addressed blobs there get their checksum as ETag and may be cached
+for good.
+
+Bodies are sent in fixed-size chunks, so memory stays constant whatever the
+file size. When the server offers the ASGI zero-copy send extension the
+file descriptor is handed over instead and the kernel copies the bytes
+(sendfile).
+"""
+import os
+import re
+import secrets
+import stat
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import PathLike, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.api.conditional import file_cache_headers, if_none_match_holds
+from services.blob_store import blob_checksum
+
+# More ranges than this in one request are answered with the whole file
+MAX_RANGES = 64
+
+# Headers a 304 repeats from the response it stands for
+_NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "etag", "expires", "last-modified", "vary")
+
+_RANGE_SPEC = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Byte ranges of a Range header as sorted, merged (start, end) pairs with
+    an inclusive end. None means serve the whole file (not a byte range,
+    malformed, or too many ranges); RangeNotSatisfiable means no range
+    overlaps the file.
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+    specs = specs.split(",")
+    if len(specs) > MAX_RANGES:
+        return None
+    ranges = []
+    for spec in specs:
+        match = _RANGE_SPEC.match(spec)
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+        else:
+            start = int(first)
+            end = size - 1 if last == "" else min(int(last), size - 1)
+            if last != "" and int(last) < start:
+                return None
+            if start < size:
+                ranges.append((start, end))
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that honours Range and If-Range and advertises Accept-Ranges"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(self.stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(self.stat_result)
+        self.headers["accept-ranges"] = "bytes"
+        size = self.stat_result.st_size
+
+        request_headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        if self.status_code == 200 and self._client_copy_current(scope, request_headers):
+            await self._send_not_modified(send)
+            return
+
+        ranges = None
+        if "range" in request_headers and self.status_code == 200 and self._if_range_holds(request_headers):
+            try:
+                ranges = parse_range(request_headers["range"], size)
+            except RangeNotSatisfiable:
+                await self._send_unsatisfiable(send, size)
+                return
+
+        if ranges is None:
+            await self._start(send, self.status_code)
+            await self._send_ranges(scope, send, [(0, size - 1)] if size else [])
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(end - start + 1)
+            await self._start(send, 206)
+            await self._send_ranges(scope, send, ranges)
+        else:
+            await self._send_multipart(scope, send, ranges, size)
+
+        if self.background is not None:
+            await self.background()
+
+    def _client_copy_current(self, scope: Scope, request_headers: dict) -> bool:
+        if scope.get("method", "GET") not in ("GET", "HEAD"):
+            return False
+        # If-None-Match wins; If-Modified-Since only counts without it
+        if "if-none-match" in request_headers:
+            return if_none_match_holds(request_headers["if-none-match"], self.headers.get("etag", ""))
+        if "if-modified-since" not in request_headers:
+            return False
+        try:
+            since = parsedate_to_datetime(request_headers["if-modified-since"]).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(self.stat_result.st_mtime) <= since
+
+    async def _send_not_modified(self, send: Send):
+        headers = [(key, value) for key, value in self.raw_headers if key.decode("latin-1") in _NOT_MODIFIED_HEADERS]
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+    def _if_range_holds(self, request_headers: dict) -> bool:
+        # If-Range: only honour Range when the client's copy is this version
+        validator = request_headers.get("if-range")
+        if not validator:
+            return True
+        validator = validator.strip()
+        if validator.startswith('"') or validator.startswith("W/"):
+            etag = self.headers.get("etag", "")
+            return not validator.startswith("W/") and validator.strip('"') == etag.strip('"')
+        try:
+            since = parsedate_to_datetime(validator).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(self.stat_result.st_mtime) <= since
+
+    async def _start(self, send: Send, status: int):
+        await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+
+    async def _send_unsatisfiable(self, send: Send, size: int):
+        self.headers["content-range"] = f"bytes */{size}"
+        self.headers["content-length"] = "0"
+        await self._start(send, 416)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_multipart(self, scope: Scope, send: Send, ranges: List[Tuple[int, int]], size: int):
+        boundary = secrets.token_hex(16)
+        content_type = self.media_type or "application/octet-stream"
+        parts = [
+            (
+                f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode("latin-1")
+            for start, end in ranges
+        ]
+        closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+        length = sum(len(part) for part in parts) + sum(end - start + 1 for start, end in ranges)
+        length += 2 * (len(ranges) - 1) + len(closing)
+
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(length)
+        await self._start(send, 206)
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        for index, (part, byte_range) in enumerate(zip(parts, ranges)):
+            # Each part after the first starts on a new line
+            prefix = b"\r\n" if index else b""
+            await send({"type": "http.response.body", "body": prefix + part, "more_body": True})
+            await self._send_ranges(scope, send, [byte_range], last=False)
+        await send({"type": "http.response.body", "body": closing, "more_body": False})
+
+    async def _send_ranges(self, scope: Scope, send: Send, ranges: List[Tuple[int, int]], last: bool = True):
+        if self.send_header_only or not ranges:
+            if last:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                for index, (start, end) in enumerate(ranges):
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": file.fileno(),
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": not last or index < len(ranges) - 1,
+                    })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for index, (start, end) in enumerate(ranges):
+                await file.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"File at path {self.path} shrank while it was sent.")
+                    remaining -= len(chunk)
+                    more_body = not last or remaining > 0 or index < len(ranges) - 1
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class UploadFiles(StaticFiles):
+    """The /uploads mount, served with RangeFileResponse and content validators"""
+
+    def file_response(self, full_path: PathLike, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        checksum = blob_checksum(str(full_path))
+        return RangeFileResponse(
+            full_path,
+            status_code=status_code,
+            headers=file_cache_headers(checksum, immutable=checksum is not None),
+            stat_result=stat_result,
+            method=scope["method"],
+        )
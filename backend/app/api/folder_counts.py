@@ -0,0 +1,55 @@
+# app/api/folder_counts.py
+"""
+PDF counts per folder.
+
+Counts come from a single ``GROUP BY folder_id`` query and are cached
+in-process, stamped with the catalog version they were computed at. Every
+endpoint that adds, moves or removes PDFs (or deletes a folder) bumps the
+catalog version, so the next read recomputes; between mutations the sidebar
+costs one primary-key lookup.
+"""
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.api.catalog_version import current_version
+from app.core.config import settings
+from app.models.pdf import PDF
+
+
+def count_by_folder(db: Session) -> Dict[Optional[int], int]:
+    """PDF count keyed by folder_id (None holds the unfiled count)"""
+    rows = db.query(PDF.folder_id, func.count(PDF.id)).group_by(PDF.folder_id).all()
+    return {folder_id: count for folder_id, count in rows}
+
+
+class FolderCountCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Optional[Dict[Optional[int], int]] = None
+        self._counts_version = -1
+
+    def get(self, db: Session, version: Optional[int] = None) -> Dict[Optional[int], int]:
+        """Counts as of the given (or current) catalog version"""
+        if not settings.FOLDER_COUNT_CACHE:
+            return count_by_folder(db)
+
+        if version is None:
+            version = current_version(db)
+        with self._lock:
+            if self._counts is not None and self._counts_version == version:
+                return self._counts
+
+        counts = count_by_folder(db)
+
+        with self._lock:
+            # Never replace counts from a newer version with older ones
+            if version >= self._counts_version:
+                self._counts = counts
+                self._counts_version = version
+        return counts
+
+
+folder_counts = FolderCountCache()
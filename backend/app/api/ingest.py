@@ -0,0 +1,147 @@
+# app/api/ingest.py
+"""
+Turns received files into PDF rows.
+
+Uploads are staged and hashed by ``services.storage``, then moved to their
+content address by ``services.blob_store``. Here the PDF row is created
+against that blob, its tags are written and its text is indexed. A file whose
+content is already stored is never written twice, nor parsed twice.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.api.catalog_version import bump_catalog_version
+from app.api.tag_sync import clean_tag_names, set_pdf_tags, upsert_tags
+from app.models.blob import Blob
+from app.models.pdf import PDF
+from app.models.tag import Tag
+from services import search_index, text_store
+from services.blob_store import PlacedBlob, acquire_blobs, discard_placed, place_staged
+from services.blob_store import remove_orphaned_files, settle_placed
+from services.pdf_processor import extraction
+from services.storage import StagedUpload, upload_path
+
+
+def parse_folder_id(folder_id) -> Optional[int]:
+    """Folder ids arrive as form strings or JSON values; anything but a number means unfiled"""
+    if folder_id is not None and str(folder_id).isdigit():
+        return int(folder_id)
+    return None
+
+
+def add_pdf(db: Session, blob: Blob, filename: str, tags: Iterable[str],
+            folder_id: Optional[int], mtime=None,
+            tag_rows: Optional[Dict[str, Tag]] = None) -> PDF:
+    """Create a PDF row that references ``blob`` (caller bumps and commits)"""
+    pdf = PDF(
+        filename=filename,
+        path=blob.path,
+        folder_id=folder_id,
+        blob=blob,
+        size=blob.size,  # Store the file metadata so reads never stat()
+        file_mtime=mtime,
+        checksum=blob.checksum,
+    )
+    db.add(pdf)
+    # Tags go to the tags string and the pdf_tags table in the same commit
+    set_pdf_tags(db, pdf, tags, tag_rows)
+    return pdf
+
+
+async def index_texts(db: Session, pdfs: List[PDF]):
+    """
+    Store the text of newly added PDFs, per page and in the search index,
+    with one commit.
+
+    Content that was parsed before (the same file uploaded again) reuses its
+    stored pages; every other file is parsed once, concurrently, in the
+    extraction process pool. Failures are logged and leave a PDF searchable
+    by filename and tags only.
+    """
+    if not pdfs:
+        return
+    try:
+        paths = {pdf.checksum: pdf.path for pdf in pdfs}
+        pages = text_store.get_pages_many(db, paths)
+
+        to_extract = sorted(set(paths) - set(pages))
+        extracted = await asyncio.gather(
+            *(extraction.extract(upload_path(paths[checksum])) for checksum in to_extract), return_exceptions=True
+        )
+        for checksum, result in zip(to_extract, extracted):
+            if isinstance(result, Exception):
+                print(f"Error extracting text from {paths[checksum]}: {str(result)}")
+                continue
+            if not result.complete:
+                print(f"Stored {len(result.pages)} of {result.page_count} pages of {paths[checksum]} "
+                      f"(extraction {result.stopped} budget reached)")
+            pages[checksum] = result.pages
+            text_store.save_extraction(db, checksum, result)
+
+        for pdf in pdfs:
+            if pdf.checksum in pages:
+                search_index.set_content(db, pdf.id, "\n".join(pages[pdf.checksum]))
+        bump_catalog_version(db)
+        db.commit()
+        print(f"Indexed text for {len(pdfs)} PDFs ({len(to_extract)} files parsed)")
+    except Exception as e:
+        db.rollback()
+        print(f"Error indexing text for PDFs {[pdf.id for pdf in pdfs]}: {str(e)}")
+
+
+async def create_pdfs_from_staged(db: Session, uploads: List[Tuple[StagedUpload, str]],
+                                  tags: Iterable[str], folder_id: Optional[int]) -> List[PDF]:
+    """
+    Store staged uploads (deduplicated by content) and add their PDF rows in
+    a single transaction: one tag upsert, one blob lookup and one commit for
+    the whole batch. On failure no rows are written and files stored only for
+    this batch are removed.
+    """
+    placed: List[PlacedBlob] = await asyncio.gather(
+        *(run_in_threadpool(place_staged, staged) for staged, _ in uploads), return_exceptions=True
+    )
+    failed = [item for item in placed if isinstance(item, Exception)]
+    if failed:
+        placed = [item for item in placed if not isinstance(item, Exception)]
+        remove_orphaned_files(db, {item.path for item in placed if item.created})
+        discard_placed(placed)
+        raise failed[0]
+
+    try:
+        names = clean_tag_names(tags)
+        tag_rows = upsert_tags(db, names)
+        blobs = acquire_blobs(db, [(item.checksum, item.size, item.path) for item in placed])
+        pdfs = [
+            add_pdf(db, blobs[item.checksum], filename, names, folder_id,
+                    mtime=item.mtime, tag_rows=tag_rows)
+            for item, (_, filename) in zip(placed, uploads)
+        ]
+        bump_catalog_version(db)
+        db.flush()
+        pdf_ids = [pdf.id for pdf in pdfs]
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Only remove files that no other PDF has come to reference
+        remove_orphaned_files(db, {item.path for item in placed if item.created})
+        discard_placed(placed)
+        raise
+    # Only now can a concurrent delete no longer take the stored files away
+    await run_in_threadpool(settle_placed, placed)
+
+    # Reload the committed rows with one query instead of a refresh per PDF
+    loaded = {pdf.id: pdf for pdf in db.query(PDF).filter(PDF.id.in_(pdf_ids))}
+    pdfs = [loaded[pdf_id] for pdf_id in pdf_ids]
+    await index_texts(db, pdfs)
+    return pdfs
+
+
+async def create_pdf_from_staged(db: Session, staged: StagedUpload, filename: str,
+                                 tags: Iterable[str], folder_id: Optional[int]) -> PDF:
+    """Store a staged upload (deduplicated by content) and add its PDF row"""
+    pdfs = await create_pdfs_from_staged(db, [(staged, filename)], tags, folder_id)
+    print(f"Stored {filename} as {pdfs[0].path}")
+    return pdfs[0]
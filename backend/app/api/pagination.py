@@ -0,0 +1,45 @@
+# app/api/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip when streaming a listing
+STREAM_BATCH_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, pdf_id: int, rank: Optional[float] = None) -> str:
+    """Build an opaque cursor pointing just past the given row"""
+    position = {"c": created_at.isoformat(), "i": pdf_id}
+    if rank is not None:
+        # Search results are ordered by relevance first
+        position["r"] = rank
+    payload = json.dumps(position, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, Optional[float]]:
+    """Turn a cursor from encode_cursor back into (created_at, id, rank)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        rank = payload.get("r")
+        return (
+            datetime.fromisoformat(payload["c"]),
+            int(payload["i"]),
+            float(rank) if rank is not None else None,
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a requested page size to the allowed range"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
@@ -4,13 +4,14 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 import os
 import mimetypes
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import logging
 import io
 
-# Import your database models and dependencies
-# from database import get_db, PDF
-# from auth import get_current_user
+from app.api.conditional import file_cache_headers
+from app.api.file_locations import file_locations, stat_file
+from app.api.file_responses import RangeFileResponse
+from app.core.database import SessionLocal
 
 router = APIRouter(prefix="/api/pdfs", tags=["pdfs"])
 
@@ -18,39 +19,22 @@ router = APIRouter(prefix="/api/pdfs", tags=["pdfs"])
 logger = logging.getLogger(__name__)
 
 # Helper function to find a PDF file
-def find_pdf_file(pdf_id: int) -> Optional[str]:
+def find_pdf_file(pdf_id: int) -> Optional[Tuple[str, os.stat_result, Optional[str]]]:
     """
-    Try multiple locations to find a PDF file
+    Location, stat and content checksum of a PDF's file from its canonical
+    stored path (see app.api.file_locations); None if there is no such PDF or file
     """
-    # Get upload directory from environment or use a default
-    upload_dir = os.environ.get("UPLOAD_DIR", "/app/uploads")
-    
-    # List of possible file paths to check
-    possible_paths = [
-        os.path.join(upload_dir, "pdfs", f"{pdf_id}.pdf"),
-        os.path.join(upload_dir, "pdf", f"{pdf_id}.pdf"),
-        os.path.join(upload_dir, f"{pdf_id}.pdf"),
-        os.path.join("/app/media/pdfs", f"{pdf_id}.pdf"),
-        os.path.join("/app/static/pdfs", f"{pdf_id}.pdf"),
-    ]
-    
-    # Try database lookup first (commented out - uncomment and modify for your DB)
-    """
-    db = next(get_db())
-    pdf_record = db.query(PDF).filter(PDF.id == pdf_id).first()
-    if pdf_record and pdf_record.file_path:
-        custom_path = os.path.join(upload_dir, pdf_record.file_path)
-        possible_paths.insert(0, custom_path)
-    """
-    
-    # Check each path
-    for path in possible_paths:
-        if os.path.exists(path) and os.path.isfile(path):
-            logger.info(f"Found PDF {pdf_id} at path: {path}")
-            return path
-    
-    logger.warning(f"PDF {pdf_id} not found in any of the expected locations")
-    return None
+    db = SessionLocal()
+    try:
+        found = file_locations.locate(db, pdf_id)
+    finally:
+        db.close()
+    
+    file_stat = stat_file(found.path) if found is not None else None
+    if file_stat is None:
+        logger.warning(f"PDF {pdf_id} not found")
+        return None
+    return found.path, file_stat, found.checksum
 
 # View PDF endpoint - UPDATED for better browser compatibility
 @router.get("/{pdf_id}/view")
@@ -60,27 +44,31 @@ async def view_pdf(pdf_id: int, request: Request):
     """
     logger.info(f"View request for PDF {pdf_id}")
     
-    pdf_path = find_pdf_file(pdf_id)
-    if not pdf_path:
+    found = find_pdf_file(pdf_id)
+    if not found:
         logger.error(f"PDF {pdf_id} not found for viewing")
         raise HTTPException(status_code=404, detail="PDF not found")
     
+    pdf_path, pdf_stat, checksum = found
+    
     # Get filename from path
     filename = os.path.basename(pdf_path)
     
     logger.info(f"Serving PDF {pdf_id} for viewing from {pdf_path}")
     
     # Use more explicit headers to ensure browser displays the PDF
-    return FileResponse(
+    return RangeFileResponse(
         path=pdf_path, 
         media_type="application/pdf",
         headers={
             "Content-Disposition": f"inline; filename=\"{filename}\"",
-            "Content-Type": "application/pdf"
-        }
+            "Content-Type": "application/pdf",
+            **file_cache_headers(checksum)
+        },
+        stat_result=pdf_stat
     )
 
-# Alternative approach using StreamingResponse for viewing PDFs
+# Alternative streaming view (kept for frontends that use it)
 @router.get("/{pdf_id}/view2")
 async def view_pdf_streaming(pdf_id: int, request: Request):
     """
@@ -88,37 +76,29 @@ async def view_pdf_streaming(pdf_id: int, request: Request):
     """
     logger.info(f"Streaming view request for PDF {pdf_id}")
     
-    pdf_path = find_pdf_file(pdf_id)
-    if not pdf_path:
+    found = find_pdf_file(pdf_id)
+    if not found:
         logger.error(f"PDF {pdf_id} not found for streaming view")
         raise HTTPException(status_code=404, detail="PDF not found")
     
+    pdf_path, pdf_stat, checksum = found
+    
     # Get filename from path
     filename = os.path.basename(pdf_path)
     
-    # Read the file
-    try:
-        with open(pdf_path, "rb") as file:
-            file_content = file.read()
-        
-        # Create an async generator to stream the file
-        async def file_stream():
-            yield file_content
-        
-        logger.info(f"Streaming PDF {pdf_id} for viewing from {pdf_path}")
-        
-        # Return a streaming response
-        return StreamingResponse(
-            file_stream(),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"inline; filename=\"{filename}\"",
-                "Content-Type": "application/pdf"
-            }
-        )
-    except Exception as e:
-        logger.error(f"Error streaming PDF {pdf_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error streaming PDF: {str(e)}")
+    logger.info(f"Streaming PDF {pdf_id} for viewing from {pdf_path}")
+    
+    # Sent in chunks (never read whole into memory), honouring Range
+    return RangeFileResponse(
+        path=pdf_path,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"inline; filename=\"{filename}\"",
+            "Content-Type": "application/pdf",
+            **file_cache_headers(checksum)
+        },
+        stat_result=pdf_stat
+    )
 
 # Download PDF endpoint
 @router.get("/{pdf_id}/download")
@@ -128,21 +108,24 @@ async def download_pdf(pdf_id: int, request: Request):
     """
     logger.info(f"Download request for PDF {pdf_id}")
     
-    pdf_path = find_pdf_file(pdf_id)
-    if not pdf_path:
+    found = find_pdf_file(pdf_id)
+    if not found:
         logger.error(f"PDF {pdf_id} not found for download")
         raise HTTPException(status_code=404, detail="PDF not found")
     
+    pdf_path, pdf_stat, checksum = found
+    
     # Get filename from path or use a default
     filename = os.path.basename(pdf_path)
     if filename == f"{pdf_id}.pdf":
         filename = f"document_{pdf_id}.pdf"
     
     logger.info(f"Serving PDF {pdf_id} for download from {pdf_path}")
-    return FileResponse(
+    return RangeFileResponse(
         pdf_path, 
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=\"{filename}\""}
+        headers={"Content-Disposition": f"attachment; filename=\"{filename}\"", **file_cache_headers(checksum)},
+        stat_result=pdf_stat
     )
 
 # Alternative view endpoint (some frontends might use this format)
@@ -169,14 +152,16 @@ async def pdf_info(pdf_id: int, request: Request):
     """
     logger.info(f"Info request for PDF {pdf_id}")
     
-    pdf_path = find_pdf_file(pdf_id)
-    if not pdf_path:
+    found = find_pdf_file(pdf_id)
+    if not found:
         logger.error(f"PDF {pdf_id} not found for info")
         raise HTTPException(status_code=404, detail="PDF not found")
     
+    pdf_path, pdf_stat, _ = found
+    
     # Get file information
-    file_size = os.path.getsize(pdf_path)
-    file_modified = os.path.getmtime(pdf_path)
+    file_size = pdf_stat.st_size
+    file_modified = pdf_stat.st_mtime
     filename = os.path.basename(pdf_path)
     
     # Generate file URLs
@@ -0,0 +1,60 @@
+# app/api/projections.py
+"""
+Shared projection of PDF rows into API response dicts.
+
+Folder names are loaded with the rows (an outer join) or in one batched
+lookup, never with a query per PDF.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from app.models.folder import Folder
+from app.models.pdf import PDF
+from services.thumbnails import thumbnail_url
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Split the legacy comma-separated tags column into a clean list"""
+    if not tags or not tags.strip():
+        return []
+    return [tag.strip() for tag in tags.split(",") if tag.strip()]
+
+
+def pdf_to_dict(pdf: PDF, folder_name: Optional[str]) -> Dict[str, Any]:
+    """Project a PDF row and its already-loaded folder name into a response dict"""
+    return {
+        "id": pdf.id,
+        "filename": pdf.filename,
+        "path": pdf.path,
+        "tags": parse_tags(pdf.tags),
+        "folder_id": pdf.folder_id,
+        "folder_name": folder_name,
+        "created_at": pdf.created_at,
+        "size": pdf.size or 0,  # Recorded at upload, never stat()ed here
+        "thumbnail_url": thumbnail_url(pdf.id, pdf.checksum)
+    }
+
+
+def with_folder_names(db: Session) -> Query:
+    """Query yielding (PDF, folder name) pairs in a single round trip"""
+    return db.query(PDF, Folder.name).outerjoin(Folder, PDF.folder_id == Folder.id)
+
+
+def folder_name_map(db: Session, folder_ids: Iterable[Optional[int]]) -> Dict[int, str]:
+    """Look up the names of several folders with one query"""
+    ids = {folder_id for folder_id in folder_ids if folder_id is not None}
+    if not ids:
+        return {}
+    return dict(db.query(Folder.id, Folder.name).filter(Folder.id.in_(ids)).all())
+
+
+def serialize_pdfs(db: Session, pdfs: List[PDF]) -> List[Dict[str, Any]]:
+    """Project already-loaded PDF rows, resolving all folder names at once"""
+    names = folder_name_map(db, (pdf.folder_id for pdf in pdfs))
+    return [pdf_to_dict(pdf, names.get(pdf.folder_id)) for pdf in pdfs]
+
+
+def serialize_pdf(db: Session, pdf: PDF) -> Dict[str, Any]:
+    """Project a single PDF row"""
+    return serialize_pdfs(db, [pdf])[0]
@@ -1,9 +1,10 @@
 # app/api/router.py
 from fastapi import APIRouter
-from app.api.endpoints import folders, pdfs, tags
+from app.api.endpoints import folders, pdfs, tags, uploads
 
 api_router = APIRouter()
 
 api_router.include_router(folders.router, prefix="/folders", tags=["folders"])
+api_router.include_router(uploads.router, prefix="/pdfs/uploads", tags=["uploads"])
 api_router.include_router(pdfs.router, prefix="/pdfs", tags=["pdfs"])
 api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
\ No newline at end of file
@@ -0,0 +1,115 @@
+# app/api/tag_sync.py
+"""
+Keeps the legacy comma-separated ``PDF.tags`` column and the ``pdf_tags``
+association table in step, and builds index-backed tag filters.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import distinct, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.api.projections import parse_tags
+from app.models.pdf import PDF, pdf_tags
+from app.models.tag import Tag
+
+
+def clean_tag_names(tags: Iterable[str]) -> List[str]:
+    """Strip blanks and drop duplicates (case-insensitively), keeping order"""
+    seen = set()
+    names = []
+    for tag in tags:
+        name = tag.strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def upsert_tags(db: Session, names: List[str]) -> Dict[str, Tag]:
+    """Load or create Tag rows for the given names with one lookup query"""
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in db.query(Tag).filter(Tag.name.in_(names))}
+    for name in names:
+        if name not in tags:
+            tags[name] = Tag(name=name)
+            db.add(tags[name])
+    return tags
+
+
+def set_pdf_tags(db: Session, pdf: PDF, tags: Iterable[str],
+                 tag_rows: Optional[Dict[str, Tag]] = None) -> List[str]:
+    """
+    Replace a PDF's tags in both representations (caller commits).
+
+    Callers tagging many PDFs can pass the rows from one ``upsert_tags`` call
+    to skip the per-PDF lookup.
+    """
+    names = clean_tag_names(tags)
+    if tag_rows is None or any(name not in tag_rows for name in names):
+        tag_rows = upsert_tags(db, names)
+    pdf.tags = ",".join(names) if names else None
+    pdf.tag_objects = [tag_rows[name] for name in names]
+    return names
+
+
+def remove_tag_from_pdfs(db: Session, tag: Tag):
+    """Drop a tag from the legacy string of every PDF that carries it (caller commits)"""
+    for pdf in tag.pdfs:
+        pdf.tags = ",".join(name for name in parse_tags(pdf.tags) if name != tag.name) or None
+
+
+def tag_filter(names: List[str], match_all: bool = True) -> ColumnElement:
+    """
+    Criterion selecting PDFs tagged with all (or any) of the given names.
+
+    Written as a semi-join over pdf_tags so it is answered from the
+    (tag_id, pdf_id) index instead of scanning tag strings. Names compare
+    case-insensitively and whole-tag only ("math" never matches "mathematics").
+    """
+    lowered = sorted({name.lower() for name in names})
+    tagged = (
+        select(pdf_tags.c.pdf_id)
+        .join(Tag, Tag.id == pdf_tags.c.tag_id)
+        .where(func.lower(Tag.name).in_(lowered))
+    )
+    if match_all and len(lowered) > 1:
+        tagged = tagged.group_by(pdf_tags.c.pdf_id).having(
+            func.count(distinct(pdf_tags.c.tag_id)) == len(lowered)
+        )
+    return PDF.id.in_(tagged)
+
+
+def backfill_pdf_tags(db: Session, batch_size: int = 500) -> int:
+    """Rebuild pdf_tags from every PDF's tag string; returns links written"""
+    db.execute(pdf_tags.delete())
+    tag_ids = {name: tag_id for tag_id, name in db.query(Tag.id, Tag.name)}
+
+    written = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(PDF.id, PDF.tags)
+            .filter(PDF.id > last_id)
+            .order_by(PDF.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+
+        links = []
+        for pdf_id, tags in batch:
+            for name in clean_tag_names(parse_tags(tags)):
+                if name not in tag_ids:
+                    tag = Tag(name=name)
+                    db.add(tag)
+                    db.flush()
+                    tag_ids[name] = tag.id
+                links.append({"pdf_id": pdf_id, "tag_id": tag_ids[name]})
+        if links:
+            db.execute(pdf_tags.insert(), links)
+            written += len(links)
+        last_id = batch[-1][0]
+    return written
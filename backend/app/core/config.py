@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,6 +13,21 @@ class Settings(BaseSettings):
         "sqlite:///./pdf_manager.db"
     )
     
+    # Database engine profile. Database servers get the pool below; SQLite
+    # keeps DB_POOL_SIZE connections open (opening more as needed) and runs
+    # the PRAGMAs on each new one. WAL lets readers work alongside a writer,
+    # NORMAL sync is durable enough under WAL, and writers wait this long
+    # for the lock instead of failing with "database is locked".
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(16 * 1024)))
+    
     # Security - simple for development
     SECRET_KEY: str = os.getenv("SECRET_KEY", "development_key_for_testing")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
@@ -23,6 +39,48 @@ class Settings(BaseSettings):
     # Make sure the upload directory is an absolute path
     UPLOAD_DIR: Path = Path(os.path.join(os.getcwd(), "uploads")).resolve()
     
+    # Resumable uploads: default chunk size, largest accepted file and how
+    # long an idle upload session is kept before it is garbage-collected
+    RESUMABLE_CHUNK_SIZE: int = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", str(2 * 1024 * 1024 * 1024)))
+    UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+    
+    # PDF text extraction runs in a process pool: worker processes (0 runs it
+    # in the thread pool instead), per-file time limit and how many jobs may
+    # wait for a worker before callers queue up
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+    EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+    EXTRACTION_MAX_PENDING: int = int(os.getenv("EXTRACTION_MAX_PENDING", "32"))
+    
+    # How much of one file is extracted and stored: pages, characters and a
+    # wall-clock budget after which the pages read so far are kept (0 = no limit)
+    EXTRACTION_MAX_PAGES: int = int(os.getenv("EXTRACTION_MAX_PAGES", "2000"))
+    EXTRACTION_MAX_CHARS: int = int(os.getenv("EXTRACTION_MAX_CHARS", str(20 * 1000 * 1000)))
+    EXTRACTION_TIME_BUDGET_SECONDS: float = float(os.getenv("EXTRACTION_TIME_BUDGET_SECONDS", "60"))
+    
+    # How much stored text tag generation reads per PDF (0 = no limit); it
+    # stops sooner once the top tags stop changing
+    TAG_MAX_PAGES: int = int(os.getenv("TAG_MAX_PAGES", "200"))
+    TAG_MAX_CHARS: int = int(os.getenv("TAG_MAX_CHARS", str(1000 * 1000)))
+    TAG_TIME_BUDGET_SECONDS: float = float(os.getenv("TAG_TIME_BUDGET_SECONDS", "5"))
+    
+    # Where the "similar documents" vector index keeps its memory-mapped
+    # files (default: vector_index next to the upload directory)
+    VECTOR_INDEX_DIR: Optional[Path] = os.getenv("VECTOR_INDEX_DIR") or None
+    
+    # First-page thumbnails: cache directory (default: thumbnails next to the
+    # upload directory) and the most bytes it may hold before the least
+    # recently used ones are evicted
+    THUMBNAIL_DIR: Optional[Path] = os.getenv("THUMBNAIL_DIR") or None
+    THUMBNAIL_CACHE_BYTES: int = int(os.getenv("THUMBNAIL_CACHE_BYTES", str(256 * 1024 * 1024)))
+    
+    # Page-range extracts (/pdfs/{id}/pages), cached the same way
+    PAGE_RANGE_DIR: Optional[Path] = os.getenv("PAGE_RANGE_DIR") or None
+    PAGE_RANGE_CACHE_BYTES: int = int(os.getenv("PAGE_RANGE_CACHE_BYTES", str(512 * 1024 * 1024)))
+    
+    # Cache per-folder PDF counts in-process between mutations
+    FOLDER_COUNT_CACHE: bool = os.getenv("FOLDER_COUNT_CACHE", "true").lower() == "true"
+    
     # CORS
     BACKEND_CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:3001"]
     
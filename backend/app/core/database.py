@@ -1,29 +1,85 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from typing import Any, Dict, List
 import os
 
 from app.core.config import settings
 
+# Values accepted for the SQLite PRAGMAs of the engine profile
+SQLITE_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SQLITE_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+def is_memory_sqlite(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """create_engine arguments for this backend from the engine profile in settings"""
+    if url.startswith("sqlite"):
+        options: Dict[str, Any] = {
+            "connect_args": {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        }
+        if not is_memory_sqlite(url):
+            # SQLAlchemy 1.4 opens (and would re-run the PRAGMAs on) a new
+            # file connection for every session unless told to pool them.
+            # No overflow limit: a thread holding the write lock must never
+            # wait behind threads that hold pooled connections waiting for it
+            options.update(poolclass=QueuePool, pool_size=settings.DB_POOL_SIZE, max_overflow=-1)
+        return options
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def sqlite_pragmas() -> List[str]:
+    """PRAGMAs run on every new SQLite connection"""
+    journal_mode = settings.SQLITE_JOURNAL_MODE.upper()
+    synchronous = settings.SQLITE_SYNCHRONOUS.upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {sorted(SQLITE_JOURNAL_MODES)}")
+    if synchronous not in SQLITE_SYNCHRONOUS_LEVELS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {sorted(SQLITE_SYNCHRONOUS_LEVELS)}")
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        # Negative: in KiB rather than pages
+        f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}",
+    ]
+
+def create_app_engine(url: str) -> Engine:
+    """An engine configured by the engine profile for this backend"""
+    engine = create_engine(url, **engine_options(url))
+    if url.startswith("sqlite"):
+        pragmas = sqlite_pragmas()
+
+        @event.listens_for(engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+    return engine
+
 # Get database URL
 db_url = settings.DATABASE_URL
 print(f"Using database URL: {db_url}")
 
-# Create engine with appropriate settings
-if db_url.startswith("sqlite"):
-    # SQLite-specific settings
+if db_url.startswith("sqlite") and not is_memory_sqlite(db_url):
     db_path = db_url.replace("sqlite:///", "")
     # Make sure the directory exists for the SQLite file
     db_dir = os.path.dirname(os.path.abspath(db_path))
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir, exist_ok=True)
-    engine = create_engine(
-        db_url, 
-        connect_args={"check_same_thread": False}
-    )
-else:
-    # PostgreSQL or other database engines
-    engine = create_engine(db_url)
+
+engine = create_app_engine(db_url)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -41,6 +97,13 @@ def get_db():
 
 # Function to create all tables
 def create_tables():
+    # Register every model, also when called from a script that imported none
+    import app.models  # noqa: F401
+    
     print(f"Creating tables with database: {db_url}")
     Base.metadata.create_all(bind=engine)
-    print("Database tables created")
\ No newline at end of file
+    print("Database tables created")
+
+    # Bring tables that already existed up to date with the models
+    from app.core.migrations import run_migrations
+    run_migrations(engine)
\ No newline at end of file
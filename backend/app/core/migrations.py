@@ -0,0 +1,186 @@
+# app/core/migrations.py
+"""
+Small, idempotent schema upgrades that run at startup.
+
+``Base.metadata.create_all`` only creates tables that are missing - it never
+adds columns or indexes to a table that already exists. Every step below
+brings an existing database up to date with the models. Steps are recorded in
+the ``schema_migrations`` table so data backfills only ever run once.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+_migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _migration_metadata,
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(col["name"] == column for col in inspect(conn).get_columns(table))
+
+
+def _has_index(conn: Connection, table: str, index: str) -> bool:
+    return any(idx["name"] == index for idx in inspect(conn).get_indexes(table))
+
+
+def add_column(conn: Connection, column: Column):
+    """Add a nullable model column to an existing table if it is not there yet"""
+    table = column.table.name
+    if not _has_column(conn, table, column.name):
+        ddl_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {ddl_type}"))
+
+
+def create_index(conn: Connection, index: Index):
+    """Create an index declared on a model if the table does not have it yet"""
+    if not _has_index(conn, index.table.name, index.name):
+        index.create(bind=conn)
+
+
+def _pdfs_created_at_id_index(conn: Connection):
+    from app.models.pdf import PDF
+
+    for index in PDF.__table__.indexes:
+        if index.name == "ix_pdfs_created_at_id":
+            create_index(conn, index)
+
+
+def _pdfs_file_metadata_columns(conn: Connection):
+    from app.models.pdf import PDF
+
+    for column in (PDF.__table__.c.size, PDF.__table__.c.file_mtime, PDF.__table__.c.checksum):
+        add_column(conn, column)
+
+
+def _pdf_search_index(conn: Connection):
+    from services import search_index
+
+    search_index.create_index(conn)
+
+
+def _pdf_tags_backfill(conn: Connection):
+    from sqlalchemy.orm import Session
+
+    from app.api.tag_sync import backfill_pdf_tags
+    from app.models.pdf import pdf_tags
+
+    # Nothing wrote pdf_tags before this point: rebuild it from the tag strings
+    session = Session(bind=conn)
+    links = backfill_pdf_tags(session)
+    session.flush()
+    print(f"Backfilled {links} pdf_tags links")
+
+    for index in pdf_tags.indexes:
+        create_index(conn, index)
+
+
+def _catalog_version_row(conn: Connection):
+    from app.models.catalog import CatalogVersion
+
+    table = CatalogVersion.__table__
+    if conn.execute(table.select().where(table.c.id == 1)).first() is None:
+        conn.execute(table.insert().values(id=1, version=1))
+
+
+def _pdfs_blob_id_column(conn: Connection):
+    from app.models.pdf import PDF
+
+    add_column(conn, PDF.__table__.c.blob_id)
+    for index in PDF.__table__.indexes:
+        if index.name == "ix_pdfs_blob_id":
+            create_index(conn, index)
+
+
+def _term_document_frequencies(conn: Connection):
+    from sqlalchemy.orm import Session
+
+    from services.tagger import rebuild_document_frequencies
+
+    # Count the terms of text stored before frequencies were maintained
+    session = Session(bind=conn)
+    documents = rebuild_document_frequencies(session)
+    session.flush()
+    print(f"Counted terms of {documents} stored files")
+
+
+def _minhash_signatures(conn: Connection):
+    from sqlalchemy.orm import Session
+
+    from app.models.extracted_text import ExtractedDocument
+    from services.duplicates import backfill_signatures
+
+    add_column(conn, ExtractedDocument.__table__.c.minhash)
+    # Sign text stored before signatures were computed at ingest
+    session = Session(bind=conn)
+    signed = backfill_signatures(session)
+    session.flush()
+    print(f"Computed MinHash signatures of {signed} stored files")
+
+
+def _canonical_pdf_paths(conn: Connection):
+    from sqlalchemy.orm import Session
+
+    from app.api.file_locations import canonicalize_paths
+
+    # One pass over legacy paths so serving never has to probe for files
+    session = Session(bind=conn)
+    changed = canonicalize_paths(session)
+    session.flush()
+    print(f"Canonicalized {changed} PDF paths")
+
+
+def _corpus_size_row(conn: Connection):
+    from sqlalchemy.orm import Session
+
+    from app.models.term_frequency import TermDocumentFrequency
+    from services.tagger import CORPUS_SIZE_TERM, count_corpus_size
+
+    # Count once what add_document / remove_document keep up to date from now on
+    session = Session(bind=conn)
+    documents = count_corpus_size(session)
+    session.query(TermDocumentFrequency).filter(TermDocumentFrequency.term == CORPUS_SIZE_TERM).delete(
+        synchronize_session=False
+    )
+    if documents:
+        session.add(TermDocumentFrequency(term=CORPUS_SIZE_TERM, df=documents))
+    session.flush()
+    print(f"Recorded a corpus size of {documents} stored files")
+
+
+# Ordered list of (name, step). Never rename or reorder an entry that has shipped.
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_pdfs_created_at_id_index", _pdfs_created_at_id_index),
+    ("0002_pdfs_file_metadata_columns", _pdfs_file_metadata_columns),
+    ("0003_pdf_search_index", _pdf_search_index),
+    ("0004_pdf_tags_backfill", _pdf_tags_backfill),
+    ("0005_catalog_version_row", _catalog_version_row),
+    ("0006_pdfs_blob_id_column", _pdfs_blob_id_column),
+    ("0007_term_document_frequencies", _term_document_frequencies),
+    ("0008_minhash_signatures", _minhash_signatures),
+    ("0009_canonical_pdf_paths", _canonical_pdf_paths),
+    ("0010_corpus_size_row", _corpus_size_row),
+]
+
+
+def run_migrations(engine: Engine):
+    """Apply every migration that has not been recorded yet"""
+    _migration_metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        applied = {row[0] for row in conn.execute(schema_migrations.select())}
+
+    for name, step in MIGRATIONS:
+        if name in applied:
+            continue
+        print(f"Applying migration: {name}")
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(schema_migrations.insert().values(name=name, applied_at=datetime.utcnow()))
@@ -1,12 +1,15 @@
 # main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
+import threading
 
 from app.core.config import settings
-from app.core.database import create_tables, engine
+from app.core.database import SessionLocal, create_tables, engine
+from app.api.file_responses import UploadFiles
 from app.api.router import api_router
+from services import vector_index
+from services.pdf_processor import extraction
 
 # Create the FastAPI app
 app = FastAPI(title="PDF Manager API")
@@ -18,16 +21,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend tell which PDFs an export left out (app.api.exports)
+    expose_headers=["X-Skipped-PDFs"],
 )
 
 # Create uploads directory if it doesn't exist
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 print(f"Upload directory: {settings.UPLOAD_DIR}")
 
-# Mount static files
+# Mount static files (content-addressed blobs are cached by browsers for good)
 uploads_dir = str(settings.UPLOAD_DIR)
 print(f"Mounting uploads directory: {uploads_dir}")
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+app.mount("/uploads", UploadFiles(directory=uploads_dir), name="uploads")
 
 # Include API routes
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -35,6 +40,25 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 # Create tables
 create_tables()
 
+def sync_vector_index():
+    db = SessionLocal()
+    try:
+        added, removed = vector_index.sync(db)
+        print(f"Vector index: {added} files added, {removed} removed")
+    except Exception as e:
+        print(f"Error syncing vector index: {str(e)}")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_vector_index_sync():
+    # In the background: a first build over a large library takes a while
+    threading.Thread(target=sync_vector_index, daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_extraction_workers():
+    extraction.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "PDF Manager API"}
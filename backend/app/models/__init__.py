@@ -1,3 +1,8 @@
+from app.models.blob import Blob
+from app.models.catalog import CatalogVersion
+from app.models.extracted_text import ExtractedDocument, ExtractedPage
 from app.models.folder import Folder
+from app.models.minhash import MinHashBand
 from app.models.pdf import PDF, pdf_tags
-from app.models.tag import Tag
\ No newline at end of file
+from app.models.tag import Tag
+from app.models.term_frequency import TermDocumentFrequency
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from app.core.database import Base
+
+class Blob(Base):
+    """Stored file contents, shared by every PDF with the same SHA-256"""
+    __tablename__ = "blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    checksum = Column(String(64), unique=True, index=True, nullable=False)  # SHA-256 hex
+    size = Column(BigInteger, nullable=False)
+    path = Column(String, nullable=False)  # Same "uploads/..." form as PDF.path
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    pdfs = relationship("PDF", back_populates="blob")
+    
+    def __repr__(self):
+        return f"<Blob {self.checksum[:12]} refs={self.ref_count}>"
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, BigInteger
+
+from app.core.database import Base
+
+class CatalogVersion(Base):
+    """Single-row counter bumped by every catalog mutation"""
+    __tablename__ = "catalog_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
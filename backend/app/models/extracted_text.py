@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, LargeBinary, String, Text
+
+from app.core.database import Base
+
+class ExtractedPage(Base):
+    """Text of one page of a stored file, keyed by the file's SHA-256"""
+    __tablename__ = "extracted_pages"
+    
+    checksum = Column(String(64), primary_key=True)  # Same content, same text: shared by duplicate PDFs
+    page_number = Column(Integer, primary_key=True)  # Zero-based
+    text = Column(Text, nullable=False, default="")
+    
+    def __repr__(self):
+        return f"<ExtractedPage {self.checksum[:12]} p{self.page_number}>"
+
+class ExtractedDocument(Base):
+    """How much of a stored file was extracted; files stored before budgets have no row"""
+    __tablename__ = "extracted_documents"
+    
+    checksum = Column(String(64), primary_key=True)
+    page_count = Column(Integer, nullable=False)  # Pages in the file, extracted or not
+    stopped = Column(String(16), nullable=True)  # Budget that cut extraction short: pages, characters or time
+    minhash = Column(LargeBinary, nullable=True)  # MinHash signature, little-endian uint32s (see services.duplicates)
+    
+    def __repr__(self):
+        return f"<ExtractedDocument {self.checksum[:12]} {self.page_count} pages>"
@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, Column, Index, SmallInteger, String
+
+from app.core.database import Base
+
+class MinHashBand(Base):
+    """One LSH bucket of a stored file's MinHash signature (see services.duplicates)"""
+    __tablename__ = "minhash_bands"
+    
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)  # Hash of the band's signature values
+    checksum = Column(String(64), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_minhash_bands_checksum", "checksum"),
+    )
+    
+    def __repr__(self):
+        return f"<MinHashBand {self.band}:{self.bucket} {self.checksum[:12]}>"
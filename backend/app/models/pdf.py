@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Table, BigInteger
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Table, BigInteger, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -9,7 +9,10 @@ pdf_tags = Table(
     "pdf_tags",
     Base.metadata,
     Column("pdf_id", Integer, ForeignKey("pdfs.id")),
-    Column("tag_id", Integer, ForeignKey("tags.id"))
+    Column("tag_id", Integer, ForeignKey("tags.id")),
+    # One link per (pdf, tag); the reverse index serves tag filters
+    Index("ux_pdf_tags_pdf_id_tag_id", "pdf_id", "tag_id", unique=True),
+    Index("ix_pdf_tags_tag_id_pdf_id", "tag_id", "pdf_id"),
 )
 
 class PDF(Base):
@@ -21,10 +24,19 @@ class PDF(Base):
     tags = Column(String, nullable=True)  # Comma-separated tags (legacy)
     folder_id = Column(Integer, ForeignKey("folders.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-#    size = Column(BigInteger, nullable=True)  # File size in bytes
+    size = Column(BigInteger, nullable=True)  # File size in bytes
+    file_mtime = Column(DateTime, nullable=True)  # Stored file's modification time (UTC)
+    checksum = Column(String(64), nullable=True)  # SHA-256 of the file contents
+    blob_id = Column(Integer, ForeignKey("blobs.id"), nullable=True, index=True)  # Content-addressed file (NULL for legacy uploads)
     
     folder = relationship("Folder", back_populates="pdfs")
+    blob = relationship("Blob", back_populates="pdfs")
     tag_objects = relationship("Tag", secondary=pdf_tags, back_populates="pdfs")
     
+    __table_args__ = (
+        # Keyset pagination walks the listing in (created_at, id) order
+        Index("ix_pdfs_created_at_id", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<PDF {self.filename}>"
\ No newline at end of file
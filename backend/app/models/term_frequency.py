@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String
+
+from app.core.database import Base
+
+class TermDocumentFrequency(Base):
+    """How many stored files contain a term (a word or a two-word phrase)"""
+    __tablename__ = "term_document_frequencies"
+    
+    term = Column(String(128), primary_key=True)
+    df = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<TermDocumentFrequency {self.term!r} df={self.df}>"
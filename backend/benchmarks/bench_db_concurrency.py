@@ -0,0 +1,155 @@
+# benchmarks/bench_db_concurrency.py
+"""
+Mixed read/write load on SQLite, default engine vs the engine profile.
+
+Reader threads run what a listing request does (the catalog version, then a
+page of PDFs with folder names); writer threads run what an upload commits
+(bump the catalog version, add a PDF row). Both run for a fixed time against
+a throwaway database, once on an engine built like the app used to
+(``create_engine`` defaults: rollback journal, a new connection per session)
+and once on ``create_app_engine`` (WAL, synchronous=NORMAL, busy timeout,
+pooled connections). Reports throughput, latency and "database is locked"
+failures for each.
+
+Usage (from backend/):
+    python benchmarks/bench_db_concurrency.py [--readers 8] [--writers 4] [--seconds 10] [--rows 2000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Importing the app builds its engine; keep it off the real database
+_work_dir = tempfile.mkdtemp(prefix="pdf_manager_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_work_dir, 'app.db')}")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.api.catalog_version import bump_catalog_version, current_version  # noqa: E402
+from app.api.projections import with_folder_names  # noqa: E402
+from app.core.database import Base, create_app_engine  # noqa: E402
+from app.models.folder import Folder  # noqa: E402
+from app.models.pdf import PDF  # noqa: E402
+
+
+def baseline_engine(url: str):
+    # How app.core.database built the engine before the profile
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def seed(Session, rows: int):
+    db = Session()
+    try:
+        folders = [Folder(name=f"Folder {index}") for index in range(10)]
+        db.add_all(folders)
+        db.flush()
+        db.add_all(
+            PDF(filename=f"seed-{index}.pdf", path=f"uploads/seed-{index}.pdf",
+                folder_id=folders[index % len(folders)].id, size=1000)
+            for index in range(rows)
+        )
+        bump_catalog_version(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+def read(Session):
+    db = Session()
+    try:
+        current_version(db)
+        with_folder_names(db).order_by(PDF.id.desc()).limit(50).all()
+    finally:
+        db.close()
+
+
+def write(Session, name: str):
+    db = Session()
+    try:
+        bump_catalog_version(db)
+        db.add(PDF(filename=name, path=f"uploads/{name}", size=1000))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_load(Session, readers: int, writers: int, seconds: float):
+    latencies = defaultdict(list)
+    failures = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind: str, number: int):
+        count = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if kind == "read":
+                    read(Session)
+                else:
+                    write(Session, f"bench-{number}-{count}.pdf")
+                    count += 1
+            except OperationalError as e:
+                with lock:
+                    failures[kind] += 1
+                if "locked" not in str(e):
+                    raise
+                continue
+            with lock:
+                latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=worker, args=("read", number)) for number in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", number)) for number in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures
+
+
+def summarize(label: str, kind: str, values: list, failures: int, seconds: float):
+    values = sorted(values)
+    if not values:
+        print(f"{label:<10} {kind:<6} no successful operations, {failures} locked")
+        return
+    p95 = values[int(len(values) * 0.95) - 1] if len(values) >= 20 else values[-1]
+    print(f"{label:<10} {kind:<6} {len(values) / seconds:8.1f} ops/s  p50={statistics.median(values):7.1f} ms  "
+          f"p95={p95:7.1f} ms  max={values[-1]:7.1f} ms  locked={failures}")
+
+
+def main(readers: int, writers: int, seconds: float, rows: int):
+    print(f"{readers} readers, {writers} writers, {seconds:g} s each, {rows} seeded PDFs")
+    for label, make_engine in [("default", baseline_engine), ("profile", create_app_engine)]:
+        url = f"sqlite:///{os.path.join(_work_dir, f'{label}.db')}"
+        engine = make_engine(url)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed(Session, rows)
+
+        latencies, failures = run_load(Session, readers, writers, seconds)
+        for kind in ("read", "write"):
+            summarize(label, kind, latencies[kind], failures[kind], seconds)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8, help="Reader threads")
+    parser.add_argument("--writers", type=int, default=4, help="Writer threads")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run")
+    parser.add_argument("--rows", type=int, default=2000, help="PDF rows seeded before the run")
+    args = parser.parse_args()
+    main(args.readers, args.writers, args.seconds, args.rows)
@@ -0,0 +1,72 @@
+# benchmarks/bench_similar.py
+"""
+Similar-documents query latency on a large vector index.
+
+Fills a throwaway index with random unit vectors (the default 100,000 rows
+is about 200 MB on disk), then times single queries over the whole index,
+queries restricted to a 1% subset (a folder or tag filter) and one batched
+query for many documents at once.
+
+Usage (from backend/):
+    python benchmarks/bench_similar.py [--documents 100000] [--queries 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Importing the services builds the engine; keep it off the real database
+_work_dir = tempfile.mkdtemp(prefix="pdf_manager_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_work_dir, 'bench.db')}")
+
+from services.vector_index import DIMENSIONS, VectorIndex  # noqa: E402
+
+
+def random_units(count: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build(documents: int, rng: np.random.Generator) -> VectorIndex:
+    index = VectorIndex(os.path.join(_work_dir, "vector_index"))
+    started = time.perf_counter()
+    for start in range(0, documents, 10000):
+        count = min(10000, documents - start)
+        index.add_many([(f"{start + i:064x}", vector) for i, vector in enumerate(random_units(count, rng))])
+    print(f"Indexed {documents} vectors in {time.perf_counter() - started:.2f} s")
+    return index
+
+
+def time_queries(label: str, index: VectorIndex, queries: np.ndarray, **kwargs):
+    index.search(queries[0], 10, **kwargs)  # Page the matrix in
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query, 10, **kwargs)
+    per_query = (time.perf_counter() - started) / len(queries) * 1000
+    print(f"{label:<22} {per_query:8.2f} ms per query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    index = build(args.documents, rng)
+    queries = random_units(args.queries, rng)
+
+    time_queries("whole index", index, queries)
+    subset = {f"{i:064x}" for i in range(0, args.documents, 100)}
+    time_queries("1% subset", index, queries, allowed=subset)
+
+    started = time.perf_counter()
+    index.search_many(queries, 10)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{'batch of ' + str(args.queries):<22} {elapsed / args.queries:8.2f} ms per query")
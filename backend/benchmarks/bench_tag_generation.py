@@ -0,0 +1,80 @@
+# benchmarks/bench_tag_generation.py
+"""
+Tag-generation throughput versus extraction worker count.
+
+Runs cold tag generation (parse the PDF, then pick keywords) for a batch of
+sample files at once, first in the thread pool (what parsing used before
+the process pool, bound by the GIL) and then through the extraction process
+pool with an increasing number of workers. Throughput should grow with the
+worker count up to the number of cores.
+
+Usage (from backend/):
+    python benchmarks/bench_tag_generation.py [--jobs 24] [--workers 1,2,4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Importing the models builds the engine; keep it off the real database
+_work_dir = tempfile.mkdtemp(prefix="pdf_manager_bench_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_work_dir, 'bench.db')}")
+
+from services import tagger  # noqa: E402
+from services.pdf_processor import ExtractionService  # noqa: E402
+
+SAMPLES_DIR = os.path.join(BACKEND_DIR, "uploads")
+
+
+def sample_files() -> list:
+    files = sorted(
+        os.path.join(SAMPLES_DIR, name) for name in os.listdir(SAMPLES_DIR) if name.endswith(".pdf")
+    )
+    if not files:
+        raise SystemExit(f"No sample PDFs in {SAMPLES_DIR}")
+    return files
+
+
+async def generate(service: ExtractionService, files: list, jobs: int) -> float:
+    async def one(path):
+        pages = await service.extract_pages(path)
+        # Keyword scoring without corpus statistics, so no database is needed
+        return tagger.suggest_tags(None, pages, 5, frequencies={}, documents=0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(files[i % len(files)]) for i in range(jobs)))
+    return time.perf_counter() - started
+
+
+def measure(label: str, workers: int, files: list, jobs: int):
+    service = ExtractionService(workers=workers, max_pending=jobs)
+    try:
+        if workers > 0:
+            # Start the worker processes outside the timed run
+            asyncio.run(generate(service, files, workers))
+        elapsed = asyncio.run(generate(service, files, jobs))
+    finally:
+        service.shutdown()
+    print(f"{label:<18} {jobs} files in {elapsed:6.2f} s  {jobs / elapsed:6.2f} files/s")
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1))) or [1]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=24, help="Files tagged per run")
+    parser.add_argument("--workers", default=",".join(str(n) for n in default_workers),
+                        help="Comma-separated worker counts to try")
+    args = parser.parse_args()
+
+    files = sample_files()
+    print(f"{cores} cores, {len(files)} sample files")
+    measure("thread pool", 0, files, args.jobs)
+    for workers in (int(value) for value in args.workers.split(",")):
+        measure(f"{workers} processes", workers, files, args.jobs)
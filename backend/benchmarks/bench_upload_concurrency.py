@@ -0,0 +1,120 @@
+# benchmarks/bench_upload_concurrency.py
+"""
+List latency while large uploads are in flight.
+
+Starts the API with uvicorn against a throwaway database and upload
+directory, measures GET /api/pdfs latency on its own, then again while
+several large uploads stream in at the same time. With the upload path off
+the event loop the two distributions should be close.
+
+Usage (from backend/):
+    python benchmarks/bench_upload_concurrency.py [--uploads 4] [--size-mb 100]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(work_dir: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+    env["UPLOAD_DIR"] = os.path.join(work_dir, "uploads")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/ping")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+def make_payload(work_dir: str, size_mb: int) -> str:
+    path = os.path.join(work_dir, "payload.pdf")
+    block = b"%PDF-1.4\n" + os.urandom(1024 * 1024 - 9)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+async def measure_listing(client: httpx.AsyncClient, duration: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/pdfs/", params={"limit": 50})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+async def upload(client: httpx.AsyncClient, payload_path: str, index: int):
+    with open(payload_path, "rb") as f:
+        response = await client.post(
+            "/api/pdfs/upload",
+            files={"file": (f"bench-{index}.pdf", f, "application/pdf")},
+            timeout=None,
+        )
+    response.raise_for_status()
+
+
+def summarize(label: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(f"{label:<22} n={len(latencies):<5} p50={statistics.median(latencies):7.1f} ms  "
+          f"p95={p95:7.1f} ms  max={latencies[-1]:7.1f} ms")
+
+
+async def run(uploads: int, size_mb: int, baseline_seconds: float, port: int):
+    with tempfile.TemporaryDirectory(prefix="pdf_manager_bench_") as work_dir:
+        payload_path = make_payload(work_dir, size_mb)
+        server = start_server(work_dir, port)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                await wait_until_up(client)
+
+                idle = await measure_listing(client, baseline_seconds)
+
+                started = time.perf_counter()
+                upload_tasks = [asyncio.create_task(upload(client, payload_path, i)) for i in range(uploads)]
+                busy = []
+                while not all(task.done() for task in upload_tasks):
+                    busy.extend(await measure_listing(client, 0.5))
+                await asyncio.gather(*upload_tasks)
+                elapsed = time.perf_counter() - started
+
+            print(f"{uploads} concurrent uploads of {size_mb} MB finished in {elapsed:.1f} s")
+            summarize("list, idle", idle)
+            summarize("list, during uploads", busy)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=4, help="Concurrent uploads")
+    parser.add_argument("--size-mb", type=int, default=100, help="Size of each upload in MB")
+    parser.add_argument("--baseline-seconds", type=float, default=3.0, help="Idle measurement window")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(run(args.uploads, args.size_mb, args.baseline_seconds, args.port))
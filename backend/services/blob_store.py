@@ -0,0 +1,289 @@
+# services/blob_store.py
+"""
+Content-addressed storage for uploaded PDFs.
+
+Every distinct file is stored once, at a path derived from its SHA-256, and
+tracked by a ``Blob`` row whose ``ref_count`` is the number of PDFs pointing
+at it. Uploading a file that is already stored only bumps the count; deleting
+a PDF decrements it and the file is removed when the last reference goes.
+"""
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.blob import Blob
+from services.storage import StagedUpload, discard_staged, file_mtime, staging_dir, upload_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: placing and removing are only serialised within the process
+    fcntl = None
+
+BLOB_DIR = "blobs"
+
+# Threads settling or removing blob files wait on one of these, by content
+_content_locks = [threading.Lock() for _ in range(16)]
+
+_BLOB_PATH = re.compile(rf"(?:^|/){BLOB_DIR}/([0-9a-f]{{2}})/([0-9a-f]{{64}})\.pdf$")
+
+
+@dataclass
+class PlacedBlob:
+    checksum: str
+    size: int
+    path: str  # "uploads/..." form, as stored on PDF rows
+    mtime: datetime
+    created: bool  # False when identical content was already stored
+    staged_path: str  # Kept until the blob reference is committed; see settle_placed
+
+
+def blob_stored_path(checksum: str) -> str:
+    """Stored path of the blob with this SHA-256 (fanned out by its first byte)"""
+    return f"uploads/{BLOB_DIR}/{checksum[:2]}/{checksum}.pdf"
+
+
+def blob_checksum(path: str) -> Optional[str]:
+    """The SHA-256 a blob's path (stored or absolute) is named after; None for other files"""
+    match = _BLOB_PATH.search(path.replace("\\", "/"))
+    if match is None or match.group(2)[:2] != match.group(1):
+        return None
+    return match.group(2)
+
+
+@contextmanager
+def _content_lock(stored_path: str):
+    # Checking for a Blob row and removing the file must not interleave with
+    # an upload of the same content making sure its file is there
+    with _content_locks[hash(stored_path) % len(_content_locks)]:
+        with open(os.path.join(staging_dir(), "blobs.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def place_staged(staged: StagedUpload) -> PlacedBlob:
+    """
+    Link a staged upload at its content address unless that content is
+    already stored. The staged file is kept either way: a concurrent delete
+    may still remove the stored file before this upload's Blob reference is
+    committed, so call settle_placed after committing (or discard_placed on
+    failure). Blocking: call through run_in_threadpool.
+    """
+    stored_path = blob_stored_path(staged.checksum)
+    final_path = upload_path(stored_path)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    # mkstemp creates files private to the owner; uploads are served statically
+    os.chmod(staged.tmp_path, 0o644)
+    try:
+        os.link(staged.tmp_path, final_path)
+        created = True
+    except FileExistsError:
+        created = False
+    return PlacedBlob(
+        checksum=staged.checksum,
+        size=staged.size,
+        path=stored_path,
+        mtime=file_mtime(final_path),
+        created=created,
+        staged_path=staged.tmp_path,
+    )
+
+
+def settle_placed(placed: Iterable[PlacedBlob]):
+    """
+    After the Blob references are committed: drop the staged copies, or move
+    one into place where a concurrent delete removed the stored file.
+    Blocking: call through run_in_threadpool.
+    """
+    for item in placed:
+        with _content_lock(item.path):
+            final_path = upload_path(item.path)
+            if os.path.exists(final_path):
+                discard_staged(item.staged_path)
+            else:
+                os.replace(item.staged_path, final_path)
+
+
+def discard_placed(placed: Iterable[PlacedBlob]):
+    """Drop the staged copies of placed uploads whose rows were not committed"""
+    for item in placed:
+        discard_staged(item.staged_path)
+
+
+def find_blob(db: Session, checksum: str) -> Optional[Blob]:
+    return db.query(Blob).filter(Blob.checksum == checksum).first()
+
+
+def acquire_blobs(db: Session, contents: Iterable[Tuple[str, int, str]]) -> Dict[str, Blob]:
+    """
+    Take one reference per (checksum, size, path) entry, creating rows for
+    content not seen before (caller commits). Returns the blobs by checksum.
+    """
+    counts: Dict[str, int] = {}
+    details: Dict[str, Tuple[int, str]] = {}
+    for checksum, size, path in contents:
+        counts[checksum] = counts.get(checksum, 0) + 1
+        details[checksum] = (size, path)
+    if not counts:
+        return {}
+
+    blobs = {blob.checksum: blob for blob in db.query(Blob).filter(Blob.checksum.in_(counts))}
+    for checksum in counts:
+        if checksum in blobs:
+            continue
+        size, path = details[checksum]
+        try:
+            # Savepoint: a concurrent upload of the same content may insert first
+            with db.begin_nested():
+                blob = Blob(checksum=checksum, size=size, path=path, ref_count=0)
+                db.add(blob)
+        except IntegrityError:
+            blob = find_blob(db, checksum)
+        blobs[checksum] = blob
+
+    for checksum, count in counts.items():
+        db.query(Blob).filter(Blob.id == blobs[checksum].id).update(
+            {Blob.ref_count: Blob.ref_count + count}, synchronize_session=False
+        )
+        db.expire(blobs[checksum], ["ref_count"])
+    return blobs
+
+
+def acquire_blob(db: Session, checksum: str, size: int, path: str) -> Blob:
+    """Take one reference on the blob for this content, creating its row if needed (caller commits)"""
+    return acquire_blobs(db, [(checksum, size, path)])[checksum]
+
+
+def release_blobs(db: Session, blob_ids: Iterable[Optional[int]]) -> List[str]:
+    """
+    Drop one reference per entry (repeat an id to drop several), after the
+    PDFs holding them have been deleted. Blobs left unreferenced are deleted;
+    their stored paths are returned so the caller can remove the files after
+    committing.
+    """
+    released = {}
+    for blob_id in blob_ids:
+        if blob_id is not None:
+            released[blob_id] = released.get(blob_id, 0) + 1
+    if not released:
+        return []
+
+    for blob_id, count in released.items():
+        db.query(Blob).filter(Blob.id == blob_id).update(
+            {Blob.ref_count: Blob.ref_count - count}, synchronize_session=False
+        )
+    unreferenced = db.query(Blob.id, Blob.path).filter(
+        Blob.id.in_(released), Blob.ref_count <= 0
+    ).all()
+    if unreferenced:
+        db.query(Blob).filter(Blob.id.in_([blob_id for blob_id, _ in unreferenced])).delete(
+            synchronize_session=False
+        )
+    return [path for _, path in unreferenced]
+
+
+def remove_orphaned_files(db: Session, stored_paths: Iterable[str]) -> List[str]:
+    """Delete blob files that no Blob row points at any more; returns the removed paths"""
+    removed = []
+    for stored_path in stored_paths:
+        file_path = upload_path(stored_path)
+        with _content_lock(stored_path):
+            # A new upload of the same content may have re-created the blob meanwhile
+            if db.query(Blob.id).filter(Blob.path == stored_path).first():
+                continue
+            try:
+                os.remove(file_path)
+                removed.append(file_path)
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def adopt_legacy_files(db: Session, dry_run: bool = False) -> int:
+    """
+    Move files uploaded before the blob store into it, merging duplicates.
+
+    Each PDF without a blob is hashed, pointed at the blob for its content and
+    its old file removed once the change is committed. Returns how many PDFs
+    were converted.
+    """
+    from app.api.catalog_version import bump_catalog_version
+    from app.models.pdf import PDF
+    from services.storage import sha256_file
+
+    adopted = 0
+    pdf_ids = [pdf_id for (pdf_id,) in db.query(PDF.id).filter(PDF.blob_id.is_(None)).order_by(PDF.id)]
+    for pdf_id in pdf_ids:
+        pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
+        file_path = upload_path(pdf.path)
+        if not os.path.exists(file_path):
+            print(f"Skipping PDF {pdf.id}: file not found at {file_path}")
+            continue
+
+        checksum = sha256_file(file_path)
+        size = os.path.getsize(file_path)
+        stored_path = blob_stored_path(checksum)
+        print(f"PDF {pdf.id}: {pdf.path} -> {stored_path}")
+        if dry_run:
+            adopted += 1
+            continue
+
+        final_path = upload_path(stored_path)
+        placed = []
+        if not os.path.exists(final_path):
+            # Copy rather than move so a failed commit leaves the PDF readable
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            tmp_path = f"{final_path}.part"
+            shutil.copyfile(file_path, tmp_path)
+            placed.append(place_staged(StagedUpload(tmp_path=tmp_path, size=size, checksum=checksum)))
+
+        old_path = pdf.path
+        try:
+            blob = acquire_blob(db, checksum, size, stored_path)
+            pdf.blob = blob
+            pdf.path = blob.path
+            pdf.size = size
+            pdf.checksum = checksum
+            pdf.file_mtime = file_mtime(final_path)
+            # Listings show the path, so cached responses must revalidate
+            bump_catalog_version(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            discard_placed(placed)
+            print(f"Error adopting PDF {pdf_id}: {str(e)}")
+            continue
+        settle_placed(placed)
+
+        # Another row may still name the old file (copied databases, manual edits)
+        if not db.query(PDF.id).filter(PDF.path == old_path).first():
+            os.remove(file_path)
+        adopted += 1
+    return adopted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.database import SessionLocal, create_tables
+
+    # python -m services.blob_store [--dry-run]
+    parser = argparse.ArgumentParser(description="Move pre-existing uploads into the content-addressed store")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without changing anything")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        count = adopt_legacy_files(db, dry_run=args.dry_run)
+        print(f"{'Would adopt' if args.dry_run else 'Adopted'} {count} PDFs into the blob store")
+    finally:
+        db.close()
@@ -0,0 +1,116 @@
+# services/disk_cache.py
+"""
+Derived files (thumbnails, page extracts) cached on disk under a byte budget.
+
+Entries are files named by their key. A write that takes the directory over
+its budget removes the least recently used files. A hit refreshes the
+file's mtime, which is its place in that order and survives restarts.
+Server processes can share a directory: files are replaced atomically and
+eviction re-reads it rather than trusting one process's bookkeeping.
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+# Eviction frees down to this share of the budget, so the next writes don't rescan
+LOW_WATERMARK = 0.9
+
+# A hit rewrites the file's mtime at most this often
+TOUCH_INTERVAL_SECONDS = 3600
+
+
+class DiskCache:
+    """
+    Files with the given suffix in ``directory()``, least recently used
+    evicted past ``max_bytes()`` (both read on use, so they follow settings)
+    """
+
+    def __init__(self, suffix: str, directory: Callable[[], Path], max_bytes: Callable[[], int]):
+        self.suffix = suffix
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last scan plus what this process wrote since
+        self._total: Optional[int] = None
+
+    @property
+    def directory(self) -> Path:
+        return Path(self._directory())
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Tuple[str, os.stat_result]]:
+        """Path and stat of a cached file, marked as recently used; None on a miss"""
+        path = self.path(key)
+        try:
+            file_stat = os.stat(path)
+            if time.time() - file_stat.st_mtime > TOUCH_INTERVAL_SECONDS:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return str(path), file_stat
+
+    def put(self, key: str, data: bytes) -> Tuple[str, os.stat_result]:
+        """Store a file, evicting old ones if that exceeds the budget. Blocking."""
+        directory = self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._total is None:
+                self._total = sum(file_size for _, file_size, _ in self._entries())
+
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._total += len(data)
+            if self._total > self._max_bytes():
+                self._total = self._evict(keep=path)
+        return str(path), os.stat(path)
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        try:
+            scan = os.scandir(self.directory)
+        except FileNotFoundError:
+            return entries
+        with scan:
+            for entry in scan:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    file_stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((file_stat.st_mtime, file_stat.st_size, Path(entry.path)))
+        return entries
+
+    def _evict(self, keep: Path) -> int:
+        """Remove least recently used files (never ``keep``); returns the bytes left"""
+        entries = sorted(self._entries())
+        total = sum(file_size for _, file_size, _ in entries)
+        target = self._max_bytes() * LOW_WATERMARK
+        for _, file_size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= file_size
+        return total
@@ -0,0 +1,229 @@
+# services/duplicates.py
+"""
+Near-duplicate detection with MinHash signatures and banded LSH.
+
+Every stored file gets a MinHash signature of its five-word shingles when
+its text is stored: ``NUM_HASHES`` 32-bit minimums, kept as bytes in
+``extracted_documents.minhash``. The share of equal values in two
+signatures estimates the Jaccard similarity of the two texts.
+
+To avoid comparing every pair, a signature is cut into ``BANDS`` bands of
+``ROWS`` values and each band is hashed into a bucket in ``minhash_bands``.
+Only files that share a bucket in some band are compared. With 16 bands of
+8 rows, a pair at 0.8 similarity collides with probability ~0.95 and one at
+0.5 with ~0.06, so lookups read a handful of index rows, not the library.
+"""
+import hashlib
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session, aliased
+
+from app.models.extracted_text import ExtractedDocument, ExtractedPage
+from app.models.minhash import MinHashBand
+
+NUM_HASHES = 128
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 5
+
+# Estimated similarity from which two files count as near-duplicates
+DEFAULT_THRESHOLD = 0.8
+
+# Shingles hashed per step, so long documents never build a huge matrix
+_CHUNK = 4096
+
+# Universal hashing (a * x + b) mod p with fixed coefficients: signatures
+# stored by one process must compare equal to those computed by another
+_PRIME = np.uint64(4294967291)  # Largest prime below 2 ** 32
+_random = np.random.RandomState(20250318)
+_A = _random.randint(1, 2 ** 32 - 1, size=NUM_HASHES, dtype=np.uint64)[:, None]
+_B = _random.randint(0, 2 ** 31 - 1, size=NUM_HASHES, dtype=np.uint64)[:, None]
+
+_WORD = re.compile(r"\w+")
+
+
+def shingle_hashes(pages: Iterable[str]) -> np.ndarray:
+    """CRC-32 of every distinct run of SHINGLE_SIZE words in the text"""
+    words = _WORD.findall(" ".join(pages).lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    size = min(SHINGLE_SIZE, len(words))
+    shingles = {
+        zlib.crc32(" ".join(words[start:start + size]).encode())
+        for start in range(len(words) - size + 1)
+    }
+    return np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+
+
+def signature(pages: Iterable[str]) -> Optional[np.ndarray]:
+    """MinHash signature of a document's text, or None if it has no words"""
+    hashes = shingle_hashes(pages)
+    if not len(hashes):
+        return None
+    minimums = np.full(NUM_HASHES, _PRIME, dtype=np.uint64)
+    for start in range(0, len(hashes), _CHUNK):
+        # a < 2**32, x < 2**32 and b < 2**31 never overflow 64 bits
+        values = (_A * hashes[start:start + _CHUNK] + _B) % _PRIME
+        np.minimum(minimums, values.min(axis=1), out=minimums)
+    return minimums.astype(np.uint32)
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4")
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return float(np.count_nonzero(first == second)) / NUM_HASHES
+
+
+def band_buckets(sig: np.ndarray) -> List[Tuple[int, int]]:
+    """(band, bucket) of each band of a signature"""
+    raw = to_bytes(sig)
+    width = ROWS * 4
+    return [
+        (band, int.from_bytes(hashlib.blake2b(raw[band * width:(band + 1) * width], digest_size=8).digest(),
+                              "big", signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def index_document(db: Session, checksum: str, pages: List[str]) -> Optional[bytes]:
+    """
+    Replace the LSH buckets of a stored file; returns its signature bytes
+    for ``extracted_documents.minhash`` (caller stores them and commits).
+    """
+    forget(db, [checksum])
+    sig = signature(pages)
+    if sig is None:
+        return None
+    db.add_all(MinHashBand(band=band, bucket=bucket, checksum=checksum) for band, bucket in band_buckets(sig))
+    return to_bytes(sig)
+
+
+def forget(db: Session, checksums: Iterable[str]):
+    """Drop the LSH buckets of files whose text is gone (caller commits)"""
+    checksums = list(checksums)
+    if checksums:
+        db.query(MinHashBand).filter(MinHashBand.checksum.in_(checksums)).delete(synchronize_session=False)
+
+
+def load_signatures(db: Session, checksums: Iterable[str]) -> Dict[str, np.ndarray]:
+    checksums = set(checksums)
+    if not checksums:
+        return {}
+    rows = db.query(ExtractedDocument.checksum, ExtractedDocument.minhash).filter(
+        ExtractedDocument.checksum.in_(checksums), ExtractedDocument.minhash.isnot(None)
+    )
+    return {checksum: from_bytes(data) for checksum, data in rows}
+
+
+def _candidates(db: Session, checksum: Optional[str] = None) -> List[Tuple[str, str]]:
+    # Pairs of files sharing a bucket in at least one band, each pair once
+    mine, other = aliased(MinHashBand), aliased(MinHashBand)
+    query = db.query(mine.checksum, other.checksum).join(
+        other, (mine.band == other.band) & (mine.bucket == other.bucket)
+    ).filter(mine.checksum != other.checksum)
+    if checksum is not None:
+        query = query.filter(mine.checksum == checksum)
+    else:
+        query = query.filter(mine.checksum < other.checksum)
+    return query.distinct().all()
+
+
+def find_similar(db: Session, checksum: str, threshold: float = DEFAULT_THRESHOLD) -> Dict[str, float]:
+    """Other stored files whose text is at least ``threshold`` similar, by checksum"""
+    pairs = _candidates(db, checksum)
+    signatures = load_signatures(db, [checksum] + [other for _, other in pairs])
+    if checksum not in signatures:
+        return {}
+    found = {}
+    for _, other in pairs:
+        if other in signatures:
+            score = similarity(signatures[checksum], signatures[other])
+            if score >= threshold:
+                found[other] = score
+    return found
+
+
+def similar_pairs(db: Session, threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[str, str, float]]:
+    """Every pair of stored files at least ``threshold`` similar, from LSH collisions only"""
+    pairs = _candidates(db)
+    signatures = load_signatures(db, {checksum for pair in pairs for checksum in pair})
+    found = []
+    for first, second in pairs:
+        if first in signatures and second in signatures:
+            score = similarity(signatures[first], signatures[second])
+            if score >= threshold:
+                found.append((first, second, score))
+    return found
+
+
+def backfill_signatures(db: Session) -> int:
+    """Sign stored files that have no signature yet (caller commits); returns how many"""
+    signed = {
+        row[0] for row in db.query(ExtractedDocument.checksum).filter(ExtractedDocument.minhash.isnot(None))
+    }
+    documents = {document.checksum: document for document in db.query(ExtractedDocument)}
+    count = 0
+    current, pages = None, []
+
+    def sign(checksum: str, pages: List[str]):
+        document = documents.get(checksum)
+        if document is None:
+            # Stored before extraction was budgeted: every page was read
+            document = ExtractedDocument(checksum=checksum, page_count=len(pages))
+            db.add(document)
+        document.minhash = index_document(db, checksum, pages)
+
+    rows = db.query(ExtractedPage.checksum, ExtractedPage.text).order_by(
+        ExtractedPage.checksum, ExtractedPage.page_number
+    )
+    for checksum, text in rows.yield_per(1000):
+        if checksum != current:
+            if current is not None and current not in signed:
+                sign(current, pages)
+                count += 1
+            current, pages = checksum, []
+        pages.append(text)
+    if current is not None and current not in signed:
+        sign(current, pages)
+        count += 1
+    return count
+
+
+def group_pairs(pairs: Iterable[Tuple[str, str, float]]) -> List[Tuple[List[str], float]]:
+    """
+    Connected groups of similar files, each with the lowest similarity of
+    the pairs that link it, largest groups first.
+    """
+    parent: Dict[str, str] = {}
+
+    def root(checksum: str) -> str:
+        parent.setdefault(checksum, checksum)
+        while parent[checksum] != checksum:
+            parent[checksum] = parent[parent[checksum]]
+            checksum = parent[checksum]
+        return checksum
+
+    lowest: Dict[str, float] = {}
+    for first, second, score in pairs:
+        a, b = root(first), root(second)
+        score = min(score, lowest.get(a, 1.0), lowest.get(b, 1.0))
+        if a != b:
+            parent[b] = a
+            lowest.pop(b, None)
+        lowest[a] = score
+
+    members: Dict[str, List[str]] = {}
+    for checksum in parent:
+        members.setdefault(root(checksum), []).append(checksum)
+    groups = [(sorted(checksums), lowest.get(top, 1.0)) for top, checksums in members.items()]
+    return sorted(groups, key=lambda group: (-len(group[0]), group[0]))
@@ -0,0 +1,106 @@
+# services/page_ranges.py
+"""
+Sub-documents holding some of a PDF's pages.
+
+A range such as ``3-5`` or ``1,4-6,9-`` (1-based, inclusive, open-ended to
+the last page) is normalised first, so equivalent spellings share one cache
+entry. The pages are copied into a new PDF by PyPDF2 in the extraction
+process pool. Results are cached on disk (``services.disk_cache``) by content
+checksum and range, at most ``PAGE_RANGE_CACHE_BYTES``.
+"""
+import io
+import os
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import PyPDF2
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from services.disk_cache import DiskCache
+from services.pdf_processor import extraction
+
+# Ranges with more comma-separated parts than this are refused
+MAX_RANGE_PARTS = 32
+
+PageRange = Tuple[int, Optional[int]]  # (first, last) with last None meaning to the end
+
+_PART = re.compile(r"^\s*(\d+)\s*(?:(-)\s*(\d*)\s*)?$")
+
+
+class PageRangeError(ValueError):
+    """A malformed page range, or one that selects no page of the document"""
+
+
+def parse_page_range(spec: str) -> List[PageRange]:
+    """The ranges of a spec like ``1,4-6,9-``, sorted and merged"""
+    parts = spec.split(",")
+    if not spec.strip() or len(parts) > MAX_RANGE_PARTS:
+        raise PageRangeError(f"Page range must list 1 to {MAX_RANGE_PARTS} pages or ranges")
+    ranges: List[PageRange] = []
+    for part in parts:
+        match = _PART.match(part)
+        if not match:
+            raise PageRangeError(f"Invalid page range: {part.strip()!r}")
+        first = int(match.group(1))
+        if match.group(2) is None:
+            last = first
+        else:
+            last = int(match.group(3)) if match.group(3) else None
+        if first < 1 or (last is not None and last < first):
+            raise PageRangeError(f"Invalid page range: {part.strip()!r}")
+        ranges.append((first, last))
+
+    ranges.sort(key=lambda page_range: page_range[0])
+    merged = [ranges[0]]
+    for first, last in ranges[1:]:
+        merged_first, merged_last = merged[-1]
+        if merged_last is None:
+            break  # The open range before already runs to the end
+        if first <= merged_last + 1:
+            merged[-1] = (merged_first, None if last is None else max(merged_last, last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def format_page_range(ranges: List[PageRange]) -> str:
+    """Canonical spelling of parsed ranges"""
+    return ",".join(
+        str(first) if last == first else f"{first}-{'' if last is None else last}"
+        for first, last in ranges
+    )
+
+
+def write_pages(file_path: str, ranges: List[PageRange]) -> bytes:
+    """A PDF of the selected pages; parts past the last page are left out"""
+    with open(file_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        page_count = len(reader.pages)
+        if ranges[0][0] > page_count:
+            raise PageRangeError(f"The document has {page_count} pages")
+        writer = PyPDF2.PdfWriter()
+        for first, last in ranges:
+            for index in range(first - 1, min(last or page_count, page_count)):
+                writer.add_page(reader.pages[index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+    return buffer.getvalue()
+
+
+def page_range_dir() -> Path:
+    return Path(settings.PAGE_RANGE_DIR or settings.UPLOAD_DIR.parent / "page_ranges")
+
+
+cache = DiskCache(".pdf", page_range_dir, lambda: settings.PAGE_RANGE_CACHE_BYTES)
+
+
+async def get_pages(file_path: str, checksum: str, ranges: List[PageRange]) -> Tuple[str, os.stat_result]:
+    """Path and stat of the sub-document, written in the pool on a cache miss"""
+    key = f"{checksum}-{format_page_range(ranges)}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    data = await extraction.run(write_pages, file_path, ranges)
+    return await run_in_threadpool(cache.put, key, data)
@@ -1 +1,231 @@
-# PDF text extraction 
+# services/pdf_processor.py
+"""
+PDF text extraction.
+
+Parsing is CPU-bound pure Python, so in the API it runs in a pool of worker
+processes (``extraction``) instead of on the event loop or in the thread
+pool, where it would hold the GIL. The pool is bounded: at most
+``EXTRACTION_MAX_PENDING`` jobs wait for a worker and further callers queue
+up in the event loop without blocking it. Each job has a time limit enforced
+inside the worker, so a pathological file frees its worker instead of
+occupying it forever. Where the worker has no interval timer (Windows), a
+job still running a grace period past its limit gets the pool's processes
+terminated and the pool recreated. Cancelling the awaiting task (e.g. the client went
+away) withdraws a job that has not started yet.
+
+Pages are produced one at a time by ``iter_pages``. ``extract_within``
+stops reading at the configured page, character and wall-clock budgets and
+reports where it stopped, so a huge scan yields its first pages instead of
+tying up a worker until the hard time limit kills the job.
+
+``extract_pages`` and ``extract_text`` stay plain functions for scripts.
+"""
+import asyncio
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+import PyPDF2
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How long past its limit a job may run before the pool is recycled (only
+# happens where workers cannot enforce the limit themselves)
+TIMEOUT_GRACE_SECONDS = 5
+
+
+class ExtractionError(Exception):
+    """Extraction could not run (the worker process died)"""
+
+
+class ExtractionTimeout(ExtractionError):
+    """A file took longer than the extraction time limit"""
+
+
+@dataclass
+class Extraction:
+    """Pages read from a file and the budget that stopped reading, if any"""
+    pages: List[str]
+    page_count: int
+    stopped: Optional[str] = None  # "pages", "characters" or "time"
+
+    @property
+    def complete(self) -> bool:
+        return self.stopped is None
+
+
+def _page_texts(pdf_reader: PyPDF2.PdfReader) -> Iterator[str]:
+    for page_num, page in enumerate(pdf_reader.pages):
+        try:
+            yield page.extract_text() or ""
+        except ExtractionTimeout:
+            # The job's time limit, not a bad page: stop the whole file
+            raise
+        except Exception as e:
+            logger.error(f"Error extracting text from page {page_num}: {str(e)}")
+            yield ""
+
+
+def iter_pages(file_path: str) -> Iterator[str]:
+    """Text of each page of a PDF in order, parsed as it is consumed"""
+    with open(file_path, "rb") as file:
+        yield from _page_texts(PyPDF2.PdfReader(file))
+
+
+def extract_within(file_path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None,
+                   time_budget: Optional[float] = None) -> Extraction:
+    """
+    Extract pages until the file ends or a budget runs out (defaults: the
+    configured ones; 0 means no limit). The page that crosses the character
+    budget is cut at it.
+    """
+    max_pages = settings.EXTRACTION_MAX_PAGES if max_pages is None else max_pages
+    max_chars = settings.EXTRACTION_MAX_CHARS if max_chars is None else max_chars
+    time_budget = settings.EXTRACTION_TIME_BUDGET_SECONDS if time_budget is None else time_budget
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    pages: List[str] = []
+    characters = 0
+    with open(file_path, "rb") as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        page_count = len(pdf_reader.pages)
+        for text in _page_texts(pdf_reader):
+            if max_chars and characters + len(text) > max_chars:
+                pages.append(text[:max_chars - characters])
+                return Extraction(pages, page_count, "characters")
+            pages.append(text)
+            characters += len(text)
+            if len(pages) == page_count:
+                break
+            if max_pages and len(pages) >= max_pages:
+                return Extraction(pages, page_count, "pages")
+            if deadline is not None and time.monotonic() >= deadline:
+                return Extraction(pages, page_count, "time")
+    return Extraction(pages, page_count)
+
+
+def extract_pages(file_path: str) -> List[str]:
+    """Extract the text of every page of a PDF (empty string for unreadable pages)"""
+    return list(iter_pages(file_path))
+
+
+def extract_text(file_path: str) -> str:
+    """Extract the text of a whole PDF, one line break between pages"""
+    return "\n".join(extract_pages(file_path))
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout("Extraction time limit exceeded")
+
+
+def _run_job(func: Callable, args: tuple, timeout: Optional[float]):
+    """Runs in a worker process: call func under an interval timer"""
+    if timeout and hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return func(*args)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return func(*args)
+
+
+class ExtractionService:
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None,
+                 max_pending: Optional[int] = None):
+        self.workers = settings.EXTRACTION_WORKERS if workers is None else workers
+        self.timeout = settings.EXTRACTION_TIMEOUT_SECONDS if timeout is None else timeout
+        self.max_pending = settings.EXTRACTION_MAX_PENDING if max_pending is None else max_pending
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # Semaphores bind to the loop that first waits on them, so keep one per loop
+        self._slots = weakref.WeakKeyDictionary()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs threads (the
+                # server's thread pool) can copy held locks into the child
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle_pool(self, pool: ProcessPoolExecutor):
+        # shutdown() leaves running jobs running: stop the worker stuck on one
+        processes = list((pool._processes or {}).values())
+        self._reset_pool(pool)
+        for process in processes:
+            process.terminate()
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._slots:
+            self._slots[loop] = asyncio.Semaphore(self.workers + self.max_pending)
+        return self._slots[loop]
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None):
+        """
+        Run a picklable module-level function in the pool and await its result.
+
+        Raises ExtractionTimeout if it runs longer than ``timeout`` (default:
+        the configured limit) and ExtractionError if its worker died.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if self.workers <= 0:
+            return await run_in_threadpool(func, *args)
+
+        async with self._get_slots():
+            pool = self._get_pool()
+            future = asyncio.get_running_loop().run_in_executor(pool, _run_job, func, args, timeout)
+            try:
+                # The worker enforces the limit itself; the grace period only
+                # covers platforms without interval timers
+                return await asyncio.wait_for(future, timeout + TIMEOUT_GRACE_SECONDS if timeout else None)
+            except asyncio.TimeoutError:
+                logger.error("Extraction job outlived its time limit, restarting the pool")
+                self._recycle_pool(pool)
+                raise ExtractionTimeout("Extraction time limit exceeded")
+            except BrokenProcessPool as e:
+                logger.error(f"Extraction worker died, restarting the pool: {str(e)}")
+                self._reset_pool(pool)
+                raise ExtractionError("Extraction worker died") from e
+
+    async def extract(self, file_path: str, timeout: Optional[float] = None) -> Extraction:
+        """``extract_within`` in the pool, under the budgets configured in this process"""
+        return await self.run(
+            extract_within, file_path, settings.EXTRACTION_MAX_PAGES, settings.EXTRACTION_MAX_CHARS,
+            settings.EXTRACTION_TIME_BUDGET_SECONDS, timeout=timeout,
+        )
+
+    async def extract_pages(self, file_path: str, timeout: Optional[float] = None) -> List[str]:
+        return await self.run(extract_pages, file_path, timeout=timeout)
+
+    async def extract_text(self, file_path: str, timeout: Optional[float] = None) -> str:
+        return "\n".join(await self.extract_pages(file_path, timeout=timeout))
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+extraction = ExtractionService()
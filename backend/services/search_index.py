@@ -0,0 +1,226 @@
+# services/search_index.py
+"""
+Full-text search over PDF filenames, tags and extracted text.
+
+SQLite databases use an FTS5 virtual table, PostgreSQL a weighted tsvector
+with a GIN index. Triggers on ``pdfs`` keep filename and tags current on
+insert, rename, retag and delete; the extracted text is written once at
+ingest with ``set_content``.
+
+When neither backend is available ``match`` returns None and callers fall
+back to substring matching.
+"""
+import logging
+import re
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Float, Integer, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import Subquery
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of a hit in filename, tags and body text
+FILENAME_WEIGHT = 10.0
+TAGS_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+
+# Database URL -> whether the pdf_search table exists
+_index_available: Dict[str, bool] = {}
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS pdf_search USING fts5(
+        filename, tags, content, tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pdfs_search_insert AFTER INSERT ON pdfs BEGIN
+        INSERT INTO pdf_search(rowid, filename, tags, content)
+        VALUES (new.id, coalesce(new.filename, ''), coalesce(new.tags, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pdfs_search_update AFTER UPDATE OF filename, tags ON pdfs BEGIN
+        UPDATE pdf_search
+        SET filename = coalesce(new.filename, ''), tags = coalesce(new.tags, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS pdfs_search_delete AFTER DELETE ON pdfs BEGIN
+        DELETE FROM pdf_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO pdf_search(rowid, filename, tags, content)
+    SELECT id, coalesce(filename, ''), coalesce(tags, ''), '' FROM pdfs
+    WHERE id NOT IN (SELECT rowid FROM pdf_search)
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS pdf_search (
+        pdf_id INTEGER PRIMARY KEY REFERENCES pdfs(id) ON DELETE CASCADE,
+        filename TEXT NOT NULL DEFAULT '',
+        tags TEXT NOT NULL DEFAULT '',
+        content TEXT NOT NULL DEFAULT '',
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', filename), 'A') ||
+            setweight(to_tsvector('english', replace(tags, ',', ' ')), 'B') ||
+            setweight(to_tsvector('english', content), 'D')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_pdf_search_document ON pdf_search USING GIN (document)",
+    """
+    CREATE OR REPLACE FUNCTION pdf_search_sync() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO pdf_search (pdf_id, filename, tags)
+        VALUES (NEW.id, coalesce(NEW.filename, ''), coalesce(NEW.tags, ''))
+        ON CONFLICT (pdf_id) DO UPDATE
+        SET filename = EXCLUDED.filename, tags = EXCLUDED.tags;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS pdfs_search_sync ON pdfs",
+    """
+    CREATE TRIGGER pdfs_search_sync AFTER INSERT OR UPDATE OF filename, tags ON pdfs
+    FOR EACH ROW EXECUTE FUNCTION pdf_search_sync()
+    """,
+    """
+    INSERT INTO pdf_search (pdf_id, filename, tags)
+    SELECT id, coalesce(filename, ''), coalesce(tags, '') FROM pdfs
+    ON CONFLICT (pdf_id) DO NOTHING
+    """,
+]
+
+
+def _sqlite_has_fts5(conn: Connection) -> bool:
+    try:
+        conn.execute(text("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)"))
+        conn.execute(text("DROP TABLE temp.fts5_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def backend_name(conn: Connection) -> Optional[str]:
+    """Which search backend this database supports ("fts5", "postgres" or None)"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        return "fts5" if _sqlite_has_fts5(conn) else None
+    if dialect == "postgresql":
+        return "postgres"
+    return None
+
+
+def create_index(conn: Connection):
+    """Create the search table and its sync triggers, indexing existing rows' metadata"""
+    backend = backend_name(conn)
+    if backend is None:
+        logger.warning(f"No full-text search support for {conn.dialect.name}; search uses substring matching")
+        return
+    for statement in _SQLITE_DDL if backend == "fts5" else _POSTGRES_DDL:
+        conn.execute(text(statement))
+
+
+def _index_exists(db: Session) -> bool:
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _index_available:
+        _index_available[key] = "pdf_search" in inspect(bind).get_table_names()
+    return _index_available[key]
+
+
+def set_content(db: Session, pdf_id: int, content: str):
+    """Store the extracted text of a PDF in the index (caller commits)"""
+    if not _index_exists(db):
+        return
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(text("UPDATE pdf_search SET content = :content WHERE rowid = :pdf_id"),
+                   {"content": content, "pdf_id": pdf_id})
+    else:
+        db.execute(text("UPDATE pdf_search SET content = :content WHERE pdf_id = :pdf_id"),
+                   {"content": content, "pdf_id": pdf_id})
+
+
+def _fts5_query(terms: Iterable[str]) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax;
+    # the trailing * makes each term a prefix match ("fract" finds "fractions")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def match(db: Session, search: str) -> Optional[Subquery]:
+    """
+    Subquery of (pdf_id, rank) for PDFs matching every term of ``search``.
+
+    Lower rank is a better match. Returns None when the database has no
+    search index or the search has no usable terms.
+    """
+    terms = re.findall(r"\w+", search.lower())
+    if not terms or not _index_exists(db):
+        return None
+
+    if db.get_bind().dialect.name == "sqlite":
+        statement = text(
+            "SELECT rowid AS pdf_id, "
+            f"bm25(pdf_search, {FILENAME_WEIGHT}, {TAGS_WEIGHT}, {CONTENT_WEIGHT}) AS rank "
+            "FROM pdf_search WHERE pdf_search MATCH :query"
+        ).bindparams(query=_fts5_query(terms))
+    else:
+        statement = text(
+            "SELECT pdf_id, -ts_rank_cd(document, query) AS rank "
+            "FROM pdf_search, to_tsquery('english', :query) AS query "
+            "WHERE document @@ query"
+        ).bindparams(query=" & ".join(f"{term}:*" for term in terms))
+
+    return statement.columns(pdf_id=Integer, rank=Float).subquery("search_hits")
+
+
+def reindex_content(db: Session, only_missing: bool = True) -> int:
+    """Index the text of stored PDFs (extracting only what was never parsed); returns how many were indexed"""
+    from app.models import PDF
+    from services import text_store
+
+    if not _index_exists(db):
+        return 0
+
+    id_column = "rowid" if db.get_bind().dialect.name == "sqlite" else "pdf_id"
+    statement = f"SELECT {id_column} FROM pdf_search"
+    if only_missing:
+        statement += " WHERE content = ''"
+    pdf_ids = [row[0] for row in db.execute(text(statement))]
+
+    indexed = 0
+    for pdf_id in pdf_ids:
+        pdf = db.query(PDF).filter(PDF.id == pdf_id).first()
+        if not pdf:
+            continue
+        try:
+            set_content(db, pdf.id, "\n".join(text_store.ensure_pages(db, pdf)))
+            db.commit()
+            indexed += 1
+            print(f"Indexed PDF {pdf.id}: {pdf.filename}")
+        except Exception as e:
+            db.rollback()
+            print(f"Error indexing PDF {pdf.id}: {str(e)}")
+    return indexed
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.core.database import SessionLocal, create_tables
+
+    # python -m services.search_index [--all]
+    create_tables()
+    db = SessionLocal()
+    try:
+        count = reindex_content(db, only_missing="--all" not in sys.argv)
+        print(f"Search index updated for {count} PDFs")
+    finally:
+        db.close()
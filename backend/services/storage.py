@@ -1 +1,139 @@
-# Cloud storage service 
+# services/storage.py
+"""
+Local file storage helpers for uploaded PDFs.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# Read size used when hashing stored files
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+
+# Chunk size used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+
+
+@dataclass
+class FileMetadata:
+    size: int
+    mtime: datetime
+    checksum: str
+
+
+def upload_path(stored_path: str) -> str:
+    """Absolute location of a file recorded as ``pdf.path``"""
+    if stored_path.startswith("uploads/"):
+        # Stored relative to the uploads directory
+        return os.path.join(settings.UPLOAD_DIR, stored_path[len("uploads/"):])
+    return stored_path
+
+
+def canonical_path(path: str) -> str:
+    """
+    The form ``pdf.path`` should take for a file at ``path``: "uploads/..."
+    for anything under the upload directory, else an absolute path.
+    Accepts absolute paths, Windows separators and bare relative names.
+    """
+    path = path.replace("\\", "/")
+    if os.path.isabs(path):
+        relative = os.path.relpath(os.path.normpath(path), settings.UPLOAD_DIR)
+        if relative == ".." or relative.startswith("../"):
+            return os.path.normpath(path)
+        return f"uploads/{relative}"
+    relative = os.path.normpath(path)
+    if relative.startswith("uploads/"):
+        relative = relative[len("uploads/"):]
+    return f"uploads/{relative}"
+
+
+def file_mtime(file_path: str) -> datetime:
+    """Modification time of a file as a naive UTC datetime"""
+    return datetime.utcfromtimestamp(os.path.getmtime(file_path))
+
+
+def sha256_file(file_path: str) -> str:
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_metadata(file_path: str) -> FileMetadata:
+    """Stat and hash a stored file"""
+    return FileMetadata(
+        size=os.path.getsize(file_path),
+        mtime=file_mtime(file_path),
+        checksum=sha256_file(file_path),
+    )
+
+
+@dataclass
+class StagedUpload:
+    """A fully received, fsynced upload waiting to be moved into place"""
+    tmp_path: str
+    size: int
+    checksum: str
+
+
+def staging_dir() -> str:
+    """Where uploads are received; on the same filesystem as their final location"""
+    path = os.path.join(settings.UPLOAD_DIR, ".staging")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_chunk(buffer, digest, chunk: bytes):
+    buffer.write(chunk)
+    # hashlib releases the GIL for large buffers, so this overlaps with other work
+    digest.update(chunk)
+
+
+def _finish_file(buffer):
+    buffer.flush()
+    os.fsync(buffer.fileno())
+    buffer.close()
+
+
+def discard_staged(tmp_path: str):
+    """Remove a staged file that will not be kept"""
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+async def stage_upload(upload: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> StagedUpload:
+    """
+    Receive an upload into the staging directory without blocking the event loop.
+
+    Chunks are written and hashed in the thread pool in a single pass. The
+    caller moves the staged file into place (see services.blob_store) once it
+    knows the content hash; on any failure here the temporary file is removed.
+    """
+    fd, tmp_path = await run_in_threadpool(
+        tempfile.mkstemp, dir=staging_dir(), prefix="upload-", suffix=".part"
+    )
+    buffer = os.fdopen(fd, "wb")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+            size += len(chunk)
+        await run_in_threadpool(_finish_file, buffer)
+    except BaseException:
+        buffer.close()
+        await run_in_threadpool(discard_staged, tmp_path)
+        raise
+
+    return StagedUpload(tmp_path=tmp_path, size=size, checksum=digest.hexdigest())
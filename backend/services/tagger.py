@@ -0,0 +1,390 @@
+# services/tagger.py
+"""
+Corpus-aware tag suggestions.
+
+Candidate tags are the words and two-word phrases of a document, scored by
+TF-IDF against the whole library: a term scores highly when it is frequent
+in this document and rare elsewhere, so words every lesson shares
+("lesson", "students", "name") sink to the bottom on their own.
+
+Document frequencies live in ``term_document_frequencies``, one row per
+term, and are maintained incrementally by the text store: adding a file's
+pages adds one to each of its terms, dropping them subtracts one. The same
+table keeps the number of stored files under ``CORPUS_SIZE_TERM``, which no
+real term can match, so ``corpus_size`` is one primary-key read. Scoring
+reads only the stored text, so retagging the library never parses a PDF.
+
+``suggest_tags_streaming`` tags one document page by page with bounded
+memory: it stops at page, character and time budgets, and sooner once the
+top tags have come out the same a few checks in a row, since the rest of a
+long document rarely changes them.
+"""
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.extracted_text import ExtractedPage
+from app.models.term_frequency import TermDocumentFrequency
+
+MAX_TERM_LENGTH = 128
+
+# Row of term_document_frequencies counting the stored files (terms are letters only)
+CORPUS_SIZE_TERM = "#files"
+
+# Below this many files IDF carries no signal and terms rank by frequency
+MIN_CORPUS_SIZE = 3
+
+# A phrase must repeat to be a tag candidate; single mentions are mostly noise
+MIN_BIGRAM_COUNT = 2
+
+# A phrase that scores as well as its words is the more specific tag
+PHRASE_BOOST = 1.25
+
+# Rows per statement when reading or updating frequencies for many terms
+TERM_BATCH_SIZE = 500
+
+# Distinct terms a streaming count keeps; past it the least frequent half is dropped
+MAX_TRACKED_TERMS = 50000
+
+# Streaming tagging re-ranks every few pages and stops once the tags come out
+# unchanged this many checks in a row
+STABILITY_CHECK_PAGES = 4
+STABLE_CHECKS = 2
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few first for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just like made make making may me might more most must my myself no nor not now of off on once
+one only or other our ours ourselves out over own page pdf document same see she should so some
+such than that the their theirs them themselves then there these they this those three through
+to too two under until up use used using very was we were what when where which while who whom
+why will with would you your yours yourself yourselves second third get got
+""".split())
+
+_WORD = re.compile(r"[a-z][a-z'\-]*[a-z]")
+
+
+def tokenize(text: str) -> List[Optional[str]]:
+    """
+    Lower-cased words of ``text``; stop words and short words become None so
+    that phrases never span them.
+    """
+    return [
+        word if len(word) >= 3 and word not in STOP_WORDS and len(word) <= MAX_TERM_LENGTH else None
+        for word in _WORD.findall(text.lower())
+    ]
+
+
+def _count_page(counts: Counter, page: str):
+    words = tokenize(page)
+    counts.update(word for word in words if word)
+    counts.update(
+        f"{first} {second}" for first, second in zip(words, words[1:])
+        if first and second and first != second
+        and len(first) + len(second) < MAX_TERM_LENGTH
+    )
+
+
+def count_terms(pages: Iterable[str]) -> Counter:
+    """Occurrences of every word and two-word phrase (phrases never cross pages)"""
+    counts: Counter = Counter()
+    for page in pages:
+        _count_page(counts, page)
+    return counts
+
+
+def document_terms(pages: Iterable[str]) -> Set[str]:
+    """Distinct terms of a document, as counted in document frequencies"""
+    return set(count_terms(pages))
+
+
+def _batches(items: Sequence, size: int = TERM_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _upsert_increment(db: Session, terms: List[str]):
+    table = TermDocumentFrequency.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    for batch in _batches(terms):
+        statement = insert(table).values([{"term": term, "df": 1} for term in batch])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.term], set_={"df": table.c.df + 1}
+        ))
+
+
+def add_document(db: Session, pages: Iterable[str]):
+    """Count a newly stored file in the document frequencies (caller commits)"""
+    pages = list(pages)
+    if not pages:
+        return  # Nothing is stored for it, so it is not part of the corpus
+    _upsert_increment(db, sorted(document_terms(pages)) + [CORPUS_SIZE_TERM])
+
+
+def remove_document(db: Session, pages: Iterable[str]):
+    """Stop counting a file whose stored text is being dropped (caller commits)"""
+    pages = list(pages)
+    if not pages:
+        return
+    terms = sorted(document_terms(pages)) + [CORPUS_SIZE_TERM]
+    for batch in _batches(terms):
+        db.query(TermDocumentFrequency).filter(TermDocumentFrequency.term.in_(batch)).update(
+            {TermDocumentFrequency.df: TermDocumentFrequency.df - 1}, synchronize_session=False
+        )
+    db.query(TermDocumentFrequency).filter(TermDocumentFrequency.df <= 0).delete(
+        synchronize_session=False
+    )
+
+
+def rebuild_document_frequencies(db: Session) -> int:
+    """Recount every term from the stored text (caller commits); returns the corpus size"""
+    db.query(TermDocumentFrequency).delete(synchronize_session=False)
+    totals: Counter = Counter()
+    documents = 0
+    current, pages = None, []
+    rows = db.query(ExtractedPage.checksum, ExtractedPage.text).order_by(
+        ExtractedPage.checksum, ExtractedPage.page_number
+    )
+    for checksum, text in rows.yield_per(1000):
+        if checksum != current:
+            if current is not None:
+                totals.update(document_terms(pages))
+                documents += 1
+            current, pages = checksum, []
+        pages.append(text)
+    if current is not None:
+        totals.update(document_terms(pages))
+        documents += 1
+
+    if documents:
+        totals[CORPUS_SIZE_TERM] = documents
+
+    table = TermDocumentFrequency.__table__
+    items = sorted(totals.items())
+    for batch in _batches(items):
+        db.execute(table.insert(), [{"term": term, "df": df} for term, df in batch])
+    return documents
+
+
+def count_corpus_size(db: Session) -> int:
+    """Count the distinct stored files (caller stores the result as ``CORPUS_SIZE_TERM``)"""
+    return db.query(func.count(func.distinct(ExtractedPage.checksum))).scalar() or 0
+
+
+def corpus_size(db: Session) -> int:
+    """Number of distinct stored files, as maintained alongside the frequencies"""
+    row = db.query(TermDocumentFrequency.df).filter(TermDocumentFrequency.term == CORPUS_SIZE_TERM)
+    return row.scalar() or 0
+
+
+def load_frequencies(db: Session, terms: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Document frequencies for the given terms (or all of them)"""
+    query = db.query(TermDocumentFrequency.term, TermDocumentFrequency.df)
+    if terms is None:
+        return dict(query.filter(TermDocumentFrequency.term != CORPUS_SIZE_TERM).all())
+    frequencies: Dict[str, int] = {}
+    for batch in _batches(sorted(set(terms))):
+        frequencies.update(query.filter(TermDocumentFrequency.term.in_(batch)).all())
+    return frequencies
+
+
+def score_terms(counts: Counter, frequencies: Dict[str, int], documents: int) -> List[str]:
+    """Candidate terms ordered best first by TF-IDF"""
+    terms = [
+        term for term, count in counts.items()
+        if " " not in term or count >= MIN_BIGRAM_COUNT
+    ]
+    if not terms:
+        return []
+
+    tf = np.fromiter((counts[term] for term in terms), dtype=np.float64, count=len(terms))
+    scores = 1.0 + np.log(tf)
+    if documents >= MIN_CORPUS_SIZE:
+        df = np.fromiter((frequencies.get(term, 1) for term in terms), dtype=np.float64, count=len(terms))
+        # Smoothed IDF that reaches zero for terms in every file
+        scores *= np.log((1.0 + documents) / (1.0 + np.minimum(df, documents)))
+    is_phrase = np.fromiter((" " in term for term in terms), dtype=bool, count=len(terms))
+    scores[is_phrase] *= PHRASE_BOOST
+
+    # Best first; ties go to the more frequent, then alphabetical, term
+    order = np.lexsort((np.array(terms), -tf, -scores))
+    return [terms[index] for index in order if scores[index] > 0]
+
+
+def pick_tags(ranked: Iterable[str], max_tags: int) -> List[str]:
+    """Top terms, skipping words already covered by a chosen phrase and vice versa"""
+    tags: List[str] = []
+    covered: Set[str] = set()
+    for term in ranked:
+        words = term.split()
+        if any(word in covered for word in words) or term in covered:
+            continue
+        tags.append(term)
+        covered.update(words)
+        covered.add(term)
+        if len(tags) >= max_tags:
+            break
+    return tags
+
+
+def suggest_tags(db: Session, pages: Iterable[str], max_tags: int = 5,
+                 frequencies: Optional[Dict[str, int]] = None,
+                 documents: Optional[int] = None) -> List[str]:
+    """
+    Tags for a document from its stored page text. Pass ``frequencies`` and
+    ``documents`` (from ``load_frequencies()`` / ``corpus_size``) when tagging
+    many documents to read the frequency table only once.
+    """
+    counts = count_terms(pages)
+    if not counts:
+        return []
+    if frequencies is None:
+        frequencies = load_frequencies(db, counts)
+    if documents is None:
+        documents = corpus_size(db)
+    return pick_tags(score_terms(counts, frequencies, documents), max_tags)
+
+
+class TermCounter:
+    """
+    ``count_terms`` fed one page at a time, holding at most ``max_terms``
+    distinct terms: when it overflows, the least frequent half is dropped.
+    Those are one-off words that could not outrank what is kept.
+    """
+
+    def __init__(self, max_terms: int = MAX_TRACKED_TERMS):
+        self.max_terms = max_terms
+        self.counts: Counter = Counter()
+        self.pages = 0
+        self.characters = 0
+
+    def add_page(self, page: str):
+        _count_page(self.counts, page)
+        self.pages += 1
+        self.characters += len(page.strip())
+        if len(self.counts) > self.max_terms:
+            self.counts = Counter(dict(self.counts.most_common(self.max_terms // 2)))
+
+
+@dataclass
+class TagRun:
+    """Tags from a streamed document and how much of it they are based on"""
+    tags: List[str] = field(default_factory=list)
+    pages: int = 0
+    characters: int = 0
+    stopped: Optional[str] = None  # "stable", "pages", "characters" or "time"
+
+
+def suggest_tags_streaming(db: Session, pages: Iterable[str], max_tags: int = 5,
+                           frequencies: Optional[Dict[str, int]] = None,
+                           documents: Optional[int] = None,
+                           max_pages: int = 0, max_chars: int = 0,
+                           time_budget: Optional[float] = None) -> TagRun:
+    """
+    ``suggest_tags`` over pages consumed one at a time, stopping at the first
+    budget reached (0 / None: no limit) or once the ranking is stable.
+    Document frequencies are read only for terms not seen before.
+    """
+    if documents is None:
+        documents = corpus_size(db)
+    known = frequencies if frequencies is not None else {}
+    fetched: Set[str] = set()
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    def rank() -> List[str]:
+        if frequencies is None and documents >= MIN_CORPUS_SIZE:
+            new_terms = [term for term in counter.counts if term not in fetched]
+            known.update(load_frequencies(db, new_terms))
+            fetched.update(new_terms)
+            if len(fetched) > 2 * counter.max_terms:
+                # Forget terms the counter has dropped
+                fetched.intersection_update(counter.counts)
+                for term in set(known) - fetched:
+                    del known[term]
+        return pick_tags(score_terms(counter.counts, known, documents), max_tags)
+
+    counter = TermCounter()
+    run = TagRun()
+    stable = 0
+    for page in pages:
+        if max_pages and counter.pages >= max_pages:
+            run.stopped = "pages"
+            break
+        if max_chars and counter.characters >= max_chars:
+            run.stopped = "characters"
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            run.stopped = "time"
+            break
+        counter.add_page(page)
+        if counter.pages % STABILITY_CHECK_PAGES == 0:
+            tags = rank()
+            stable = stable + 1 if tags and tags == run.tags else 0
+            run.tags = tags
+            if stable >= STABLE_CHECKS:
+                run.stopped = "stable"
+                break
+
+    if run.stopped != "stable":
+        run.tags = rank() if counter.counts else []
+    run.pages = counter.pages
+    run.characters = counter.characters
+    return run
+
+
+def retag_library(db: Session, max_tags: int = 5) -> Dict[str, List[str]]:
+    """Suggested tags for every stored file, keyed by checksum, from stored text only"""
+    frequencies = load_frequencies(db)
+    documents = corpus_size(db)
+    suggestions: Dict[str, List[str]] = {}
+    current, pages = None, []
+    rows = db.query(ExtractedPage.checksum, ExtractedPage.text).order_by(
+        ExtractedPage.checksum, ExtractedPage.page_number
+    )
+    for checksum, text in rows.yield_per(1000):
+        if checksum != current:
+            if current is not None:
+                suggestions[current] = suggest_tags(db, pages, max_tags, frequencies, documents)
+            current, pages = checksum, []
+        pages.append(text)
+    if current is not None:
+        suggestions[current] = suggest_tags(db, pages, max_tags, frequencies, documents)
+    return suggestions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.database import SessionLocal, create_tables
+
+    # python -m services.tagger [--rebuild] [--max-tags 5]
+    parser = argparse.ArgumentParser(description="Suggest tags for every stored PDF from its stored text")
+    parser.add_argument("--rebuild", action="store_true", help="Recount document frequencies first")
+    parser.add_argument("--max-tags", type=int, default=5)
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"Counted terms of {rebuild_document_frequencies(db)} files")
+            db.commit()
+        started = time.perf_counter()
+        suggestions = retag_library(db, args.max_tags)
+        elapsed = time.perf_counter() - started
+        for checksum, tags in suggestions.items():
+            print(f"{checksum[:12]}  {', '.join(tags)}")
+        print(f"Tagged {len(suggestions)} files in {elapsed:.2f} s")
+    finally:
+        db.close()
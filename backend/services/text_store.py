@@ -0,0 +1,210 @@
+# services/text_store.py
+"""
+Extracted PDF text, stored per page.
+
+Pages are keyed by the SHA-256 of the file they came from, so a file is
+parsed once at ingest and every later reader (tag generation, search
+reindexing, text previews) gets the stored text. Duplicate uploads share one
+copy. A PDF whose file changes on disk gets a new checksum and is parsed
+again; the old pages are dropped once nothing references them.
+
+Storing a file's text also indexes its MinHash signature for near-duplicate
+lookups (``services.duplicates``) and its term vector for similar-document
+lookups (``services.vector_index``).
+
+Extraction runs under the budgets of ``services.pdf_processor``; when one
+cuts a file short, ``extracted_documents`` records the file's real page
+count and which budget stopped it.
+"""
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.models.extracted_text import ExtractedDocument, ExtractedPage
+from app.models.pdf import PDF
+from services import duplicates, search_index, tagger, vector_index
+from services.pdf_processor import Extraction, extract_within, extraction
+from services.storage import read_metadata, upload_path
+
+
+def get_pages(db: Session, checksum: str) -> Optional[List[str]]:
+    """Stored page texts for this content, or None if it was never extracted"""
+    return get_pages_many(db, [checksum]).get(checksum)
+
+
+def get_pages_many(db: Session, checksums: Iterable[str]) -> Dict[str, List[str]]:
+    """Stored page texts for several files with one query"""
+    checksums = {checksum for checksum in checksums if checksum}
+    if not checksums:
+        return {}
+    pages: Dict[str, List[str]] = {}
+    rows = (
+        db.query(ExtractedPage.checksum, ExtractedPage.text)
+        .filter(ExtractedPage.checksum.in_(checksums))
+        .order_by(ExtractedPage.checksum, ExtractedPage.page_number)
+    )
+    for checksum, text in rows:
+        pages.setdefault(checksum, []).append(text)
+    return pages
+
+
+def iter_stored_pages(db: Session, checksum: str, batch_size: int = 50) -> Iterator[str]:
+    """Stored page texts of one file in order, read from the database in batches"""
+    rows = (
+        db.query(ExtractedPage.text)
+        .filter(ExtractedPage.checksum == checksum)
+        .order_by(ExtractedPage.page_number)
+    )
+    for (text,) in rows.yield_per(batch_size):
+        yield text
+
+
+def get_document(db: Session, checksum: str) -> Optional[ExtractedDocument]:
+    """Page count and extraction budget outcome of a stored file (None if stored before budgets)"""
+    return db.query(ExtractedDocument).get(checksum) if checksum else None
+
+
+def stored_page_count(db: Session, checksum: str) -> int:
+    return db.query(ExtractedPage).filter(ExtractedPage.checksum == checksum).count()
+
+
+def has_pages(db: Session, checksum: str) -> bool:
+    return db.query(ExtractedPage.checksum).filter(ExtractedPage.checksum == checksum).first() is not None
+
+
+def save_pages(db: Session, checksum: str, pages: List[str], page_count: Optional[int] = None,
+               stopped: Optional[str] = None):
+    """Store the page texts of a file and count its terms (caller commits)"""
+    previous = get_pages(db, checksum)
+    if previous is not None:
+        tagger.remove_document(db, previous)
+        db.query(ExtractedPage).filter(ExtractedPage.checksum == checksum).delete(synchronize_session=False)
+    tagger.add_document(db, pages)
+    vector_index.add_document(db, checksum, pages)
+    db.add_all(
+        ExtractedPage(checksum=checksum, page_number=number, text=text)
+        for number, text in enumerate(pages)
+    )
+    db.merge(ExtractedDocument(
+        checksum=checksum,
+        page_count=len(pages) if page_count is None else page_count,
+        stopped=stopped,
+        minhash=duplicates.index_document(db, checksum, pages),
+    ))
+
+
+def save_extraction(db: Session, checksum: str, result: Extraction):
+    """``save_pages`` for the result of a budgeted extraction (caller commits)"""
+    save_pages(db, checksum, result.pages, result.page_count, result.stopped)
+
+
+def save_extraction_once(db: Session, checksum: str, result: Extraction) -> bool:
+    """
+    ``save_extraction`` in a savepoint. If another request stored the same
+    content first, only this insert is undone (its text is identical) and
+    False is returned; the rest of the transaction stands (caller commits).
+    """
+    try:
+        with db.begin_nested():
+            save_extraction(db, checksum, result)
+    except IntegrityError:
+        return False
+    return True
+
+
+def drop_unreferenced(db: Session, checksums: Iterable[str]):
+    """Forget page texts of content no PDF points at any more (caller commits)"""
+    checksums = {checksum for checksum in checksums if checksum}
+    if not checksums:
+        return
+    in_use = {row[0] for row in db.query(PDF.checksum).filter(PDF.checksum.in_(checksums)).distinct()}
+    unused = checksums - in_use
+    for pages in get_pages_many(db, unused).values():
+        tagger.remove_document(db, pages)
+    if unused:
+        db.query(ExtractedPage).filter(ExtractedPage.checksum.in_(unused)).delete(synchronize_session=False)
+        db.query(ExtractedDocument).filter(ExtractedDocument.checksum.in_(unused)).delete(
+            synchronize_session=False
+        )
+        duplicates.forget(db, unused)
+        vector_index.remove_documents(db, unused)
+
+
+def _file_changed(pdf: PDF, file_stat: os.stat_result) -> bool:
+    # One stat() instead of hashing: size or mtime differing from what was
+    # recorded at upload means the file was replaced
+    if not pdf.checksum or pdf.size is None or pdf.file_mtime is None:
+        return True
+    return file_stat.st_size != pdf.size or datetime.utcfromtimestamp(file_stat.st_mtime) != pdf.file_mtime
+
+
+def _prepare(db: Session, pdf: PDF) -> Tuple[str, bool, bool]:
+    """Locate the file, refresh its metadata if it changed and check whether its text is stored"""
+    from app.api.catalog_version import bump_catalog_version
+
+    file_path = upload_path(pdf.path)
+    # Raises FileNotFoundError for a missing file
+    changed = _file_changed(pdf, os.stat(file_path))
+    if changed:
+        previous = pdf.checksum
+        metadata = read_metadata(file_path)
+        pdf.size = metadata.size
+        pdf.file_mtime = metadata.mtime
+        pdf.checksum = metadata.checksum
+        db.flush()
+        drop_unreferenced(db, [previous])
+        # Listings show the size
+        bump_catalog_version(db)
+    return file_path, changed, has_pages(db, pdf.checksum)
+
+
+def _store(db: Session, pdf: PDF, result: Optional[Extraction], changed: bool):
+    if result is not None:
+        save_extraction_once(db, pdf.checksum, result)
+    if changed:
+        # Keep search in step with the new contents
+        pages = result.pages if result is not None else get_pages(db, pdf.checksum) or []
+        search_index.set_content(db, pdf.id, "\n".join(pages))
+    if changed or result is not None:
+        db.commit()
+
+
+def ensure_pages(db: Session, pdf: PDF) -> List[str]:
+    """
+    Page texts of a PDF, extracting (and storing) them only when the stored
+    file has never been parsed or has changed since. Commits when it had to
+    extract; raises FileNotFoundError if the file is missing. Blocking, and
+    parses in the calling process: async code uses ``load_pages``.
+    """
+    file_path, changed, stored = _prepare(db, pdf)
+    result = None if stored else extract_within(file_path)
+    _store(db, pdf, result, changed)
+    return result.pages if result is not None else get_pages(db, pdf.checksum) or []
+
+
+async def ensure_stored(db: Session, pdf: PDF) -> Optional[Extraction]:
+    """
+    Make sure the text of a PDF is stored, parsing it in the extraction
+    process pool if needed; returns the extraction when it had to parse.
+    """
+    file_path, changed, stored = await run_in_threadpool(_prepare, db, pdf)
+    result = None if stored else await extraction.extract(file_path)
+    await run_in_threadpool(_store, db, pdf, result, changed)
+    return result
+
+
+async def load_pages(db: Session, pdf: PDF) -> List[str]:
+    """``ensure_pages`` for async code: parsing runs in the extraction process pool"""
+    result = await ensure_stored(db, pdf)
+    if result is not None:
+        return result.pages
+    return await run_in_threadpool(get_pages, db, pdf.checksum) or []
+
+
+async def load_text(db: Session, pdf: PDF) -> str:
+    """Whole-document text of a PDF, one line break between pages"""
+    return "\n".join(await load_pages(db, pdf))
@@ -0,0 +1,139 @@
+# services/thumbnails.py
+"""
+First-page thumbnails for the library grid.
+
+Page one is rendered in the extraction process pool, never on the event
+loop. With PyMuPDF installed (``pip install pymupdf``) it is rasterised to a
+PNG. Without it the preview is an SVG drawn from what PyPDF2 can read, the
+page's shape and the lines of text on it, which is enough to tell worksheets
+apart.
+
+Thumbnails are cached on disk (``services.disk_cache``) by content checksum
+and size, so a file uploaded twice shares them and a changed file gets new
+ones. The cache holds at most ``THUMBNAIL_CACHE_BYTES``.
+"""
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+from xml.sax.saxutils import escape
+
+import PyPDF2
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from services.disk_cache import DiskCache
+from services.pdf_processor import extraction
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # SVG previews drawn from PyPDF2 instead
+    fitz = None
+
+# Requested sizes (longest side, in pixels) are rounded up to one of these,
+# so the cache holds a handful of variants per file
+SIZES = (128, 256, 512)
+DEFAULT_SIZE = 256
+
+FORMAT = "png" if fitz is not None else "svg"
+MEDIA_TYPE = {"png": "image/png", "svg": "image/svg+xml"}[FORMAT]
+
+# Pages with a missing or broken media box are drawn as US Letter
+_LETTER = (612.0, 792.0)
+
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def snap_size(size: int) -> int:
+    """The smallest cached size at least as large as ``size`` (the largest if none is)"""
+    for candidate in SIZES:
+        if size <= candidate:
+            return candidate
+    return SIZES[-1]
+
+
+def thumbnail_url(pdf_id: int, checksum: Optional[str]) -> str:
+    """API path of a PDF's thumbnail, versioned by its content so it can be cached for good"""
+    url = f"/api/pdfs/{pdf_id}/thumbnail"
+    return f"{url}?v={checksum[:16]}" if checksum else url
+
+
+def preview_svg(width: float, height: float, text: str, size: int) -> str:
+    """An SVG page of the given shape showing the first lines of ``text``"""
+    scale = size / max(width, height)
+    margin = width * 0.08
+    font_size = max(height / 45, 6.0)
+    line_height = font_size * 1.4
+    max_chars = max(int((width - 2 * margin) / (font_size * 0.55)), 1)
+    max_lines = max(int((height - 2 * margin) / line_height), 0)
+
+    lines = [" ".join(line.split()) for line in _CONTROL_CHARS.sub("", text).splitlines()]
+    lines = [line for line in lines if line][:max_lines]
+
+    elements = []
+    for index, line in enumerate(lines):
+        if len(line) > max_chars:
+            line = line[:max_chars - 1] + "…"
+        y = margin + font_size + line_height * index
+        elements.append(f'<text x="{margin:.1f}" y="{y:.1f}">{escape(line)}</text>')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{round(width * scale)}" '
+        f'height="{round(height * scale)}" viewBox="0 0 {width:g} {height:g}">'
+        f'<rect width="{width:g}" height="{height:g}" fill="#fff" stroke="#ccc" stroke-width="{width / 100:.1f}"/>'
+        f'<g font-family="sans-serif" font-size="{font_size:.1f}" fill="#333">{"".join(elements)}</g>'
+        f'</svg>'
+    )
+
+
+def _page_shape(page: PyPDF2.PageObject) -> Tuple[float, float]:
+    try:
+        width, height = float(page.mediabox.width), float(page.mediabox.height)
+    except Exception:
+        return _LETTER
+    if width <= 0 or height <= 0:
+        return _LETTER
+    if (page.rotation or 0) % 180:
+        width, height = height, width
+    return width, height
+
+
+def _render_svg(file_path: str, size: int) -> bytes:
+    with open(file_path, "rb") as file:
+        page = PyPDF2.PdfReader(file).pages[0]
+        width, height = _page_shape(page)
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            text = ""
+    return preview_svg(width, height, text, size).encode("utf-8")
+
+
+def _render_png(file_path: str, size: int) -> bytes:
+    with fitz.open(file_path) as document:
+        page = document.load_page(0)
+        scale = size / max(page.rect.width, page.rect.height)
+        return page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False).tobytes("png")
+
+
+def render_first_page(file_path: str, size: int) -> bytes:
+    """Thumbnail of the first page, ``size`` pixels along its longest side, in FORMAT"""
+    if fitz is not None:
+        return _render_png(file_path, size)
+    return _render_svg(file_path, size)
+
+
+def thumbnail_dir() -> Path:
+    return Path(settings.THUMBNAIL_DIR or settings.UPLOAD_DIR.parent / "thumbnails")
+
+
+cache = DiskCache(f".{FORMAT}", thumbnail_dir, lambda: settings.THUMBNAIL_CACHE_BYTES)
+
+
+async def get_thumbnail(file_path: str, checksum: str, size: int) -> Tuple[str, os.stat_result]:
+    """Path and stat of the thumbnail of a file's first page, rendered in the pool on a miss"""
+    key = f"{checksum}-{size}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    data = await extraction.run(render_first_page, file_path, size)
+    return await run_in_threadpool(cache.put, key, data)
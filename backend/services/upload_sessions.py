@@ -0,0 +1,273 @@
+# services/upload_sessions.py
+"""
+Resumable uploads.
+
+A session is a directory under the staging area holding the upload's
+metadata, a data file preallocated to the full upload size and one marker
+file per chunk that has been written and fsynced. Chunks are written straight
+to their offset, so they may arrive in any order, be retried, or come from
+several connections at once. Everything lives on disk, so any worker process
+can serve any chunk and a restart loses nothing.
+
+Sessions that see no activity for ``UPLOAD_SESSION_TTL_HOURS`` are removed by
+``collect_expired``, which also clears staged files left by interrupted
+single-request uploads.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from services.storage import StagedUpload, sha256_file, staging_dir
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Run the opportunistic sweep at most this often per process
+COLLECT_INTERVAL_SECONDS = 10 * 60
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+_last_collect = 0.0
+_collect_lock = threading.Lock()
+
+
+class UploadSessionError(Exception):
+    """A request that does not fit the session (wrong chunk, size or state)"""
+
+
+@dataclass
+class UploadSession:
+    id: str
+    filename: str
+    size: int
+    chunk_size: int
+    tags: str = ""
+    folder_id: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index: int) -> int:
+        """Exact byte length chunk ``index`` must have"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+def sessions_root() -> str:
+    path = os.path.join(staging_dir(), "sessions")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _session_dir(session_id: str) -> str:
+    # Ids are only ever ours; anything else could name a path outside the root
+    if not _SESSION_ID.match(session_id):
+        raise KeyError(session_id)
+    return os.path.join(sessions_root(), session_id)
+
+
+def _data_path(session_id: str) -> str:
+    return os.path.join(_session_dir(session_id), "data.part")
+
+
+def _chunks_dir(session_id: str) -> str:
+    return os.path.join(_session_dir(session_id), "chunks")
+
+
+def _touch(session_id: str):
+    # The session directory's mtime records its last activity for expiry
+    os.utime(_session_dir(session_id))
+
+
+def create_session(filename: str, size: int, chunk_size: Optional[int] = None,
+                   tags: str = "", folder_id: Optional[str] = None) -> UploadSession:
+    """Start a session and preallocate its data file. Blocking: call through run_in_threadpool."""
+    chunk_size = chunk_size or settings.RESUMABLE_CHUNK_SIZE
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise UploadSessionError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+    if size <= 0 or size > settings.MAX_UPLOAD_SIZE:
+        raise UploadSessionError(f"size must be between 1 and {settings.MAX_UPLOAD_SIZE} bytes")
+
+    collect_expired_if_due()
+
+    session = UploadSession(
+        id=uuid.uuid4().hex, filename=filename, size=size, chunk_size=chunk_size,
+        tags=tags, folder_id=folder_id,
+    )
+    os.makedirs(_chunks_dir(session.id))
+    with open(_data_path(session.id), "wb") as f:
+        # Reserve the space up front where the platform allows it, so a full
+        # disk fails here instead of halfway through the upload
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+            except OSError:
+                f.truncate(size)
+        else:
+            f.truncate(size)
+
+    meta_path = os.path.join(_session_dir(session.id), "session.json")
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(asdict(session), f)
+    os.replace(meta_path + ".tmp", meta_path)
+    return session
+
+
+def load_session(session_id: str) -> Optional[UploadSession]:
+    """The session with this id, or None if it does not exist (or has expired)"""
+    try:
+        with open(os.path.join(_session_dir(session_id), "session.json")) as f:
+            return UploadSession(**json.load(f))
+    except (KeyError, FileNotFoundError):
+        return None
+
+
+def received_chunks(session: UploadSession) -> List[int]:
+    """Indexes of the chunks that are durably written"""
+    try:
+        names = os.listdir(_chunks_dir(session.id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def missing_chunks(session: UploadSession) -> List[int]:
+    received = set(received_chunks(session))
+    return [index for index in range(session.chunk_count) if index not in received]
+
+
+async def write_chunk(session: UploadSession, index: int, body: AsyncIterator[bytes],
+                      offset: Optional[int] = None) -> int:
+    """
+    Write one chunk straight to its offset in the data file as the body
+    arrives. The chunk is only recorded as received once all of its bytes are
+    written and fsynced, so a dropped connection just means sending it again.
+    """
+    if not 0 <= index < session.chunk_count:
+        raise UploadSessionError(f"chunk index must be between 0 and {session.chunk_count - 1}")
+    start = index * session.chunk_size
+    if offset is not None and offset != start:
+        raise UploadSessionError(f"chunk {index} starts at offset {start}, not {offset}")
+    expected = session.chunk_length(index)
+
+    try:
+        fd = await run_in_threadpool(os.open, _data_path(session.id), os.O_WRONLY)
+    except FileNotFoundError:
+        raise UploadSessionError("upload session is no longer open")
+    written = 0
+    try:
+        async for data in body:
+            if not data:
+                continue
+            if written + len(data) > expected:
+                raise UploadSessionError(f"chunk {index} must be exactly {expected} bytes")
+            # pwrite is positional, so concurrent chunks never share a file offset
+            await run_in_threadpool(os.pwrite, fd, data, start + written)
+            written += len(data)
+        if written != expected:
+            raise UploadSessionError(f"chunk {index} must be exactly {expected} bytes, got {written}")
+        await run_in_threadpool(os.fsync, fd)
+    finally:
+        os.close(fd)
+
+    marker = os.path.join(_chunks_dir(session.id), str(index))
+    await run_in_threadpool(_mark_received, marker, session.id)
+    return written
+
+
+def _mark_received(marker: str, session_id: str):
+    with open(marker, "w"):
+        pass
+    _touch(session_id)
+
+
+def finish_session(session: UploadSession) -> StagedUpload:
+    """
+    Turn a complete session into a staged upload and remove the session.
+    Blocking: call through run_in_threadpool.
+    """
+    missing = missing_chunks(session)
+    if missing:
+        raise UploadSessionError(f"{len(missing)} chunks have not been received")
+
+    tmp_path = os.path.join(staging_dir(), f"upload-{session.id}.part")
+    try:
+        # Claims the data file: a concurrent finish of the same session fails here
+        os.replace(_data_path(session.id), tmp_path)
+    except FileNotFoundError:
+        raise UploadSessionError("upload session is already being finished")
+    shutil.rmtree(_session_dir(session.id), ignore_errors=True)
+
+    return StagedUpload(tmp_path=tmp_path, size=os.path.getsize(tmp_path), checksum=sha256_file(tmp_path))
+
+
+def delete_session(session_id: str) -> bool:
+    """Abort a session and free its space"""
+    try:
+        path = _session_dir(session_id)
+    except KeyError:
+        return False
+    if not os.path.isdir(path):
+        return False
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def collect_expired(max_age_seconds: Optional[float] = None) -> int:
+    """
+    Remove sessions idle for longer than the TTL, and staged files of the same
+    age left by interrupted uploads. Returns how many were removed.
+    """
+    if max_age_seconds is None:
+        max_age_seconds = settings.UPLOAD_SESSION_TTL_HOURS * 3600
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+
+    root = sessions_root()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            pass
+
+    staging = staging_dir()
+    for name in os.listdir(staging):
+        path = os.path.join(staging, name)
+        try:
+            if name.endswith(".part") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def collect_expired_if_due() -> int:
+    """Run ``collect_expired`` unless this process already did so recently"""
+    global _last_collect
+    with _collect_lock:
+        now = time.time()
+        if now - _last_collect < COLLECT_INTERVAL_SECONDS:
+            return 0
+        _last_collect = now
+    removed = collect_expired()
+    if removed:
+        print(f"Removed {removed} expired upload sessions and staged files")
+    return removed
+
+
+if __name__ == "__main__":
+    # python -m services.upload_sessions  (e.g. from cron)
+    print(f"Removed {collect_expired()} expired upload sessions and staged files")
@@ -0,0 +1,405 @@
+# services/vector_index.py
+"""
+"More like this" over stored text: an in-process vector index.
+
+Each stored file is a ``DIMENSIONS``-wide hashed TF-IDF vector of its words
+and phrases (signed feature hashing), L2-normalised so that a dot product is
+the cosine similarity. Vectors are keyed by checksum like the text store and
+live in memory-mapped files under ``VECTOR_INDEX_DIR``:
+
+    vectors.f32   float32 matrix, one row per vector, append-only
+    rows.txt      checksum of each row, one line per row
+    deleted.txt   numbers of tombstoned rows, one per line
+
+Storing a file appends a row and dropping one appends a tombstone, so
+neither rewrites the matrix; ``compact`` rewrites it without the dead rows.
+A query scores the live rows in blocks, one matrix product per block, and
+keeps the best k with ``argpartition``. Appends by other processes are
+picked up by watching the size of the row files.
+
+The files are not part of the database transaction, so ``add_document``
+and ``remove_documents`` only queue their change on the session; it is
+written once the session commits and dropped if it rolls back (savepoints
+included). ``sync`` (at startup and from the CLI) adds stored files missing
+from the index and tombstones rows whose text is gone.
+"""
+import logging
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from services import tagger
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialised within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = 512
+
+# Rows scored per matrix product: bounds the temporary score buffer
+BLOCK_ROWS = 16384
+
+_HIGH_BIT = 1 << 31
+
+
+def index_dir() -> Path:
+    return Path(settings.VECTOR_INDEX_DIR or settings.UPLOAD_DIR.parent / "vector_index")
+
+
+def vectorize(counts: Dict[str, int], frequencies: Dict[str, int], documents: int,
+              dimensions: int = DIMENSIONS) -> Optional[np.ndarray]:
+    """Unit-length hashed TF-IDF vector of term counts, or None if there are no terms"""
+    if not counts:
+        return None
+    terms = list(counts)
+    tf = np.fromiter((counts[term] for term in terms), dtype=np.float64, count=len(terms))
+    df = np.fromiter((frequencies.get(term, 1) for term in terms), dtype=np.float64, count=len(terms))
+    # Smoothed IDF that stays positive, so small libraries still get vectors
+    weights = (1.0 + np.log(tf)) * (1.0 + np.log((1.0 + documents) / (1.0 + np.minimum(df, documents))))
+
+    hashes = np.fromiter((zlib.crc32(term.encode()) for term in terms), dtype=np.uint32, count=len(terms))
+    signs = np.where(hashes & _HIGH_BIT, -1.0, 1.0)
+    vector = np.zeros(dimensions, dtype=np.float64)
+    np.add.at(vector, hashes % dimensions, signs * weights)
+    norm = np.linalg.norm(vector)
+    if not norm:
+        return None
+    return (vector / norm).astype(np.float32)
+
+
+def document_vector(db: Session, pages: Iterable[str]) -> Optional[np.ndarray]:
+    """Vector of a document's text, weighted by the library's document frequencies"""
+    counts = tagger.count_terms(pages)
+    if not counts:
+        return None
+    return vectorize(counts, tagger.load_frequencies(db, counts), tagger.corpus_size(db))
+
+
+class VectorIndex:
+    def __init__(self, directory: Optional[Path] = None, dimensions: int = DIMENSIONS):
+        self._directory = Path(directory) if directory else None
+        self.dimensions = dimensions
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._checksums: List[str] = []
+        self._rows: Dict[str, int] = {}  # Live row of each checksum
+        self._live = np.zeros(0, dtype=bool)
+        self._matrix: Optional[np.ndarray] = None
+        self._seen: Dict[str, Tuple[int, int]] = {}  # File -> (inode, bytes read)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory or index_dir()
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _new_lines(self, name: str) -> Optional[List[str]]:
+        """Lines appended to a row file since the last read; None if it was replaced"""
+        path = self._path(name)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None if name in self._seen else []
+        inode, offset = self._seen.get(name, (stat.st_ino, 0))
+        if inode != stat.st_ino or stat.st_size < offset:
+            return None
+        if stat.st_size == offset:
+            return []
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read()
+        # Only whole lines: a writer may be half-way through one
+        complete = data[:data.rfind(b"\n") + 1]
+        self._seen[name] = (stat.st_ino, offset + len(complete))
+        return complete.decode().splitlines()
+
+    def _refresh(self):
+        added = self._new_lines("rows.txt")
+        deleted = self._new_lines("deleted.txt")
+        if added is None or deleted is None:
+            # Compacted by another process: read everything again
+            self._reset()
+            added, deleted = self._new_lines("rows.txt") or [], self._new_lines("deleted.txt") or []
+
+        if added:
+            first = len(self._checksums)
+            self._checksums.extend(added)
+            self._live = np.concatenate([self._live, np.ones(len(added), dtype=bool)])
+            for row, checksum in enumerate(added, start=first):
+                previous = self._rows.get(checksum)
+                if previous is not None:
+                    self._live[previous] = False
+                self._rows[checksum] = row
+            self._matrix = None
+        for line in deleted:
+            row = int(line)
+            if row < len(self._checksums):
+                self._live[row] = False
+                if self._rows.get(self._checksums[row]) == row:
+                    del self._rows[self._checksums[row]]
+
+        if self._matrix is None and self._checksums:
+            self._matrix = np.memmap(
+                self._path("vectors.f32"), dtype=np.float32, mode="r",
+                shape=(len(self._checksums), self.dimensions),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def __contains__(self, checksum: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return checksum in self._rows
+
+    def checksums(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return list(self._rows)
+
+    def get(self, checksum: str) -> Optional[np.ndarray]:
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(checksum)
+            return None if row is None else np.array(self._matrix[row])
+
+    @contextmanager
+    def _writing(self):
+        # One writer at a time, across processes too
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self._path("lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._refresh()
+                yield
+
+    def add_many(self, items: Sequence[Tuple[str, np.ndarray]]):
+        """Append vectors; a checksum already present gets its old row tombstoned"""
+        if not items:
+            return
+        with self._writing():
+            replaced = [self._rows[checksum] for checksum, _ in items if checksum in self._rows]
+            matrix = np.stack([np.asarray(vector, dtype=np.float32) for _, vector in items])
+            # Vectors first: a row listed in rows.txt always has its data on
+            # disk. Anything past the listed rows is from an interrupted write.
+            with open(self._path("vectors.f32"), "ab") as file:
+                file.truncate(len(self._checksums) * self.dimensions * 4)
+                file.write(matrix.astype("<f4").tobytes())
+            with open(self._path("rows.txt"), "a") as file:
+                file.write("".join(f"{checksum}\n" for checksum, _ in items))
+            if replaced:
+                self._tombstone(replaced)
+            self._refresh()
+
+    def add(self, checksum: str, vector: np.ndarray):
+        self.add_many([(checksum, vector)])
+
+    def _tombstone(self, rows: Iterable[int]):
+        with open(self._path("deleted.txt"), "a") as file:
+            file.write("".join(f"{row}\n" for row in rows))
+
+    def remove(self, checksums: Iterable[str]):
+        """Tombstone the rows of these checksums"""
+        checksums = list(checksums)
+        if not checksums:
+            return
+        with self._writing():
+            rows = [self._rows[checksum] for checksum in checksums if checksum in self._rows]
+            if rows:
+                self._tombstone(rows)
+                self._refresh()
+
+    def search_many(self, queries: np.ndarray, k: int, allowed: Optional[Iterable[str]] = None,
+                    exclude: Iterable[str] = ()) -> List[List[Tuple[str, float]]]:
+        """
+        Best ``k`` (checksum, cosine) matches for each query vector, best
+        first, among live rows (and only ``allowed`` checksums when given).
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            self._refresh()
+            matrix, live, checksums = self._matrix, self._live.copy(), self._checksums
+            if allowed is not None:
+                mask = np.zeros_like(live)
+                mask[[self._rows[checksum] for checksum in allowed if checksum in self._rows]] = True
+                live &= mask
+            for checksum in exclude:
+                if checksum in self._rows:
+                    live[self._rows[checksum]] = False
+        if matrix is None or k <= 0:
+            return [[] for _ in queries]
+
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        sparse = np.count_nonzero(live) < len(live) // 4
+        candidates = np.flatnonzero(live)
+        for start in range(0, len(candidates) if sparse else len(live), BLOCK_ROWS):
+            if sparse:
+                rows = candidates[start:start + BLOCK_ROWS]
+                scores = queries @ matrix[rows].T
+            else:
+                rows = np.arange(start, min(start + BLOCK_ROWS, len(live)))
+                scores = queries @ matrix[start:start + BLOCK_ROWS].T
+                scores[:, ~live[rows]] = -np.inf
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(rows, scores.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")
+            results.append([
+                (checksums[rows[i]], float(scores[i])) for i in order if scores[i] > 0
+            ])
+        return results
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[Iterable[str]] = None,
+               exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        return self.search_many(query[None, :], k, allowed, exclude)[0]
+
+    def compact(self):
+        """Rewrite the files with live rows only"""
+        with self._writing():
+            live = sorted(self._rows.items(), key=lambda item: item[1])
+            directory = self.directory
+            with open(directory / "vectors.f32.tmp", "wb") as file:
+                for start in range(0, len(live), BLOCK_ROWS):
+                    rows = [row for _, row in live[start:start + BLOCK_ROWS]]
+                    file.write(np.asarray(self._matrix[rows], dtype="<f4").tobytes())
+            with open(directory / "rows.txt.tmp", "w") as file:
+                file.write("".join(f"{checksum}\n" for checksum, _ in live))
+            open(directory / "deleted.txt.tmp", "w").close()
+            # Readers notice the new inodes and reload
+            for name in ("vectors.f32", "deleted.txt", "rows.txt"):
+                os.replace(directory / f"{name}.tmp", directory / name)
+            self._reset()
+            self._refresh()
+
+
+index = VectorIndex()
+
+
+def _queue(db: Session, checksum: str, vector: Optional[np.ndarray]):
+    # Kept with the innermost transaction, so a rolled back savepoint drops it
+    transaction = db.get_nested_transaction() or db.get_transaction()
+    db.info.setdefault("vector_index_pending", []).append((transaction, checksum, vector))
+
+
+def add_document(db: Session, checksum: str, pages: List[str]):
+    """
+    Index a file whose text was just stored (call after ``tagger.add_document``);
+    written when the session commits
+    """
+    _queue(db, checksum, document_vector(db, pages))
+
+
+def remove_documents(db: Session, checksums: Iterable[str]):
+    """Tombstone files whose stored text was dropped, when the session commits"""
+    for checksum in checksums:
+        _queue(db, checksum, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _write_pending(db: Session):
+    pending = db.info.pop("vector_index_pending", None)
+    if not pending:
+        return
+    # Last change per checksum wins, in the order they were made
+    latest = {checksum: vector for _, checksum, vector in pending}
+    try:
+        index.remove([checksum for checksum, vector in latest.items() if vector is None])
+        index.add_many([(checksum, vector) for checksum, vector in latest.items() if vector is not None])
+    except Exception as e:
+        # The text is committed; sync adds it at the next startup
+        logger.error(f"Error updating the vector index: {str(e)}")
+
+
+def _within(transaction, ancestor) -> bool:
+    while transaction is not None:
+        if transaction is ancestor:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(db: Session, previous_transaction):
+    pending = db.info.get("vector_index_pending")
+    if pending:
+        pending[:] = [item for item in pending if not _within(item[0], previous_transaction)]
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_pending(db: Session, transaction):
+    # Runs after after_commit; anything still queued was never committed (e.g. close())
+    if transaction.parent is None:
+        db.info.pop("vector_index_pending", None)
+
+
+def sync(db: Session, batch_size: int = 500) -> Tuple[int, int]:
+    """Index stored files missing from the index and tombstone the rest; returns (added, removed)"""
+    from app.models.extracted_text import ExtractedPage
+    from services import text_store
+
+    stored = {row[0] for row in db.query(ExtractedPage.checksum).distinct()}
+    indexed = set(index.checksums())
+    stale = indexed - stored
+    index.remove(stale)
+
+    missing = sorted(stored - indexed)
+    documents = tagger.corpus_size(db)
+    added = 0
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        pages = text_store.get_pages_many(db, batch)
+        items = []
+        for checksum in batch:
+            counts = tagger.count_terms(pages.get(checksum, []))
+            vector = vectorize(counts, tagger.load_frequencies(db, counts), documents)
+            if vector is not None:
+                items.append((checksum, vector))
+        index.add_many(items)
+        added += len(items)
+    return added, len(stale)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.database import SessionLocal, create_tables
+
+    # python -m services.vector_index [--compact]
+    parser = argparse.ArgumentParser(description="Bring the similar-documents index up to date with the stored text")
+    parser.add_argument("--compact", action="store_true", help="Rewrite the index without tombstoned rows")
+    args = parser.parse_args()
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        added, removed = sync(db)
+        print(f"Indexed {added} files, removed {removed}; {len(index)} in {index.directory}")
+        if args.compact:
+            index.compact()
+            print("Compacted the index")
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+# services/zip_stream.py
+"""
+ZIP archives written while they are sent.
+
+``stream_zip`` yields the archive piece by piece as it reads each file in
+fixed-size chunks, so memory stays constant whatever the files add up to
+and nothing is staged on disk. Entries are stored without compression (PDFs
+barely compress and it keeps the CPU idle). The output stream cannot seek
+back, so every entry's CRC and sizes follow its data in a data descriptor;
+ZIP64 records are written for files and archives past 4GB.
+"""
+import logging
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from a file (and sent on) at a time
+CHUNK_SIZE = 1024 * 1024
+
+# ZIP timestamps cannot go below this
+_EARLIEST_ZIP_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _Sink:
+    """Write target that hands whatever zipfile wrote back to the generator"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_time(mtime: float) -> Tuple[int, ...]:
+    return max(time.localtime(mtime)[:6], _EARLIEST_ZIP_TIME)
+
+
+def unique_names(names: Iterable[str]) -> List[str]:
+    """Archive member names: no directory parts, and " (2)" etc. added to repeats"""
+    seen = set()
+    unique = []
+    for name in names:
+        name = name.replace("/", "_").replace("\\", "_").strip() or "document.pdf"
+        stem, extension = os.path.splitext(name)
+        candidate, number = name, 2
+        while candidate.lower() in seen:
+            candidate = f"{stem} ({number}){extension}"
+            number += 1
+        seen.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+
+def stream_zip(files: Iterable[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    The bytes of a stored ZIP of (member name, path) pairs. Files that
+    cannot be opened are left out and logged.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, path in files:
+            try:
+                file = open(path, "rb")
+            except OSError as e:
+                logger.warning(f"Left {path} out of the archive: {str(e)}")
+                continue
+            with file:
+                file_stat = os.fstat(file.fileno())
+                info = zipfile.ZipInfo(name, date_time=_zip_time(file_stat.st_mtime))
+                info.compress_type = zipfile.ZIP_STORED
+                # Known up front, so zipfile picks ZIP64 headers when needed
+                info.file_size = file_stat.st_size
+                with archive.open(info, mode="w") as entry:
+                    while True:
+                        chunk = file.read(chunk_size)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        yield sink.drain()
+            data = sink.drain()
+            if data:
+                yield data
+    # The central directory, written when the archive closes
+    yield sink.drain()
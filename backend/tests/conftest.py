@@ -0,0 +1,38 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Point the app at a throwaway database and upload directory before any
+# app module reads its settings
+_tmp_dir = tempfile.mkdtemp(prefix="pdf_manager_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp_dir, "uploads")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.catalog_version import bump_catalog_version
+from app.core.database import Base, SessionLocal, engine
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        # Empty every table so each test starts from a clean catalog; the
+        # catalog version only ever moves forward
+        for table in reversed(Base.metadata.sorted_tables):
+            if table.name != "catalog_version":
+                session.execute(table.delete())
+        bump_catalog_version(session)
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
@@ -0,0 +1,47 @@
+# Conditional GET tests
+import pytest
+from sqlalchemy import event
+
+from app.core.database import engine
+
+
+@pytest.mark.parametrize("url", ["/api/pdfs/", "/api/folders/", "/api/tags/"])
+def test_matching_etag_gets_304_from_version_lookup_only(client, url):
+    etag = client.get(url).headers["etag"]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url, headers={"If-None-Match": etag})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert len(statements) == 1
+
+
+def test_etag_depends_on_query_params(client):
+    everything = client.get("/api/pdfs/").headers["etag"]
+    filtered = client.get("/api/pdfs/", params={"folder_id": "-1"}).headers["etag"]
+
+    assert everything != filtered
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda client: client.post("/api/folders/", json={"name": "Fractions"}),
+    lambda client: client.post("/api/tags/", json={"name": "math"}),
+])
+def test_mutations_change_every_collection_etag(client, mutate):
+    urls = ["/api/pdfs/", "/api/folders/", "/api/tags/"]
+    before = {url: client.get(url).headers["etag"] for url in urls}
+
+    mutate(client)
+
+    for url in urls:
+        response = client.get(url, headers={"If-None-Match": before[url]})
+        assert response.status_code == 200
+        assert response.headers["etag"] != before[url]
@@ -0,0 +1,62 @@
+# Database engine profile tests
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from app.core import database
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, engine_options, sqlite_pragmas
+from app.models.pdf import PDF
+
+
+def test_options_per_backend():
+    server = engine_options("postgresql://user@localhost/pdfs")
+    assert server["pool_size"] == settings.DB_POOL_SIZE
+    assert server["pool_pre_ping"] is settings.DB_POOL_PRE_PING
+    assert "connect_args" not in server
+
+    sqlite = engine_options("sqlite:///./pdf_manager.db")
+    assert sqlite["connect_args"]["timeout"] == settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    assert sqlite["pool_size"] == settings.DB_POOL_SIZE and sqlite["max_overflow"] == -1
+    assert "pool_pre_ping" not in sqlite
+    # An in-memory database would be a different one per pooled connection
+    assert "poolclass" not in engine_options("sqlite://")
+
+
+def test_sqlite_connections_get_the_pragmas():
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_invalid_pragma_values_are_refused(monkeypatch):
+    monkeypatch.setattr(database.settings, "SQLITE_JOURNAL_MODE", "wal; DROP TABLE pdfs")
+    with pytest.raises(ValueError):
+        sqlite_pragmas()
+
+
+def test_concurrent_writers_wait_for_the_lock(db):
+    errors = []
+
+    def write(worker: int):
+        session = SessionLocal()
+        try:
+            for index in range(10):
+                session.add(PDF(filename=f"{worker}-{index}.pdf", path=f"uploads/{worker}-{index}.pdf"))
+                session.commit()
+                session.query(PDF).count()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert db.query(PDF).count() == 80
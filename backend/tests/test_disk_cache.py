@@ -0,0 +1,32 @@
+# Disk cache tests
+import os
+import time
+
+from services.disk_cache import DiskCache
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(".bin", lambda: tmp_path, lambda: 350)
+    now = time.time()
+    for hours, key in [(6, "a"), (4, "b"), (2, "c")]:
+        cache.put(key, b"x" * 100)
+        os.utime(cache.path(key), (now - hours * 3600, now - hours * 3600))
+    # Reading the oldest makes it the most recently used
+    assert cache.get("a") is not None
+
+    cache.put("d", b"x" * 100)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+
+
+def test_other_files_are_left_alone(tmp_path):
+    (tmp_path / "notes.txt").write_bytes(b"x" * 1000)
+    cache = DiskCache(".bin", lambda: tmp_path, lambda: 150)
+
+    cache.put("a", b"x" * 100)
+    cache.put("b", b"x" * 100)
+
+    assert (tmp_path / "notes.txt").exists()
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
@@ -0,0 +1,69 @@
+# Near-duplicate detection tests
+import random
+
+from app.models.minhash import MinHashBand
+from app.models.pdf import PDF
+from services import duplicates, text_store
+from tests.test_search import upload_sample
+
+WORDS = ("fractions numerator denominator equivalent simplify compare order number line "
+         "students model halves thirds fourths sixths eighths whole parts equal shade ").split()
+_random = random.Random(20)
+LESSON = [" ".join(_random.choice(WORDS) for _ in range(400)) for page in range(3)]
+EDITED = ["Lesson 20 exported 2025-04-01 " + LESSON[0]] + LESSON[1:]
+OTHER = ["Photosynthesis turns sunlight water and carbon dioxide into sugar. " * 20]
+
+
+def add_pdf(db, filename, checksum, pages):
+    text_store.save_pages(db, checksum, pages)
+    pdf = PDF(filename=filename, path=f"uploads/{filename}", checksum=checksum)
+    db.add(pdf)
+    db.commit()
+    return pdf
+
+
+def test_signature_estimates_similarity():
+    same = duplicates.similarity(duplicates.signature(LESSON), duplicates.signature(EDITED))
+    different = duplicates.similarity(duplicates.signature(LESSON), duplicates.signature(OTHER))
+
+    assert same > 0.9
+    assert different < 0.1
+    assert duplicates.signature([" "]) is None
+
+
+def test_pdf_duplicates_finds_edited_copies(client, db):
+    lesson = add_pdf(db, "Lesson 20.pdf", "a" * 64, LESSON)
+    edited = add_pdf(db, "Lesson 20 (1).pdf", "b" * 64, EDITED)
+    add_pdf(db, "Photosynthesis.pdf", "c" * 64, OTHER)
+    copy = PDF(filename="Lesson 20 copy.pdf", path="uploads/Lesson 20.pdf", checksum="a" * 64)
+    db.add(copy)
+    db.commit()
+
+    found = client.get(f"/api/pdfs/{lesson.id}/duplicates").json()["duplicates"]
+
+    assert [match["id"] for match in found] == [copy.id, edited.id]
+    assert found[0]["exact"] and found[0]["similarity"] == 1.0
+    assert not found[1]["exact"] and found[1]["similarity"] >= 0.8
+
+
+def test_duplicate_report_groups_library(client, db):
+    lesson = add_pdf(db, "Lesson 20.pdf", "a" * 64, LESSON)
+    edited = add_pdf(db, "Lesson 20 (1).pdf", "b" * 64, EDITED)
+    add_pdf(db, "Photosynthesis.pdf", "c" * 64, OTHER)
+
+    report = client.get("/api/pdfs/duplicates").json()
+
+    assert report["group_count"] == 1
+    assert {pdf["id"] for pdf in report["groups"][0]["pdfs"]} == {lesson.id, edited.id}
+
+
+def test_uploads_are_signed_and_deletes_forget_them(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    checksum = db.query(PDF).get(lesson["id"]).checksum
+
+    assert db.query(MinHashBand).count() == duplicates.BANDS
+    assert text_store.get_document(db, checksum).minhash
+
+    client.delete(f"/api/pdfs/{lesson['id']}")
+
+    assert db.query(MinHashBand).count() == 0
@@ -0,0 +1,72 @@
+# ZIP export tests
+import io
+import zipfile
+
+from app.models.folder import Folder
+from app.models.pdf import PDF
+from services.zip_stream import stream_zip, unique_names
+from tests.test_search import SAMPLES_DIR, upload_sample
+
+
+def test_archive_is_streamed_in_bounded_pieces(tmp_path):
+    big = tmp_path / "big.pdf"
+    big.write_bytes(bytes(range(256)) * 400)
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"")
+
+    pieces = list(stream_zip(
+        [("big.pdf", str(big)), ("missing.pdf", str(tmp_path / "gone.pdf")), ("empty.pdf", str(empty))],
+        chunk_size=10000,
+    ))
+
+    assert len(pieces) > 10
+    assert max(len(piece) for piece in pieces) < 10000 + 200
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(pieces)))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["big.pdf", "empty.pdf"]
+    assert archive.read("big.pdf") == big.read_bytes()
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+
+
+def test_member_names_are_unique():
+    assert unique_names(["a.pdf", "A.pdf", "a.pdf", "x/y.pdf", " "]) == [
+        "a.pdf", "A (2).pdf", "a (3).pdf", "x_y.pdf", "document.pdf",
+    ]
+
+
+def test_export_selection_and_folder(client, db):
+    first = upload_sample(client, "Lesson 20.pdf")
+    second = upload_sample(client, "Lesson 20.pdf")
+    folder = Folder(name="Fractions")
+    db.add(folder)
+    db.commit()
+    client.post("/api/pdfs/move", json={"pdf_ids": [second["id"]], "folder_id": folder.id})
+
+    response = client.post("/api/pdfs/export", json={"pdf_ids": [second["id"], first["id"], 999999]})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["Lesson 20.pdf", "Lesson 20 (2).pdf"]
+    sample = next(SAMPLES_DIR.glob("*_Lesson 20.pdf")).read_bytes()
+    assert archive.read("Lesson 20 (2).pdf") == sample
+
+    response = client.get(f"/api/folders/{folder.id}/export")
+    assert response.headers["content-disposition"].endswith("Fractions.zip")
+    assert zipfile.ZipFile(io.BytesIO(response.content)).namelist() == ["Lesson 20.pdf"]
+
+    assert client.post("/api/pdfs/export", json={"pdf_ids": [999999]}).status_code == 404
+    assert client.get("/api/folders/999999/export").status_code == 404
+
+
+def test_export_reports_missing_files(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    gone = PDF(filename="Gone.pdf", path="uploads/gone.pdf")
+    db.add(gone)
+    db.commit()
+
+    response = client.post("/api/pdfs/export", json={"pdf_ids": [gone.id, lesson["id"]]})
+    assert response.status_code == 200
+    assert response.headers["x-skipped-pdfs"] == str(gone.id)
+    assert zipfile.ZipFile(io.BytesIO(response.content)).namelist() == ["Lesson 20.pdf"]
+
+    assert client.post("/api/pdfs/export", json={"pdf_ids": [gone.id]}).status_code == 404
@@ -0,0 +1,49 @@
+# File delivery caching tests
+from email.utils import formatdate
+
+from app.api.conditional import IMMUTABLE_CACHE_CONTROL
+from app.models.pdf import PDF
+from tests.test_search import upload_sample
+
+
+def test_repeat_views_are_not_modified(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    checksum = db.query(PDF.checksum).filter(PDF.id == lesson["id"]).scalar()
+    url = f"/api/pdfs/{lesson['id']}/view"
+
+    first = client.get(url)
+    assert first.headers["etag"] == f'"{checksum}"'
+    assert first.headers["cache-control"] == "no-cache"
+    assert "last-modified" in first.headers
+
+    repeat = client.get(url, headers={"If-None-Match": first.headers["etag"]})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == first.headers["etag"]
+    assert "content-length" not in repeat.headers
+
+    later = formatdate(usegmt=True)
+    assert client.get(url, headers={"If-Modified-Since": later}).status_code == 304
+    # If-None-Match wins over If-Modified-Since
+    stale = client.get(url, headers={"If-None-Match": '"other"', "If-Modified-Since": later})
+    assert stale.status_code == 200
+
+    download = client.get(f"/api/pdfs/{lesson['id']}/download", headers={"If-None-Match": first.headers["etag"]})
+    assert download.status_code == 304
+
+
+def test_content_addressed_urls_are_immutable(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    checksum = db.query(PDF.checksum).filter(PDF.id == lesson["id"]).scalar()
+
+    versioned = client.get(f"/api/pdfs/{lesson['id']}/view", params={"v": checksum[:16]})
+    assert versioned.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    outdated = client.get(f"/api/pdfs/{lesson['id']}/view", params={"v": "0" * 16})
+    assert outdated.headers["cache-control"] == "no-cache"
+
+    blob = client.get(f"/{lesson['path']}")
+    assert blob.status_code == 200
+    assert blob.headers["etag"] == f'"{checksum}"'
+    assert blob.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert client.get(f"/{lesson['path']}", headers={"If-None-Match": f'"{checksum}"'}).status_code == 304
+    assert client.get(f"/{lesson['path']}", headers={"Range": "bytes=0-9"}).content == blob.content[:10]
@@ -0,0 +1,89 @@
+# File location tests
+import os
+import shutil
+
+from sqlalchemy import event
+
+from app.api.catalog_version import bump_catalog_version
+from app.api.file_locations import FileLocationCache, canonicalize_paths
+from app.core.config import settings
+from app.core.database import engine
+from app.models.catalog import CatalogVersion
+from app.models.pdf import PDF
+from services.storage import canonical_path
+from tests.test_search import SAMPLES_DIR
+
+
+def test_canonical_path_forms():
+    upload_dir = str(settings.UPLOAD_DIR)
+
+    assert canonical_path("uploads/a.pdf") == "uploads/a.pdf"
+    assert canonical_path(os.path.join(upload_dir, "blobs", "ab", "x.pdf")) == "uploads/blobs/ab/x.pdf"
+    assert canonical_path("uploads\\old\\a.pdf") == "uploads/old/a.pdf"
+    assert canonical_path("./a.pdf") == "uploads/a.pdf"
+    assert canonical_path("/srv/elsewhere/a.pdf") == "/srv/elsewhere/a.pdf"
+
+
+def test_migration_rewrites_legacy_paths(db):
+    os.makedirs(os.path.join(settings.UPLOAD_DIR, "pdfs"), exist_ok=True)
+    sample = next(SAMPLES_DIR.glob("*_Lesson 20.pdf"))
+    shutil.copy(sample, os.path.join(settings.UPLOAD_DIR, "pdfs", "moved.pdf"))
+    shutil.copy(sample, os.path.join(settings.UPLOAD_DIR, "absolute.pdf"))
+    moved = PDF(filename="moved.pdf", path="C:\\old\\uploads\\moved.pdf")
+    absolute = PDF(filename="absolute.pdf", path=os.path.join(str(settings.UPLOAD_DIR), "absolute.pdf"))
+    db.add_all([moved, absolute])
+    db.commit()
+
+    assert canonicalize_paths(db) == 2
+    db.commit()
+
+    assert moved.path == "uploads/pdfs/moved.pdf"
+    assert absolute.path == "uploads/absolute.pdf"
+    assert canonicalize_paths(db) == 0
+
+
+def test_cached_location_follows_committed_bumps(db):
+    cache = FileLocationCache(size=1, shared_interval=3600)
+    pdf = PDF(filename="a.pdf", path="uploads/a.pdf")
+    db.add(pdf)
+    db.commit()
+
+    assert cache.locate(db, pdf.id).path == os.path.join(settings.UPLOAD_DIR, "a.pdf")
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert cache.locate(db, pdf.id).filename == "a.pdf"
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+    pdf.path = "uploads/blobs/aa/a.pdf"
+    bump_catalog_version(db)
+    db.commit()
+
+    assert cache.locate(db, pdf.id).path == os.path.join(settings.UPLOAD_DIR, "blobs/aa/a.pdf")
+    assert cache.locate(db, pdf.id + 1000) is None
+
+
+def test_cached_location_sees_other_processes_bumps(db):
+    cache = FileLocationCache(shared_interval=0)
+    pdf = PDF(filename="a.pdf", path="uploads/a.pdf")
+    db.add(pdf)
+    db.commit()
+    assert cache.locate(db, pdf.id).filename == "a.pdf"
+
+    # As another worker would: the shared version moves, this process's count does not
+    pdf.filename = "b.pdf"
+    db.query(CatalogVersion).update({CatalogVersion.version: CatalogVersion.version + 1})
+    db.commit()
+
+    assert cache.locate(db, pdf.id).filename == "b.pdf"
+
+
+def test_view_of_missing_file_is_404(client, db):
+    pdf = PDF(filename="gone.pdf", path="uploads/gone.pdf")
+    db.add(pdf)
+    db.commit()
+
+    assert client.get(f"/api/pdfs/{pdf.id}/view").status_code == 404
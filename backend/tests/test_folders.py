@@ -0,0 +1,59 @@
+# Folder tests
+from sqlalchemy import event
+
+from app.core.database import engine
+from app.models.folder import Folder
+from app.models.pdf import PDF
+
+
+def make_catalog(db):
+    fractions, geometry = Folder(name="Fractions"), Folder(name="Geometry")
+    db.add_all([fractions, geometry])
+    db.commit()
+    db.add_all([
+        PDF(filename="Lesson 20.pdf", path="uploads/Lesson 20.pdf", folder_id=fractions.id),
+        PDF(filename="Lesson 21.pdf", path="uploads/Lesson 21.pdf", folder_id=fractions.id),
+        PDF(filename="Lesson 29.pdf", path="uploads/Lesson 29.pdf", folder_id=geometry.id),
+        PDF(filename="Chart.pdf", path="uploads/Chart.pdf"),
+    ])
+    db.commit()
+    return fractions, geometry
+
+
+def folder_counts_response(client):
+    data = client.get("/api/folders/").json()
+    return {folder["name"]: folder["pdf_count"] for folder in data["folders"]}, data["unfiled_count"]
+
+
+def test_folder_counts_use_one_query(client, db):
+    make_catalog(db)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        counts, unfiled = folder_counts_response(client)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert counts == {"Fractions": 2, "Geometry": 1}
+    assert unfiled == 1
+    # Catalog version, the folders, and one GROUP BY for every count
+    assert len(statements) == 3
+
+
+def test_folder_counts_follow_moves_and_deletes(client, db):
+    fractions, geometry = make_catalog(db)
+    folder_counts_response(client)  # warm the cache
+
+    moved = db.query(PDF).filter(PDF.folder_id == fractions.id).first()
+    client.post("/api/pdfs/move", json={"pdf_ids": [moved.id], "folder_id": geometry.id})
+    assert folder_counts_response(client) == ({"Fractions": 1, "Geometry": 2}, 1)
+
+    client.delete(f"/api/pdfs/{moved.id}")
+    assert folder_counts_response(client) == ({"Fractions": 1, "Geometry": 1}, 1)
+
+    client.delete(f"/api/folders/{geometry.id}")
+    assert folder_counts_response(client) == ({"Fractions": 1}, 2)
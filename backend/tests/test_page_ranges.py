@@ -0,0 +1,56 @@
+# Page range tests
+import io
+
+import PyPDF2
+import pytest
+
+from services import page_ranges
+from services.page_ranges import PageRangeError, format_page_range, parse_page_range
+from tests.test_search import upload_sample
+
+
+def test_ranges_are_normalised():
+    assert parse_page_range("3-5") == [(3, 5)]
+    assert format_page_range(parse_page_range(" 7, 1-3,2 ,4")) == "1-4,7"
+    assert format_page_range(parse_page_range("9-,2,10-12")) == "2,9-"
+    for spec in ["", "0", "5-3", "a-b", "1-2-3", ",".join(["1"] * 33)]:
+        with pytest.raises(PageRangeError):
+            parse_page_range(spec)
+
+
+def test_sub_document_is_built_once(client, db, monkeypatch):
+    pdf = upload_sample(client, "Lesson 20.pdf")
+    built = []
+    write_pages = page_ranges.write_pages
+
+    async def run(func, *args, **kwargs):
+        built.append(args)
+        return write_pages(*args)
+
+    monkeypatch.setattr(page_ranges.extraction, "run", run)
+
+    response = client.get(f"/api/pdfs/{pdf['id']}/pages", params={"range": "3-5"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-disposition"].endswith("Lesson%2020_pages_3-5.pdf")
+    assert len(PyPDF2.PdfReader(io.BytesIO(response.content)).pages) == 3
+
+    again = client.get(f"/api/pdfs/{pdf['id']}/pages", params={"range": "5,3-4"})
+    assert again.content == response.content
+    assert len(built) == 1
+
+    cached = client.get(f"/api/pdfs/{pdf['id']}/pages", params={"range": "3-5"},
+                        headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+    # Open-ended ranges stop at the last page
+    tail = client.get(f"/api/pdfs/{pdf['id']}/pages", params={"range": "21-"})
+    assert len(PyPDF2.PdfReader(io.BytesIO(tail.content)).pages) == 2
+
+
+def test_invalid_ranges_are_rejected(client, db):
+    pdf = upload_sample(client, "Lesson 20.pdf")
+
+    assert client.get(f"/api/pdfs/{pdf['id']}/pages", params={"range": "4-2"}).status_code == 400
+    assert client.get(f"/api/pdfs/{pdf['id']}/pages", params={"range": "40-50"}).status_code == 400
+    assert client.get("/api/pdfs/999999/pages", params={"range": "1"}).status_code == 404
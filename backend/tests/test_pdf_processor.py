@@ -0,0 +1,99 @@
+# Extraction service tests
+import asyncio
+import signal
+import time
+
+import PyPDF2
+import pytest
+
+from services import pdf_processor
+from services.pdf_processor import ExtractionService, ExtractionTimeout, extract_pages, extract_within
+from tests.test_search import SAMPLES_DIR
+
+
+def sleep_for(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def sleep_without_timer(seconds):
+    """Runs in the worker: as on a platform without SIGALRM"""
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    time.sleep(seconds)
+    return seconds
+
+
+def extract_slowly(path):
+    """Runs in the worker: every page takes a while to parse"""
+    extract_text = PyPDF2.PageObject.extract_text
+
+    def slow_extract_text(page, *args, **kwargs):
+        time.sleep(1)
+        return extract_text(page, *args, **kwargs)
+
+    PyPDF2.PageObject.extract_text = slow_extract_text
+    return extract_pages(path)
+
+
+@pytest.fixture
+def service():
+    service = ExtractionService(workers=1, timeout=30, max_pending=2)
+    yield service
+    service.shutdown()
+
+
+def test_extracts_pages_in_worker_process(service):
+    path = next(SAMPLES_DIR.glob("*_Lesson 20.pdf"))
+
+    pages = asyncio.run(service.extract_pages(str(path)))
+
+    assert any("kareem" in page.lower() for page in pages)
+
+
+def test_job_over_time_limit_frees_its_worker(service):
+    async def run():
+        with pytest.raises(ExtractionTimeout):
+            await service.run(sleep_for, 30, timeout=0.5)
+        # The same single worker is available again straight away
+        return await service.run(sleep_for, 0)
+
+    started = time.perf_counter()
+    assert asyncio.run(run()) == 0
+    assert time.perf_counter() - started < 20
+
+
+def test_time_limit_stops_a_document_mid_page(service):
+    path = str(next(SAMPLES_DIR.glob("*_Lesson 20.pdf")))
+
+    started = time.perf_counter()
+    with pytest.raises(ExtractionTimeout):
+        # 22 pages at 1 s each would take over 20 s
+        asyncio.run(service.run(extract_slowly, path, timeout=1))
+    assert time.perf_counter() - started < 15
+
+
+def test_job_outliving_its_limit_recycles_the_pool(service, monkeypatch):
+    monkeypatch.setattr(pdf_processor, "TIMEOUT_GRACE_SECONDS", 0.5)
+
+    async def run():
+        with pytest.raises(ExtractionTimeout):
+            await service.run(sleep_without_timer, 60, timeout=0.5)
+        # The stuck worker was terminated: the single slot serves the next job
+        return await service.run(sleep_for, 0)
+
+    started = time.perf_counter()
+    assert asyncio.run(run()) == 0
+    assert time.perf_counter() - started < 30
+
+
+def test_extraction_stops_at_budgets():
+    path = str(next(SAMPLES_DIR.glob("*_Lesson 20.pdf")))
+
+    by_pages = extract_within(path, max_pages=3, max_chars=0, time_budget=0)
+    by_chars = extract_within(path, max_pages=0, max_chars=1000, time_budget=0)
+    whole = extract_within(path, max_pages=0, max_chars=0, time_budget=0)
+
+    assert (len(by_pages.pages), by_pages.page_count, by_pages.stopped) == (3, 22, "pages")
+    assert sum(len(page) for page in by_chars.pages) == 1000
+    assert by_chars.stopped == "characters"
+    assert whole.complete and len(whole.pages) == whole.page_count
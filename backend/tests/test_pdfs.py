@@ -1 +1,182 @@
-# PDF tests 
+# PDF tests
+import hashlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.core.database import engine
+from app.models.folder import Folder
+from app.models.pdf import PDF
+
+
+def add_pdfs(db, count, created_at=None):
+    created_at = created_at or datetime(2025, 3, 1)
+    pdfs = [
+        PDF(filename=f"Lesson {i}.pdf", path=f"uploads/Lesson {i}.pdf", created_at=created_at)
+        for i in range(count)
+    ]
+    db.add_all(pdfs)
+    db.commit()
+    return pdfs
+
+
+def test_list_pdfs_returns_bare_list_without_pagination(client, db):
+    add_pdfs(db, 3)
+
+    response = client.get("/api/pdfs/")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+
+
+def test_keyset_pagination_walks_every_row_once(client, db):
+    # Several rows share a created_at so the id tie-breaker is exercised
+    add_pdfs(db, 4)
+    add_pdfs(db, 3, created_at=datetime(2025, 3, 1) + timedelta(days=1))
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/pdfs/", params=params).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    expected = [pdf.id for pdf in db.query(PDF).order_by(PDF.created_at.desc(), PDF.id.desc())]
+    assert seen == expected
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/pdfs/", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+
+def test_stream_listing_yields_ndjson_rows(client, db):
+    add_pdfs(db, 5)
+
+    response = client.get("/api/pdfs/", params={"stream": "true"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert len(response.text.strip().splitlines()) == 5
+
+
+def count_queries(client, url, **kwargs):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_listing_query_count_does_not_grow_with_rows(client, db):
+    folders = [Folder(name=f"Unit {i}") for i in range(3)]
+    db.add_all(folders)
+    db.commit()
+
+    def add_filed(count):
+        db.add_all(
+            PDF(filename=f"Worksheet {i}.pdf", path=f"uploads/Worksheet {i}.pdf",
+                folder_id=folders[i % len(folders)].id, tags="math, fractions")
+            for i in range(count)
+        )
+        db.commit()
+
+    add_filed(2)
+    small = count_queries(client, "/api/pdfs/")
+    add_filed(30)
+    large = count_queries(client, "/api/pdfs/")
+
+    assert large == small
+    paged = count_queries(client, "/api/pdfs/", params={"limit": 20})
+    assert paged == small
+
+
+def test_listing_includes_folder_names_and_tags(client, db):
+    folder = Folder(name="Fractions")
+    db.add(folder)
+    db.commit()
+    db.add(PDF(filename="Lesson 20.pdf", path="uploads/Lesson 20.pdf",
+               folder_id=folder.id, tags="math, fractions ,"))
+    db.commit()
+
+    [item] = client.get("/api/pdfs/").json()
+
+    assert item["folder_name"] == "Fractions"
+    assert item["tags"] == ["math", "fractions"]
+
+
+def test_upload_records_file_metadata(client, db):
+    content = b"%PDF-1.4\n% test document\n"
+
+    response = client.post(
+        "/api/pdfs/upload",
+        files={"file": ("Lesson 27.pdf", content, "application/pdf")},
+        data={"tags": "math"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["size"] == len(content)
+    pdf = db.query(PDF).get(response.json()["id"])
+    assert pdf.size == len(content)
+    assert pdf.checksum == hashlib.sha256(content).hexdigest()
+    assert pdf.file_mtime is not None
+
+
+def tag_pdf(client, pdf, tags):
+    response = client.put(f"/api/pdfs/{pdf.id}/tags", json={"tags": tags})
+    assert response.status_code == 200
+
+
+def listed_ids(client, **params):
+    return sorted(item["id"] for item in client.get("/api/pdfs/", params=params).json())
+
+
+def test_tag_filter_matches_whole_tags_only(client, db):
+    math, mathematics = add_pdfs(db, 2)
+    tag_pdf(client, math, ["math"])
+    tag_pdf(client, mathematics, ["mathematics"])
+
+    assert listed_ids(client, tag="math") == [math.id]
+    assert listed_ids(client, tag="MATH") == [math.id]
+
+
+def test_multi_tag_filter_all_and_any(client, db):
+    both, fractions, geometry = add_pdfs(db, 3)
+    tag_pdf(client, both, ["math", "fractions"])
+    tag_pdf(client, fractions, ["fractions"])
+    tag_pdf(client, geometry, ["geometry"])
+
+    assert listed_ids(client, tag=["math", "fractions"]) == [both.id]
+    assert listed_ids(client, tag="math,fractions", tag_match="any") == sorted([both.id, fractions.id])
+    assert listed_ids(client, tag=["fractions", "geometry"], tag_match="any") == sorted(
+        [both.id, fractions.id, geometry.id]
+    )
+
+
+def test_tag_writes_keep_string_and_links_in_sync(client, db):
+    [pdf] = add_pdfs(db, 1)
+    tag_pdf(client, pdf, ["math", "fractions", "math"])
+
+    db.refresh(pdf)
+    assert pdf.tags == "math,fractions"
+    assert sorted(tag.name for tag in pdf.tag_objects) == ["fractions", "math"]
+
+    tag_id = next(tag.id for tag in pdf.tag_objects if tag.name == "math")
+    client.delete(f"/api/tags/{tag_id}")
+
+    db.expire_all()
+    assert pdf.tags == "fractions"
+    assert [tag.name for tag in pdf.tag_objects] == ["fractions"]
+    assert listed_ids(client, tag="math") == []
@@ -0,0 +1,69 @@
+# Range request tests
+import pytest
+
+from app.api.file_responses import RangeNotSatisfiable, parse_range
+from tests.test_search import SAMPLES_DIR, upload_sample
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range("bytes=990-2000", 1000) == [(990, 999)]
+    # Overlapping and adjacent ranges are merged
+    assert parse_range("bytes=50-99, 0-49, 200-299, 250-260", 1000) == [(0, 99), (200, 299)]
+    assert parse_range("items=0-1", 1000) is None
+    assert parse_range("bytes=5-1", 1000) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+
+
+def sample_bytes(name):
+    return next(SAMPLES_DIR.glob(f"*_{name}")).read_bytes()
+
+
+def test_view_serves_single_range(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    data = sample_bytes("Lesson 20.pdf")
+
+    whole = client.get(f"/api/pdfs/{lesson['id']}/view")
+    partial = client.get(f"/api/pdfs/{lesson['id']}/view", headers={"Range": "bytes=100-199"})
+
+    assert whole.status_code == 200 and whole.headers["accept-ranges"] == "bytes"
+    assert whole.content == data
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 100-199/{len(data)}"
+    assert partial.content == data[100:200]
+
+
+def test_view_serves_multiple_ranges(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    data = sample_bytes("Lesson 20.pdf")
+
+    response = client.get(f"/api/pdfs/{lesson['id']}/view", headers={"Range": "bytes=0-9, -10"})
+
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+    boundary = content_type.split("boundary=")[1].encode()
+    parts = response.content.split(b"--" + boundary)
+    assert data[:10] in parts[1] and f"bytes 0-9/{len(data)}".encode() in parts[1]
+    assert parts[2].endswith(data[-10:] + b"\r\n")
+    assert parts[3] == b"--\r\n"
+
+
+def test_unsatisfiable_range_and_stale_if_range(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    size = len(sample_bytes("Lesson 20.pdf"))
+    url = f"/api/pdfs/{lesson['id']}/view"
+
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={size}-"})
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"not-the-etag"'})
+    etag = client.get(url).headers["etag"]
+    current = client.get(url, headers={"Range": "bytes=0-9", "If-Range": f'"{etag.strip(chr(34))}"'})
+
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{size}"
+    assert stale.status_code == 200 and len(stale.content) == size
+    assert current.status_code == 206 and len(current.content) == 10
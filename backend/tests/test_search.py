@@ -0,0 +1,81 @@
+# Search tests
+from pathlib import Path
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / "uploads"
+
+
+def upload_sample(client, sample, filename=None, tags=""):
+    path = next(SAMPLES_DIR.glob(f"*_{sample}"))
+    with open(path, "rb") as f:
+        response = client.post(
+            "/api/pdfs/upload",
+            files={"file": (filename or sample, f, "application/pdf")},
+            data={"tags": tags},
+        )
+    assert response.status_code == 200
+    return response.json()
+
+
+def search(client, term, **params):
+    response = client.get("/api/pdfs/", params={"search": term, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_search_finds_words_inside_documents(client):
+    lesson = upload_sample(client, "Lesson 20.pdf", filename="Week 3.pdf")
+    upload_sample(client, "Lesson 29.pdf", filename="Week 4.pdf")
+
+    results = search(client, "kareem")
+
+    assert [item["id"] for item in results] == [lesson["id"]]
+
+
+def test_filename_hits_rank_above_body_hits(client):
+    body_hit = upload_sample(client, "Lesson 20.pdf", filename="Week 3.pdf")
+    title_hit = upload_sample(client, "Blank Multiplication Chart.pdf", filename="Fractions review.pdf")
+
+    results = search(client, "fractions")
+
+    assert [item["id"] for item in results] == [title_hit["id"], body_hit["id"]]
+
+
+def test_index_follows_rename_retag_and_delete(client):
+    pdf = upload_sample(client, "Blank Multiplication Chart.pdf")
+
+    client.put(f"/api/pdfs/{pdf['id']}/rename", json={"filename": "Times tables"})
+    assert [item["id"] for item in search(client, "times")] == [pdf["id"]]
+    assert search(client, "blank") == []
+
+    client.put(f"/api/pdfs/{pdf['id']}/tags", json={"tags": ["arithmetic"]})
+    assert [item["id"] for item in search(client, "arithmetic")] == [pdf["id"]]
+
+    client.delete(f"/api/pdfs/{pdf['id']}")
+    assert search(client, "times") == []
+
+
+def test_search_results_paginate_in_rank_order(client):
+    for sample in ("Lesson 20.pdf", "Lesson 27.pdf", "Lesson 29.pdf", "Lesson 30.pdf"):
+        upload_sample(client, sample)
+    ranked = [item["id"] for item in search(client, "child")]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        page = search(client, "child", **params)
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == ranked
+    assert len(seen) == 4
+
+
+def test_search_input_is_not_parsed_as_query_syntax(client):
+    upload_sample(client, "Blank Multiplication Chart.pdf")
+
+    assert len(search(client, '"chart* (')) == 1
@@ -0,0 +1,128 @@
+# Upload storage tests
+import hashlib
+import os
+import uuid
+
+from sqlalchemy import event
+
+from app.api import ingest
+from app.core.database import SessionLocal, engine
+from app.models.blob import Blob
+from app.models.pdf import PDF
+from services.blob_store import release_blobs, remove_orphaned_files
+from services.storage import upload_path
+
+
+def unique_pdf_bytes():
+    return b"%PDF-1.4\n% " + uuid.uuid4().hex.encode() + b"\n"
+
+
+def upload(client, content, filename="Blank Multiplication Chart.pdf"):
+    response = client.post(
+        "/api/pdfs/upload",
+        files={"file": (filename, content, "application/pdf")},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_duplicate_uploads_share_one_stored_file(client, db):
+    content = unique_pdf_bytes()
+
+    first = upload(client, content)
+    second = upload(client, content, filename="Chart copy.pdf")
+
+    assert first["id"] != second["id"]
+    assert first["path"] == second["path"]
+    blob = db.query(Blob).one()
+    assert blob.checksum == hashlib.sha256(content).hexdigest()
+    assert blob.ref_count == 2
+    with open(upload_path(blob.path), "rb") as f:
+        assert f.read() == content
+
+
+def test_stored_file_is_removed_with_its_last_pdf(client, db):
+    content = unique_pdf_bytes()
+    first = upload(client, content)
+    second = upload(client, content)
+    file_path = upload_path(first["path"])
+
+    assert client.delete(f"/api/pdfs/{first['id']}").json()["file_deleted"] is False
+    assert os.path.exists(file_path)
+    assert db.query(Blob).one().ref_count == 1
+
+    assert client.post("/api/pdfs/delete", json={"pdf_ids": [second["id"]]}).json()["files_deleted"] == 1
+    assert not os.path.exists(file_path)
+    assert db.query(Blob).count() == 0
+
+
+def test_upload_survives_delete_of_its_content_before_commit(client, db, monkeypatch):
+    content = unique_pdf_bytes()
+    first = upload(client, content)
+    place_staged = ingest.place_staged
+
+    def place_then_delete_first(staged):
+        # The new upload finds the file stored; then the last PDF holding it
+        # is deleted before the upload's Blob reference is committed
+        placed = place_staged(staged)
+        other = SessionLocal()
+        try:
+            pdf = other.query(PDF).get(first["id"])
+            blob_id = pdf.blob_id
+            other.delete(pdf)
+            orphaned = release_blobs(other, [blob_id])
+            other.commit()
+            assert remove_orphaned_files(other, orphaned)
+        finally:
+            other.close()
+        return placed
+
+    monkeypatch.setattr(ingest, "place_staged", place_then_delete_first)
+    second = upload(client, content, filename="Chart copy.pdf")
+
+    assert second["path"] == first["path"]
+    assert db.query(Blob).one().ref_count == 1
+    with open(upload_path(second["path"]), "rb") as f:
+        assert f.read() == content
+    assert not [name for name in os.listdir(upload_path("uploads/.staging")) if name.endswith(".part")]
+
+
+def test_batch_upload_reports_each_file(client, db):
+    shared = unique_pdf_bytes()
+
+    response = client.post(
+        "/api/pdfs/upload/batch",
+        files=[
+            ("files", ("Week 1.pdf", shared, "application/pdf")),
+            ("files", ("notes.txt", b"not a pdf", "text/plain")),
+            ("files", ("Week 1 copy.pdf", shared, "application/pdf")),
+            ("files", ("Week 2.pdf", unique_pdf_bytes(), "application/pdf")),
+        ],
+        data={"tags": "math, week"},
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["status"] for result in body["results"]] == ["created", "error", "created", "created"]
+    assert body["created_count"] == 3 and body["failed_count"] == 1
+    assert body["results"][0]["pdf"]["tags"] == ["math", "week"]
+    assert db.query(PDF).count() == 3
+    assert sorted(blob.ref_count for blob in db.query(Blob)) == [1, 2]
+
+
+def test_batch_upload_commits_once(client, db):
+    commits = []
+    listener = lambda conn: commits.append(conn)
+    event.listen(engine, "commit", listener)
+    try:
+        response = client.post(
+            "/api/pdfs/upload/batch",
+            files=[("files", (f"Lesson {i}.pdf", unique_pdf_bytes(), "application/pdf")) for i in range(5)],
+            data={"tags": "math"},
+        )
+    finally:
+        event.remove(engine, "commit", listener)
+
+    assert response.json()["created_count"] == 5
+    # One commit for the rows and one for their search text
+    assert len(commits) == 2
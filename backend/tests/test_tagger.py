@@ -0,0 +1,106 @@
+# Tagger tests
+from app.models.term_frequency import TermDocumentFrequency
+from services import tagger, text_store
+from tests.test_search import upload_sample
+
+LESSONS = {
+    "a" * 64: ["Lesson students name. Fractions fractions numerator denominator fractions."],
+    "b" * 64: ["Lesson students name. Photosynthesis chlorophyll photosynthesis sunlight."],
+    "c" * 64: ["Lesson students name. Civil war Lincoln civil war battles."],
+}
+
+
+def store_lessons(db):
+    for checksum, pages in LESSONS.items():
+        text_store.save_pages(db, checksum, pages)
+    db.commit()
+
+
+def df(db, term):
+    row = db.query(TermDocumentFrequency).get(term)
+    return row.df if row else 0
+
+
+def test_document_frequencies_follow_stored_text(db):
+    store_lessons(db)
+
+    assert df(db, "students") == 3
+    assert df(db, "fractions") == 1
+    assert df(db, "civil war") == 1
+
+    text_store.drop_unreferenced(db, ["a" * 64])
+    db.commit()
+
+    assert df(db, "students") == 2
+    assert df(db, "fractions") == 0
+
+
+def test_corpus_size_is_kept_with_the_frequencies(db):
+    store_lessons(db)
+    # Re-storing a file's text replaces it rather than adding another
+    text_store.save_pages(db, "c" * 64, LESSONS["c" * 64])
+    db.commit()
+
+    assert tagger.corpus_size(db) == tagger.count_corpus_size(db) == 3
+    assert tagger.CORPUS_SIZE_TERM not in tagger.load_frequencies(db)
+
+    text_store.drop_unreferenced(db, ["a" * 64, "b" * 64])
+    db.commit()
+    assert tagger.corpus_size(db) == 1
+
+    assert tagger.rebuild_document_frequencies(db) == 1
+    assert tagger.corpus_size(db) == 1
+
+
+def test_words_shared_by_every_file_are_not_tags(db):
+    store_lessons(db)
+
+    tags = tagger.suggest_tags(db, LESSONS["c" * 64])
+
+    assert tags[0] == "civil war"
+    assert not {"lesson", "students", "name"} & set(tags)
+    # "civil" and "war" are covered by the phrase
+    assert "civil" not in tags and "war" not in tags
+
+
+def test_retag_library_uses_stored_text_only(db):
+    store_lessons(db)
+
+    suggestions = tagger.retag_library(db, max_tags=2)
+
+    assert suggestions["a" * 64][0] == "fractions"
+    assert suggestions["b" * 64][0] == "photosynthesis"
+
+
+def test_frequencies_are_counted_at_upload(client, db):
+    upload_sample(client, "Lesson 20.pdf")
+
+    assert db.query(TermDocumentFrequency).count() > 0
+    assert tagger.corpus_size(db) == 1
+
+
+def test_streaming_tagging_stops_once_tags_are_stable():
+    consumed = []
+
+    page = "Fractions numerator denominator. Equivalent fractions and common denominator."
+
+    def pages():
+        for number in range(100):
+            consumed.append(number)
+            yield page
+
+    run = tagger.suggest_tags_streaming(None, pages(), 3, frequencies={}, documents=0)
+
+    assert run.stopped == "stable"
+    assert run.tags == tagger.suggest_tags(None, [page] * 100, 3, frequencies={}, documents=0)
+    # Nothing past the page it stopped on was read
+    assert run.pages == len(consumed) <= 5 * tagger.STABILITY_CHECK_PAGES
+
+
+def test_streaming_tagging_respects_page_budget():
+    pages = ["Photosynthesis chlorophyll sunlight.", "Civil war battles.", "Fractions."]
+
+    run = tagger.suggest_tags_streaming(None, iter(pages), 5, frequencies={}, documents=0, max_pages=2)
+
+    assert (run.pages, run.stopped) == (2, "pages")
+    assert "fractions" not in run.tags
@@ -0,0 +1,150 @@
+# Extracted text store tests
+import json
+import os
+import shutil
+
+import pytest
+
+from app.core.config import settings
+from app.models.extracted_text import ExtractedPage
+from app.models.pdf import PDF
+from services import text_store
+from services.storage import sha256_file
+from tests.test_search import SAMPLES_DIR, upload_sample
+
+
+@pytest.fixture
+def no_parsing(monkeypatch):
+    def fail(file_path, *budgets):
+        raise AssertionError(f"{file_path} was parsed again")
+
+    monkeypatch.setattr(text_store, "extract_within", fail)
+
+
+def test_pages_are_stored_once_per_file(client, db):
+    first = upload_sample(client, "Lesson 20.pdf")
+    upload_sample(client, "Lesson 20.pdf", filename="Lesson 20 copy.pdf")
+
+    stored = db.query(ExtractedPage).all()
+
+    assert stored
+    assert len({page.checksum for page in stored}) == 1
+    assert any("kareem" in page.text.lower() for page in stored)
+    assert client.get(f"/api/pdfs/{first['id']}/text").json()["page_count"] == len(stored)
+
+
+def test_generate_tags_reads_stored_text(client, db, no_parsing):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+
+    response = client.post("/api/tags/generate", json={"pdf_id": lesson["id"]})
+
+    assert response.status_code == 200
+    assert response.json()["tags"]
+
+
+def test_text_preview_returns_a_single_page(client, db, no_parsing):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+
+    body = client.get(f"/api/pdfs/{lesson['id']}/text", params={"page": 1}).json()
+
+    assert [page["page"] for page in body["pages"]] == [1]
+    assert client.get(f"/api/pdfs/{lesson['id']}/text", params={"page": 999}).status_code == 404
+
+
+def test_deleting_last_copy_drops_stored_text(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+
+    client.delete(f"/api/pdfs/{lesson['id']}")
+
+    assert db.query(ExtractedPage).count() == 0
+
+
+def test_batch_tag_generation_streams_and_applies(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf", tags="week 3")
+    chart = upload_sample(client, "Blank Multiplication Chart.pdf")
+
+    response = client.post("/api/tags/generate/batch", json={
+        "pdf_ids": [lesson["id"], chart["id"]],
+        "apply": True,
+    })
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["pdf_id"]: line for line in lines if "pdf_id" in line}
+    assert set(results) == {lesson["id"], chart["id"]}
+    assert results[lesson["id"]]["tags"]
+    assert lines[-1] == {"done": True, "applied": 2}
+
+    tags = client.get(f"/api/pdfs/{lesson['id']}").json()["tags"]
+    assert tags[0] == "week 3"
+    assert set(results[lesson["id"]]["tags"]) <= {tag.lower() for tag in tags}
+
+
+def test_batch_tag_generation_parses_unstored_files(client, db):
+    lesson = upload_sample(client, "Lesson 20.pdf")
+    db.query(ExtractedPage).delete()
+    db.commit()
+
+    response = client.post("/api/tags/generate/batch", json={"folder_id": -1})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["pdf_id"] == lesson["id"] and lines[0]["source"] == "text"
+    assert db.query(ExtractedPage).count() > 0
+
+
+def test_batch_tag_generation_hashes_and_parses_legacy_rows(client, db):
+    legacy = []
+    for name in ["Lesson 20.pdf", "Blank Multiplication Chart.pdf"]:
+        shutil.copy(next(SAMPLES_DIR.glob(f"*_{name}")), os.path.join(settings.UPLOAD_DIR, f"legacy {name}"))
+        legacy.append(PDF(filename=name, path=f"uploads/legacy {name}"))
+    legacy.append(PDF(filename="Gone.pdf", path="uploads/legacy gone.pdf"))
+    db.add_all(legacy)
+    db.commit()
+
+    response = client.post("/api/tags/generate/batch", json={"pdf_ids": [pdf.id for pdf in legacy]})
+
+    results = {line["pdf_id"]: line for line in map(json.loads, response.text.splitlines()) if "pdf_id" in line}
+    assert results[legacy[0].id]["source"] == "text" and results[legacy[0].id]["tags"]
+    assert "error" in results[legacy[2].id]
+    db.expire_all()
+    assert legacy[0].checksum and legacy[1].checksum and legacy[2].checksum is None
+    assert db.query(ExtractedPage).filter(ExtractedPage.checksum == legacy[0].checksum).count() > 0
+
+
+def test_text_stored_meanwhile_keeps_metadata_refresh(db, monkeypatch):
+    sample = next(SAMPLES_DIR.glob("*_Blank Multiplication Chart.pdf"))
+    shutil.copy(sample, os.path.join(settings.UPLOAD_DIR, "legacy chart.pdf"))
+    pdf = PDF(filename="chart.pdf", path="uploads/legacy chart.pdf")
+    db.add(pdf)
+    # Another request stores the same content while this one is parsing it
+    db.add(ExtractedPage(checksum=sha256_file(sample), page_number=0, text="stored first"))
+    db.commit()
+    # ...after this request looked for it
+    monkeypatch.setattr(text_store, "has_pages", lambda db, checksum: False)
+    monkeypatch.setattr(text_store, "get_pages", lambda db, checksum: None)
+
+    assert text_store.ensure_pages(db, pdf)
+
+    db.expire_all()
+    assert pdf.checksum == sha256_file(sample) and pdf.size == os.path.getsize(sample)
+    assert [page.text for page in db.query(ExtractedPage)] == ["stored first"]
+
+
+def test_batch_tag_generation_rejects_bad_numbers(client, db):
+    assert client.post("/api/tags/generate/batch", json={"folder_id": "x"}).status_code == 400
+    assert client.post("/api/tags/generate/batch", json={"folder_id": -1, "max_tags": "many"}).status_code == 400
+    assert client.post("/api/tags/generate/batch", json={"folder_id": -1, "max_tags": 0}).status_code == 400
+    assert client.post("/api/tags/generate/batch", json={"pdf_ids": "5"}).status_code == 400
+    assert client.post("/api/tags/generate/batch", json={"pdf_ids": ["a"]}).status_code == 400
+
+
+def test_extraction_budget_is_recorded_and_reported(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_MAX_PAGES", 3)
+    lesson = upload_sample(client, "Lesson 20.pdf")
+
+    coverage = client.post("/api/tags/generate", json={"pdf_id": lesson["id"]}).json()["coverage"]
+
+    assert db.query(ExtractedPage).count() == 3
+    assert coverage["pages_used"] == 3
+    assert coverage["page_count"] == 22
+    assert coverage["extraction_stopped"] == "pages"
+    assert not coverage["complete"]
@@ -0,0 +1,42 @@
+# Thumbnail tests
+from app.api.conditional import IMMUTABLE_CACHE_CONTROL
+from services import thumbnails
+from services.thumbnails import preview_svg
+from tests.test_search import upload_sample
+
+
+def test_preview_svg_escapes_and_fits_text():
+    svg = preview_svg(612, 792, "Fractions & <Decimals>\n\n" + "x" * 500, 256)
+
+    assert 'width="198" height="256"' in svg
+    assert "Fractions &amp; &lt;Decimals&gt;" in svg
+    assert "x" * 500 not in svg and "…" in svg
+
+
+def test_thumbnail_is_rendered_once_and_cached(client, db, monkeypatch):
+    pdf = upload_sample(client, "Lesson 20.pdf")
+    rendered = []
+    render = thumbnails.render_first_page
+
+    async def run(func, *args, **kwargs):
+        rendered.append(args)
+        return render(*args)
+
+    monkeypatch.setattr(thumbnails.extraction, "run", run)
+
+    response = client.get(pdf["thumbnail_url"], params={"size": 200})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(thumbnails.MEDIA_TYPE)
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    etag = response.headers["etag"]
+    assert etag.endswith('-256"')
+
+    # Other sizes in the same bucket and unversioned URLs share the file
+    again = client.get(f"/api/pdfs/{pdf['id']}/thumbnail", params={"size": 256})
+    assert again.content == response.content
+    assert again.headers["cache-control"] == "no-cache"
+    assert len(rendered) == 1
+
+    cached = client.get(f"/api/pdfs/{pdf['id']}/thumbnail", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
@@ -0,0 +1,87 @@
+# Resumable upload tests
+import hashlib
+import os
+import time
+import uuid
+
+from app.models.pdf import PDF
+from services import upload_sessions
+
+CHUNK_SIZE = upload_sessions.MIN_CHUNK_SIZE
+
+
+def make_content(chunks=2.5):
+    header = b"%PDF-1.4\n% " + uuid.uuid4().hex.encode() + b"\n"
+    return header + os.urandom(int(CHUNK_SIZE * chunks) - len(header))
+
+
+def start_upload(client, content, **extra):
+    response = client.post("/api/pdfs/uploads/", json={
+        "filename": "Scanned Textbook.pdf",
+        "size": len(content),
+        "chunk_size": CHUNK_SIZE,
+        **extra,
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def put_chunk(client, upload_id, content, index):
+    chunk = content[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+    return client.put(f"/api/pdfs/uploads/{upload_id}/chunks/{index}", content=chunk)
+
+
+def test_chunks_in_any_order_assemble_the_file(client, db):
+    content = make_content()
+    upload = start_upload(client, content, tags="history")
+    assert upload["chunk_count"] == 3
+
+    for index in (2, 0):
+        assert put_chunk(client, upload["upload_id"], content, index).status_code == 200
+
+    status = client.get(f"/api/pdfs/uploads/{upload['upload_id']}").json()
+    assert status["received"] == [0, 2]
+    assert status["missing"] == [1]
+    assert client.post(f"/api/pdfs/uploads/{upload['upload_id']}/complete").status_code == 409
+
+    put_chunk(client, upload["upload_id"], content, 1)
+    response = client.post(f"/api/pdfs/uploads/{upload['upload_id']}/complete")
+
+    assert response.status_code == 200
+    pdf = db.query(PDF).get(response.json()["id"])
+    assert pdf.checksum == hashlib.sha256(content).hexdigest()
+    assert pdf.tags == "history"
+    assert client.get(f"/api/pdfs/uploads/{upload['upload_id']}").status_code == 404
+
+
+def test_chunk_of_wrong_size_is_not_recorded(client, db):
+    content = make_content()
+    upload = start_upload(client, content)
+
+    response = client.put(f"/api/pdfs/uploads/{upload['upload_id']}/chunks/0", content=content[:100])
+
+    assert response.status_code == 400
+    assert client.get(f"/api/pdfs/uploads/{upload['upload_id']}").json()["received"] == []
+
+
+def test_chunk_offset_must_match_index(client, db):
+    content = make_content()
+    upload = start_upload(client, content)
+
+    response = client.put(
+        f"/api/pdfs/uploads/{upload['upload_id']}/chunks/1",
+        params={"offset": 0},
+        content=content[CHUNK_SIZE:2 * CHUNK_SIZE],
+    )
+
+    assert response.status_code == 400
+
+
+def test_expired_sessions_are_collected(client, db):
+    upload = start_upload(client, make_content())
+    session_dir = os.path.join(upload_sessions.sessions_root(), upload["upload_id"])
+    stale = time.time() - 2 * 3600
+    os.utime(session_dir, (stale, stale))
+
+    assert upload_sessions.collect_expired(max_age_seconds=3600) >= 1
+    assert client.get(f"/api/pdfs/uploads/{upload['upload_id']}").status_code == 404
@@ -0,0 +1,96 @@
+# Similar-documents index tests
+import numpy as np
+
+from app.models.pdf import PDF
+from services import text_store, vector_index
+from services.vector_index import VectorIndex
+
+FRACTIONS = ["Fractions numerator denominator. Equivalent fractions share a common denominator. " * 5]
+MORE_FRACTIONS = ["Compare fractions with a common denominator; the larger numerator wins. " * 5]
+PLANTS = ["Photosynthesis turns sunlight, water and carbon dioxide into sugar in the leaves. " * 5]
+
+
+def unit(values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_append_tombstone_and_compact(tmp_path):
+    index = VectorIndex(tmp_path, dimensions=3)
+    index.add_many([("a", unit([1, 0, 0])), ("b", unit([1, 1, 0])), ("c", unit([0, 0, 1]))])
+
+    assert [checksum for checksum, _ in index.search(unit([1, 0.1, 0]), 2)] == ["a", "b"]
+
+    index.remove(["a"])
+    index.add("b", unit([0, 1, 0]))
+    assert [checksum for checksum, _ in index.search(unit([1, 0.1, 0]), 3)] == ["b"]
+
+    index.compact()
+    assert sorted(index.checksums()) == ["b", "c"]
+    # A second reader of the same files sees every change
+    reader = VectorIndex(tmp_path, dimensions=3)
+    assert reader.search(unit([0, 0, 1]), 1)[0][0] == "c"
+    index.add("d", unit([0, 0, 1]))
+    assert {checksum for checksum, _ in reader.search(unit([0, 0, 1]), 5)} == {"c", "d"}
+
+
+def test_search_many_and_allowed_filter(tmp_path):
+    index = VectorIndex(tmp_path, dimensions=2)
+    index.add_many([("a", unit([1, 0])), ("b", unit([0, 1])), ("c", unit([1, 1]))])
+
+    first, second = index.search_many(np.stack([unit([1, 0]), unit([0, 1])]), 1)
+    assert first[0][0] == "a" and second[0][0] == "b"
+    assert [checksum for checksum, _ in index.search(unit([1, 0]), 3, allowed={"b", "c"})] == ["c"]
+
+
+def add_pdf(db, filename, checksum, pages, folder_id=None):
+    text_store.save_pages(db, checksum, pages)
+    pdf = PDF(filename=filename, path=f"uploads/{filename}", checksum=checksum, folder_id=folder_id)
+    db.add(pdf)
+    db.commit()
+    return pdf
+
+
+def test_similar_pdfs(client, db):
+    lesson = add_pdf(db, "Fractions.pdf", "a" * 64, FRACTIONS)
+    related = add_pdf(db, "Comparing fractions.pdf", "b" * 64, MORE_FRACTIONS)
+    plants = add_pdf(db, "Plants.pdf", "c" * 64, PLANTS)
+
+    similar = client.get(f"/api/pdfs/{lesson.id}/similar").json()["similar"]
+
+    assert similar[0]["id"] == related.id
+    assert lesson.id not in [match["id"] for match in similar]
+    assert plants.id not in [match["id"] for match in similar][:1]
+
+    elsewhere = client.get(f"/api/pdfs/{lesson.id}/similar", params={"folder_id": 5}).json()
+    assert elsewhere["similar"] == []
+
+
+def test_dropped_text_leaves_the_index(client, db):
+    lesson = add_pdf(db, "Fractions.pdf", "a" * 64, FRACTIONS)
+    assert "a" * 64 in vector_index.index
+
+    client.delete(f"/api/pdfs/{lesson.id}")
+
+    assert "a" * 64 not in vector_index.index
+
+
+def test_index_changes_wait_for_commit(db):
+    text_store.save_pages(db, "d" * 64, FRACTIONS)
+    assert "d" * 64 not in vector_index.index
+    db.rollback()
+    assert "d" * 64 not in vector_index.index
+
+    text_store.save_pages(db, "e" * 64, PLANTS)
+    try:
+        with db.begin_nested():
+            text_store.save_pages(db, "f" * 64, MORE_FRACTIONS)
+            raise ValueError("rolled back")
+    except ValueError:
+        pass
+    db.commit()
+
+    assert "e" * 64 in vector_index.index
+    assert "f" * 64 not in vector_index.index
+    assert not [checksum for checksum, _ in vector_index.index.search(vector_index.index.get("e" * 64), 5)
+                if checksum in ("d" * 64, "f" * 64)]
@@ -1,62 +1,114 @@
-# update_pdf_sizes.py
+# update_file_sizes.py
+"""
+Backfill and reconcile the stored file metadata (size, mtime, checksum) of PDFs.
+
+Listing endpoints only read these columns, so run this after upgrading an
+existing database and whenever files may have changed behind the app's back.
+PDFs stored in the blob store are left alone: their file is named after its
+checksum and shared through the Blob row, so it never changes in place.
+
+Usage:
+    python update_file_sizes.py               # fill rows that have no metadata yet
+    python update_file_sizes.py --reconcile   # also re-check rows whose file changed
+    python update_file_sizes.py --reconcile --rehash   # re-hash every file
+"""
+import argparse
 import os
-import sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
-from app.models.pdf import PDF
-
-def update_pdf_sizes():
-    """Update size for existing PDFs"""
-    # Create database connection
-    engine = create_engine(settings.DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+from app.api.catalog_version import bump_catalog_version
+from app.core.database import SessionLocal, create_tables
+from app.models import PDF
+from services.storage import file_mtime, sha256_file, upload_path
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def sync_pdf_metadata(pdf: PDF, rehash: bool = False) -> str:
+    """
+    Bring one PDF row's metadata in line with its file.
+
+    Returns "updated", "unchanged" or "missing". The checksum is only
+    recomputed when the size or mtime changed (or rehash is set).
+    """
+    file_path = upload_path(pdf.path)
+    if not os.path.exists(file_path):
+        return "missing"
+
+    size = os.path.getsize(file_path)
+    mtime = file_mtime(file_path)
+    if not rehash and pdf.checksum and pdf.size == size and pdf.file_mtime == mtime:
+        return "unchanged"
+
+    pdf.size = size
+    pdf.file_mtime = mtime
+    pdf.checksum = sha256_file(file_path)
+    return "updated"
+
+
+def update_pdf_sizes(batch_size: int = DEFAULT_BATCH_SIZE, reconcile: bool = False,
+                     rehash: bool = False, dry_run: bool = False):
+    """Walk the PDFs table in id order, one committed batch at a time"""
+    create_tables()
     db = SessionLocal()
-    
+    counts = {"updated": 0, "unchanged": 0, "missing": 0}
+
     try:
-        # Get all PDFs
-        pdfs = db.query(PDF).all()
-        print(f"Found {len(pdfs)} PDFs to update")
-        
-        updated_count = 0
-        error_count = 0
-        
-        for pdf in pdfs:
-            try:
-                # Get the file path
-                if pdf.path.startswith("uploads/"):
-                    file_name = os.path.basename(pdf.path)
-                    file_path = os.path.join(settings.UPLOAD_DIR, file_name)
-                else:
-                    file_path = pdf.path
-                
-                # Check if file exists
-                if os.path.exists(file_path):
-                    # Get file size
-                    size = os.path.getsize(file_path)
-                    
-                    # Update PDF record
-                    pdf.size = size
-                    updated_count += 1
-                    
-                    print(f"Updated PDF {pdf.id}: {pdf.filename} - Size: {size} bytes")
-                else:
-                    print(f"File not found for PDF {pdf.id}: {pdf.filename} at {file_path}")
-                    error_count += 1
-            except Exception as e:
-                print(f"Error updating PDF {pdf.id}: {str(e)}")
-                error_count += 1
-        
-        # Commit changes
-        db.commit()
-        print(f"Update complete. Updated {updated_count} PDFs. Errors: {error_count}")
-    
-    except Exception as e:
-        print(f"Error: {str(e)}")
+        last_id = 0
+        while True:
+            # Rows in the blob store are sized and hashed through their Blob
+            query = db.query(PDF).filter(PDF.id > last_id, PDF.blob_id.is_(None))
+            if not reconcile:
+                # Backfill only touches rows that were never filled
+                query = query.filter((PDF.size.is_(None)) | (PDF.checksum.is_(None)))
+            batch = query.order_by(PDF.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            updated = 0
+            for pdf in batch:
+                try:
+                    status = sync_pdf_metadata(pdf, rehash=rehash)
+                except OSError as e:
+                    print(f"Error reading file for PDF {pdf.id}: {str(e)}")
+                    status = "missing"
+                counts[status] += 1
+                if status == "missing":
+                    print(f"File not found for PDF {pdf.id}: {pdf.filename} at {upload_path(pdf.path)}")
+                elif status == "updated":
+                    updated += 1
+                    print(f"Updated PDF {pdf.id}: {pdf.filename} - Size: {pdf.size} bytes")
+            if updated:
+                # Listings and file ETags show these columns
+                bump_catalog_version(db)
+
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            last_id = batch[-1].id
+            # Release the batch's ORM objects before loading the next one
+            db.expunge_all()
+
+        print(f"Update complete. Updated {counts['updated']} PDFs, "
+              f"unchanged {counts['unchanged']}, missing files {counts['missing']}")
+        return counts
     finally:
         db.close()
 
+
 if __name__ == "__main__":
-    print("Starting PDF size update script...")
-    update_pdf_sizes()
-    print("Script completed.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backfill and reconcile stored PDF file metadata")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows loaded and committed per batch")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Check every row, not just rows with missing metadata")
+    parser.add_argument("--rehash", action="store_true",
+                        help="Recompute checksums even when size and mtime match")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report what would change without committing")
+    args = parser.parse_args()
+
+    print("Starting PDF file metadata update...")
+    update_pdf_sizes(batch_size=args.batch_size, reconcile=args.reconcile,
+                     rehash=args.rehash, dry_run=args.dry_run)
+    print("Script completed.")
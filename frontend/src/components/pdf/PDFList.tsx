@@ -47,6 +47,14 @@ const PDFList: React.FC<PDFListProps> = ({
           }`}
         >
           <div className="flex justify-between items-center">
+            {pdf.thumbnail_url && (
+              <img
+                src={`http://localhost:8000${pdf.thumbnail_url}`}
+                alt=""
+                loading="lazy"
+                className="w-12 h-16 mr-4 object-contain bg-white rounded"
+              />
+            )}
             <div className="flex-1">
               <h3 className="text-lg font-medium text-white">{pdf.filename}</h3>
               <div className="mt-1 flex flex-wrap gap-1">
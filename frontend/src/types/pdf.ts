@@ -7,6 +7,7 @@ export interface PDF {
   tags: string[];
   date_added?: string;
   size?: number;
+  thumbnail_url?: string;
 }
 
 export interface Folder {